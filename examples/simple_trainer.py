@@ -33,7 +33,7 @@ from utils import AppearanceOptModule, CameraOptModule, knn, rgb_to_sh, set_rand
 from gsplat import export_splats
 from gsplat.compression import PngCompression
 from gsplat.distributed import cli
-from gsplat.optimizers import SelectiveAdam
+from gsplat.optimizers import GaussianAdam, SelectiveAdam
 from gsplat.rendering import rasterization
 from gsplat.strategy import DefaultStrategy, MCMCStrategy
 from gsplat_viewer import GsplatViewer, GsplatRenderTabState
@@ -121,6 +121,9 @@ class Config:
     sparse_grad: bool = False
     # Use visible adam from Taming 3DGS. (experimental)
     visible_adam: bool = False
+    # Use a single optimizer for all the splat attributes, which updates all of them
+    # with one multi-tensor pass.
+    fused_adam: bool = False
     # Anti-aliasing in rasterization. Might slightly hurt quantitative metrics.
     antialiased: bool = False
 
@@ -225,6 +228,7 @@ def create_splats_with_optimizers(
     sh_degree: int = 3,
     sparse_grad: bool = False,
     visible_adam: bool = False,
+    fused_adam: bool = False,
     batch_size: int = 1,
     feature_dim: Optional[int] = None,
     device: str = "cuda",
@@ -288,6 +292,18 @@ def create_splats_with_optimizers(
         optimizer_class = SelectiveAdam
     else:
         optimizer_class = torch.optim.Adam
+    if fused_adam:
+        assert not sparse_grad, "fused_adam does not support sparse_grad"
+        # a single optimizer, with one param group for each attribute
+        optimizer = GaussianAdam(
+            [
+                {"params": [splats[name]], "lr": lr * math.sqrt(BS), "name": name}
+                for name, _, lr in params
+            ],
+            eps=1e-15 / math.sqrt(BS),
+            betas=(1 - BS * (1 - 0.9), 1 - BS * (1 - 0.999)),
+        )
+        return splats, {name: optimizer for name, _, _ in params}
     optimizers = {
         name: optimizer_class(
             [{"params": splats[name], "lr": lr * math.sqrt(BS), "name": name}],
@@ -366,6 +382,7 @@ class Runner:
             sh_degree=cfg.sh_degree,
             sparse_grad=cfg.sparse_grad,
             visible_adam=cfg.visible_adam,
+            fused_adam=cfg.fused_adam,
             batch_size=cfg.batch_size,
             feature_dim=feature_dim,
             device=self.device,
@@ -556,12 +573,24 @@ class Runner:
         max_steps = cfg.max_steps
         init_step = 0
 
-        schedulers = [
-            # means has a learning rate schedule, that end at 0.01 of the initial value
-            torch.optim.lr_scheduler.ExponentialLR(
+        # means has a learning rate schedule, that end at 0.01 of the initial value
+        if cfg.fused_adam:
+            # only the param group of means is decayed in the shared optimizer
+            means_gamma = 0.01 ** (1.0 / max_steps)
+            means_scheduler = torch.optim.lr_scheduler.LambdaLR(
+                self.optimizers["means"],
+                [
+                    (lambda step: means_gamma**step)
+                    if group["name"] == "means"
+                    else (lambda step: 1.0)
+                    for group in self.optimizers["means"].param_groups
+                ],
+            )
+        else:
+            means_scheduler = torch.optim.lr_scheduler.ExponentialLR(
                 self.optimizers["means"], gamma=0.01 ** (1.0 / max_steps)
-            ),
-        ]
+            )
+        schedulers = [means_scheduler]
         if cfg.pose_opt:
             # pose optimization has a learning rate schedule
             schedulers.append(
@@ -765,7 +794,10 @@ class Runner:
                     "w",
                 ) as f:
                     json.dump(stats, f)
-                data = {"step": step, "splats": self.splats.state_dict()}
+                # With `reuse_storage`, the splats are views of storages with
+                # slack, which torch.save would write out in full.
+                splats = {k: v.clone() for k, v in self.splats.state_dict().items()}
+                data = {"step": step, "splats": splats}
                 if cfg.pose_opt:
                     if world_size > 1:
                         data["pose_adjust"] = self.pose_adjust.module.state_dict()
@@ -839,8 +871,8 @@ class Runner:
                 else:
                     visibility_mask = (info["radii"] > 0).all(-1).any(0)
 
-            # optimize
-            for optimizer in self.optimizers.values():
+            # optimize, once for each distinct optimizer
+            for optimizer in {id(o): o for o in self.optimizers.values()}.values():
                 if cfg.visible_adam:
                     optimizer.step(visibility_mask)
                 else:
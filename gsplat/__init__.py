@@ -21,7 +21,7 @@ from .cuda._wrapper import (
     world_to_cam,
 )
 from .exporter import export_splats
-from .optimizers import SelectiveAdam
+from .optimizers import GaussianAdam, SelectiveAdam
 from .rendering import (
     rasterization,
     rasterization_2dgs,
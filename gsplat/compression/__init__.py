@@ -1 +1,2 @@
 from .png_compression import PngCompression
+from .container import SplatContainer, write_container
@@ -0,0 +1,94 @@
+import io
+import json
+import mmap
+import os
+import struct
+from typing import Any, BinaryIO, Dict, List
+
+MAGIC = b"GSPLATC1"
+# magic, and the size of the header in bytes
+_PREAMBLE = struct.Struct("<8sQ")
+
+
+def write_container(path: str, compress_dir: str, meta: Dict[str, Any]) -> None:
+    """Pack the files of a compressed splats directory into a single file.
+
+    The file starts with a preamble (the magic bytes and the size of the header), then
+    a JSON header with `meta` and the offset and size of each file, followed by the
+    contents of the files, so that readers can decode each attribute on its own
+    from a memory map, see :class:`SplatContainer`.
+
+    Args:
+        path (str): path of the container file
+        compress_dir (str): directory that contains the compressed files
+        meta (Dict[str, Any]): metadata of the attributes, as in "meta.json"
+    """
+    names = sorted(
+        name
+        for name in os.listdir(compress_dir)
+        if name != "meta.json" and os.path.isfile(os.path.join(compress_dir, name))
+    )
+    files, offset = {}, 0
+    for name in names:
+        size = os.path.getsize(os.path.join(compress_dir, name))
+        files[name] = [offset, size]
+        offset += size
+    header = json.dumps({"meta": meta, "files": files}).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, len(header)))
+        f.write(header)
+        for name in names:
+            with open(os.path.join(compress_dir, name), "rb") as blob:
+                f.write(blob.read())
+
+
+class SplatContainer:
+    """Reader of a single-file container written by :func:`write_container`.
+
+    The file is memory mapped, and only the header is read when opening it. The
+    contents of a file are only read when opened with :meth:`open`, so decoding a
+    few attributes only touches their bytes.
+
+    Args:
+        path (str): path of the container file
+
+    Examples:
+
+        >>> with SplatContainer("splats.gsplat") as container:
+        ...     meta = container.meta
+        ...     with container.open("means_l.png") as f:
+        ...         ...
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _PREAMBLE.unpack_from(self._mmap, 0)
+        assert magic == MAGIC, f"{path} is not a splat container"
+        start = _PREAMBLE.size
+        header = json.loads(self._mmap[start : start + header_size].decode("utf-8"))
+        self.meta: Dict[str, Any] = header["meta"]
+        self._files: Dict[str, List[int]] = header["files"]
+        self._data_offset = start + header_size
+
+    @property
+    def names(self) -> List[str]:
+        """Names of the files in the container."""
+        return list(self._files.keys())
+
+    def open(self, name: str) -> BinaryIO:
+        """Opens a file of the container for reading."""
+        offset, size = self._files[name]
+        start = self._data_offset + offset
+        return io.BytesIO(self._mmap[start : start + size])
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "SplatContainer":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
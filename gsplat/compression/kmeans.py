@@ -0,0 +1,146 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import torch
+from torch import Tensor
+
+
+def kmeans(
+    x: Tensor,
+    n_clusters: int,
+    n_iters: int = 20,
+    batch_size: Optional[int] = None,
+    n_seed: Optional[int] = None,
+    seed_rounds: int = 16,
+    max_chunk_bytes: int = 2**24,
+    n_threads: Optional[int] = None,
+    verbose: bool = False,
+) -> Tuple[Tensor, Tensor]:
+    """Mini-batch K-means clustering in pure PyTorch, which runs on CPU or GPU.
+
+    The centroids are seeded by k-means++ on a random subsample of `n_seed` points,
+    drawing `n_clusters / seed_rounds` centroids per round, and refined by `n_iters`
+    mini-batches of `batch_size` points with per-centroid learning rates, following
+    `Web-Scale K-Means Clustering <https://dl.acm.org/doi/10.1145/1772690.1772862>`_.
+    Finally, all the points are assigned to their nearest centroid (in Euclidean
+    distance). The points are split over `n_threads` threads, each of which computes
+    the distances by chunks of at most `max_chunk_bytes`.
+
+    Args:
+        x (Tensor): Points to cluster. [N, D]
+        n_clusters (int): Number of clusters, clamped to the number of points.
+        n_iters (int): Number of mini-batch iterations. Default: 20.
+        batch_size (Optional[int]): Number of points of each mini-batch. Default: None,
+            which uses `max(16384, 4 * n_clusters)` points, so that each centroid sees
+            about `4 * n_iters` points during the refinement, e.g. for the 65536
+            clusters of the shN codebooks.
+        n_seed (Optional[int]): Number of points to run k-means++ seeding on.
+            Default: None, which uses `4 * n_clusters` points.
+        seed_rounds (int): Number of rounds of the k-means++ seeding. Default: 16.
+        max_chunk_bytes (int): Bound of the memory of the distances computed at
+            once by each thread. Default: 16 MB.
+        n_threads (Optional[int]): Number of threads of the assignment. Default: None,
+            which uses `torch.get_num_threads()`.
+        verbose (bool): Whether to print verbose information. Default: False.
+
+    Returns:
+        A tuple:
+
+        - **centroids**. [n_clusters, D]
+        - **labels**. The index of the centroid of each point. [N]
+    """
+    assert x.dim() == 2, x.shape
+    N, D = x.shape
+    n_clusters = min(n_clusters, N)
+    if n_seed is None:
+        n_seed = 4 * n_clusters
+    if batch_size is None:
+        batch_size = max(16384, 4 * n_clusters)
+    if n_threads is None:
+        n_threads = torch.get_num_threads()
+    x = x.float()
+
+    # k-means++ seeding on a subsample
+    subsample = x[torch.randperm(N, device=x.device)[: max(n_seed, n_clusters)]]
+    centroids = _kmeans_plusplus(
+        subsample, n_clusters, seed_rounds, max_chunk_bytes, n_threads
+    )
+
+    # mini-batch refinement
+    counts = torch.zeros(n_clusters, device=x.device)
+    for it in range(n_iters):
+        batch = x[torch.randint(N, (min(batch_size, N),), device=x.device)]
+        labels, dists = _assign(batch, centroids, max_chunk_bytes, n_threads)
+        batch_counts = torch.bincount(labels, minlength=n_clusters).float()
+        batch_sums = torch.zeros_like(centroids).index_add_(0, labels, batch)
+        counts += batch_counts
+        # each centroid moves to the running mean of its points
+        hit = torch.where(batch_counts > 0)[0]
+        centroids[hit] += (
+            batch_sums[hit] - batch_counts[hit, None] * centroids[hit]
+        ) / counts[hit, None]
+        if verbose and (it + 1) % 10 == 0:
+            print(f"K-means iteration {it + 1}: batch error {dists.mean().item():.6f}")
+
+    labels, _ = _assign(x, centroids, max_chunk_bytes, n_threads)
+    return centroids, labels
+
+
+def _kmeans_plusplus(
+    x: Tensor, n_clusters: int, n_rounds: int, max_chunk_bytes: int, n_threads: int
+) -> Tensor:
+    """k-means++ seeding, which draws a batch of centroids at once in each of the
+    `n_rounds` rounds, with probabilities proportional to the squared distance to
+    the nearest centroid drawn in the previous rounds."""
+    first = torch.randint(len(x), (1,), device=x.device)
+    centroids = [x[first]]
+    _, min_dists = _assign(x, centroids[0], max_chunk_bytes, n_threads)
+    n_drawn, n_per_round = 1, math.ceil((n_clusters - 1) / max(n_rounds, 1))
+    while n_drawn < n_clusters:
+        n = min(n_per_round, n_clusters - n_drawn)
+        # points that coincide with a centroid are only drawn when out of others
+        weights = min_dists.clamp_min(torch.finfo(min_dists.dtype).tiny)
+        new = x[torch.multinomial(weights, n, replacement=False)]
+        _, dists = _assign(x, new, max_chunk_bytes, n_threads)
+        torch.minimum(min_dists, dists, out=min_dists)
+        centroids.append(new)
+        n_drawn += n
+    return torch.cat(centroids)
+
+
+def _assign(
+    x: Tensor, centroids: Tensor, max_chunk_bytes: int, n_threads: int
+) -> Tuple[Tensor, Tensor]:
+    """The nearest centroid of each point and the squared distance to it.
+
+    The points are split into one contiguous slice per thread, and each thread
+    computes the distances of its slice by [chunk_size, K] blocks."""
+    N, K = len(x), len(centroids)
+    chunk_size = max(1, max_chunk_bytes // (4 * K))
+    centroids_sq = centroids.square().sum(dim=-1)
+    labels = torch.empty(N, dtype=torch.long, device=x.device)
+    dists = torch.empty(N, device=x.device)
+
+    def assign_slice(bounds: Tuple[int, int]):
+        for start in range(*bounds, chunk_size):
+            end = min(start + chunk_size, bounds[1])
+            chunk = x[start:end]
+            # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, where |x|^2 does not change the
+            # argmin
+            chunk_dists = torch.addmm(centroids_sq[None], chunk, centroids.T, alpha=-2)
+            min_dists, min_labels = chunk_dists.min(dim=-1)
+            labels[start:end] = min_labels
+            dists[start:end] = min_dists + chunk.square().sum(dim=-1)
+
+    # no more threads than chunks
+    n_slices = max(1, min(n_threads, math.ceil(N / chunk_size)))
+    slice_size = math.ceil(N / n_slices)
+    slices = [(i, min(i + slice_size, N)) for i in range(0, N, slice_size)]
+    if len(slices) > 1:
+        with ThreadPoolExecutor(len(slices)) as pool:
+            list(pool.map(assign_slice, slices))
+    else:
+        for bounds in slices:
+            assign_slice(bounds)
+    return labels, dists.clamp_min_(0)
@@ -1,14 +1,22 @@
+import functools
 import json
+import math
 import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Callable, Dict
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import torch
 import torch.nn.functional as F
 from torch import Tensor
+from typing_extensions import Literal
 
-from gsplat.compression.sort import sort_splats
+from gsplat.compression.container import SplatContainer, write_container
+from gsplat.compression.kmeans import kmeans
+from gsplat.compression.sort import sort_splats, sort_splats_morton
 from gsplat.utils import inverse_log_transform, log_transform
 
 
@@ -21,10 +29,13 @@ class PngCompression:
         This class requires the `imageio <https://pypi.org/project/imageio/>`_,
         `plas <https://github.com/fraunhoferhhi/PLAS.git>`_
         and `torchpq <https://github.com/DeMoriarty/TorchPQ?tab=readme-ov-file#install>`_ packages to be installed.
+        torchpq (which runs on CUDA only) is not needed with `kmeans_backend="torch"`.
 
-    .. warning::
-        This class might throw away a few lowest opacities splats if the number of
-        splats is not a square number.
+    .. note::
+        The splats are laid out in an H x W grid with W = ceil(sqrt(N)) and
+        H = ceil(N / W). When N < H * W, the grid is padded with copies of some
+        splats, which are marked by a "_valid" mask that is compressed along and
+        dropped when decompressing, so no splat is lost.
 
     .. note::
         The splats parameters are expected to be pre-activation values. It expects
@@ -38,11 +49,46 @@ class PngCompression:
 
     Args:
         use_sort (bool, optional): Whether to sort splats before compression. Defaults to True.
+        sort_method (str, optional): How to sort the splats: "plas" with
+            :func:`gsplat.compression.sort.sort_splats`, which needs PLAS on CUDA,
+            "morton" along a space-filling curve with
+            :func:`gsplat.compression.sort.sort_splats_morton`, which runs on CPU, or
+            "morton_swap", which refines the latter with neighbor swaps.
+            Defaults to "plas".
         verbose (bool, optional): Whether to print verbose information. Default to True.
+        kmeans_backend (str, optional): K-means implementation of the shN codebook,
+            either "torchpq" or "torch", the built-in mini-batch K-means of
+            :func:`gsplat.compression.kmeans.kmeans` that also runs on CPU.
+            Defaults to "torchpq".
+        n_workers (int, optional): Number of threads that run the codecs of the
+            attributes concurrently, including their device-to-host copies. The PNG
+            and NPZ encoders release the GIL while compressing. Defaults to None,
+            which uses one thread per attribute, up to the number of CPUs.
+        block_size (int, optional): Side of the square blocks of the grid that get
+            their own quantization ranges in the 8-bit and 16-bit PNG attributes,
+            e.g. 16, so that a few outliers only coarsen the precision of their
+            blocks, see `_block_ranges()`. At the same bit depth this lowers the
+            error at the cost of larger files, see `profiling/block_quantization.py`.
+            Defaults to None, which uses one range per channel over the whole grid.
     """
 
     use_sort: bool = True
+    sort_method: Literal["plas", "morton", "morton_swap"] = "plas"
     verbose: bool = True
+    kmeans_backend: Literal["torchpq", "torch"] = "torchpq"
+    n_workers: Optional[int] = None
+    block_size: Optional[int] = None
+
+    def _get_sort_fn(self) -> Callable:
+        sort_fn_map = {
+            "plas": sort_splats,
+            "morton": sort_splats_morton,
+            "morton_swap": functools.partial(sort_splats_morton, swap_iters=8),
+        }
+        if self.sort_method in sort_fn_map:
+            return sort_fn_map[self.sort_method]
+        else:
+            raise ValueError(f"Unknown sort method: {self.sort_method}")
 
     def _get_compress_fn(self, param_name: str) -> Callable:
         compress_fn_map = {
@@ -72,12 +118,22 @@ class PngCompression:
         else:
             return _decompress_npz
 
-    def compress(self, compress_dir: str, splats: Dict[str, Tensor]) -> None:
+    def _pool(self, n_jobs: int) -> ThreadPoolExecutor:
+        n_workers = self.n_workers
+        if n_workers is None:
+            n_workers = min(n_jobs, os.cpu_count() or 1)
+        return ThreadPoolExecutor(max(n_workers, 1))
+
+    def compress(self, compress_dir: str, splats: Dict[str, Tensor]) -> Dict[str, Any]:
         """Run compression
 
         Args:
             compress_dir (str): directory to save compressed files
             splats (Dict[str, Tensor]): Gaussian splats to compress
+
+        Returns:
+            Dict[str, Any]: metadata of each attribute, as saved in "meta.json", with
+            the wall time of its codec in seconds under "time".
         """
 
         # Param-specific preprocessing
@@ -85,63 +141,268 @@ class PngCompression:
         splats["quats"] = F.normalize(splats["quats"], dim=-1)
 
         n_gs = len(splats["means"])
-        n_sidelen = int(n_gs**0.5)
-        n_crop = n_gs - n_sidelen**2
-        if n_crop != 0:
-            splats = _crop_n_splats(splats, n_crop)
-            print(
-                f"Warning: Number of Gaussians was not square. Removed {n_crop} Gaussians."
-            )
+        grid_shape = _grid_shape(n_gs)
+        n_pad = grid_shape[0] * grid_shape[1] - n_gs
+        if n_pad != 0:
+            splats = _pad_splats(splats, n_pad)
 
         if self.use_sort:
-            splats = sort_splats(splats)
-
-        meta = {}
-        for param_name in splats.keys():
-            compress_fn = self._get_compress_fn(param_name)
-            kwargs = {
-                "n_sidelen": n_sidelen,
-                "verbose": self.verbose,
-            }
-            meta[param_name] = compress_fn(
-                compress_dir, param_name, splats[param_name], **kwargs
+            splats = self._get_sort_fn()(
+                splats, verbose=self.verbose, grid_shape=grid_shape
             )
 
+        # the largest attributes first, so that the others fill the other workers
+        param_names = sorted(splats.keys(), key=lambda k: -splats[k].numel())
+        kwargs = {
+            "grid_shape": grid_shape,
+            "verbose": self.verbose,
+            "kmeans_backend": self.kmeans_backend,
+            "block_size": self.block_size,
+        }
+        with self._pool(len(param_names)) as pool:
+            futures = {
+                param_name: pool.submit(
+                    _timed,
+                    self._get_compress_fn(param_name),
+                    compress_dir,
+                    param_name,
+                    splats[param_name],
+                    **kwargs,
+                )
+                for param_name in param_names
+            }
+            results = {k: future.result() for k, future in futures.items()}
+        meta = {param_name: results[param_name][0] for param_name in splats}
+
         with open(os.path.join(compress_dir, "meta.json"), "w") as f:
             json.dump(meta, f)
 
-    def decompress(self, compress_dir: str) -> Dict[str, Tensor]:
+        for param_name, (_, elapsed) in results.items():
+            meta[param_name]["time"] = elapsed
+            if self.verbose:
+                print(f"Compressed {param_name} in {elapsed:.3f}s.")
+        return meta
+
+    def compress_file(self, path: str, splats: Dict[str, Tensor]) -> Dict[str, Any]:
+        """Run compression into a single file
+
+        The attributes are compressed as by :meth:`compress`, and packed into a
+        container file that can be decompressed lazily, see
+        :class:`gsplat.compression.container.SplatContainer`.
+
+        Args:
+            path (str): path of the file to save
+            splats (Dict[str, Tensor]): Gaussian splats to compress
+
+        Returns:
+            Dict[str, Any]: metadata of each attribute, see :meth:`compress`.
+        """
+        with tempfile.TemporaryDirectory() as compress_dir:
+            meta = self.compress(compress_dir, splats)
+            with open(os.path.join(compress_dir, "meta.json"), "r") as f:
+                write_container(path, compress_dir, json.load(f))
+        return meta
+
+    def decompress(
+        self, compress_dir: str, param_names: Optional[List[str]] = None
+    ) -> Dict[str, Tensor]:
         """Run decompression
 
         Args:
-            compress_dir (str): directory that contains compressed files
+            compress_dir (str): directory that contains compressed files, or a file
+                saved by :meth:`compress_file`
+            param_names (List[str], optional): names of the attributes to decompress,
+                e.g. ["means", "opacities"]. From a single file, only their bytes
+                are read. Defaults to None, which decompresses all of them.
 
         Returns:
             Dict[str, Tensor]: decompressed Gaussian splats
         """
-        with open(os.path.join(compress_dir, "meta.json"), "r") as f:
-            meta = json.load(f)
-
-        splats = {}
-        for param_name, param_meta in meta.items():
-            decompress_fn = self._get_decompress_fn(param_name)
-            splats[param_name] = decompress_fn(compress_dir, param_name, param_meta)
+        if os.path.isfile(compress_dir):
+            source = SplatContainer(compress_dir)
+            meta = source.meta
+        else:
+            source = compress_dir
+            with open(os.path.join(compress_dir, "meta.json"), "r") as f:
+                meta = json.load(f)
+        if param_names is not None:
+            if _VALID_KEY in meta:
+                param_names = list(param_names) + [_VALID_KEY]
+            meta = {k: meta[k] for k in param_names}
+
+        with self._pool(len(meta)) as pool:
+            futures = {
+                param_name: pool.submit(
+                    _timed,
+                    self._get_decompress_fn(param_name),
+                    source,
+                    param_name,
+                    param_meta,
+                )
+                for param_name, param_meta in meta.items()
+            }
+            splats = {}
+            for param_name, future in futures.items():
+                splats[param_name], elapsed = future.result()
+                if self.verbose:
+                    print(f"Decompressed {param_name} in {elapsed:.3f}s.")
+        if isinstance(source, SplatContainer):
+            source.close()
+
+        # Drop the padding of the grid
+        if _VALID_KEY in splats:
+            valid = splats.pop(_VALID_KEY)
+            splats = {k: v[valid] for k, v in splats.items()}
 
         # Param-specific postprocessing
-        splats["means"] = inverse_log_transform(splats["means"])
+        if "means" in splats:
+            splats["means"] = inverse_log_transform(splats["means"])
         return splats
 
 
-def _crop_n_splats(splats: Dict[str, Tensor], n_crop: int) -> Dict[str, Tensor]:
-    opacities = splats["opacities"]
-    keep_indices = torch.argsort(opacities, descending=True)[:-n_crop]
+def _open(compress_dir: Union[str, SplatContainer], filename: str) -> BinaryIO:
+    """Opens a compressed file from a directory or a single-file container."""
+    if isinstance(compress_dir, SplatContainer):
+        return compress_dir.open(filename)
+    return open(os.path.join(compress_dir, filename), "rb")
+
+
+def _timed(fn: Callable, *args, **kwargs) -> Tuple[Any, float]:
+    """Calls `fn` and returns its result with its wall time in seconds."""
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return result, time.time() - start
+
+
+# The mask of the splats that are not padding, which is compressed like the others
+_VALID_KEY = "_valid"
+
+
+def _grid_shape(n_gs: int) -> Tuple[int, int]:
+    """The smallest (H, W) grid with W = ceil(sqrt(N)) that holds N splats, which
+    is the square grid when N is a square number."""
+    width = math.isqrt(n_gs)
+    if width * width < n_gs:
+        width += 1
+    height = -(-n_gs // width) if width > 0 else 0
+    return height, width
+
+
+def _pad_splats(splats: Dict[str, Tensor], n_pad: int) -> Dict[str, Tensor]:
+    """Pads the splats with copies of `n_pad` of them, spread over all the splats,
+    which keeps the quantization ranges, and adds the mask of the original ones."""
+    n_gs = len(splats["means"])
+    device = splats["means"].device
+    pad_indices = torch.arange(n_pad, device=device) * n_gs // n_pad
     for k, v in splats.items():
-        splats[k] = v[keep_indices]
+        splats[k] = torch.cat([v, v[pad_indices]])
+    splats[_VALID_KEY] = torch.arange(n_gs + n_pad, device=device) < n_gs
     return splats
 
 
+def _block_ranges(
+    grid: Tensor, mins: Tensor, maxs: Tensor, block_size: int
+) -> np.ndarray:
+    """Quantization ranges of the square blocks of a grid.
+
+    The min and max of each block and channel are stored as 16-bit fractions of the
+    global range [mins, maxs], rounded outwards so that they bound the block.
+
+    Args:
+        grid (Tensor): parameters laid out in the grid. [H, W, C]
+        mins (Tensor): global min of each channel. [C]
+        maxs (Tensor): global max of each channel. [C]
+        block_size (int): side of the blocks
+
+    Returns:
+        np.ndarray: the quantized min and max of each block. [2, H', W', C] uint16,
+        with H' = ceil(H / block_size) and W' = ceil(W / block_size)
+    """
+    H, W, C = grid.shape
+    bh, bw = -(-H // block_size), -(-W // block_size)
+    # pad the grid to whole blocks with values that never win the min or max
+    blocks = grid.new_full((2, bh * block_size, bw * block_size, C), float("inf"))
+    blocks[0, :H, :W] = grid
+    blocks[1, :H, :W] = -grid
+    blocks = blocks.reshape(2, bh, block_size, bw, block_size, C).amin(dim=(2, 4))
+    block_mins, block_maxs = blocks[0], -blocks[1]
+
+    scale = (2**16 - 1) / (maxs - mins).double().clamp_min(1e-12)
+    q_mins = ((block_mins - mins).double() * scale).floor()
+    q_maxs = ((block_maxs - mins).double() * scale).ceil()
+    q_ranges = torch.stack([q_mins, q_maxs]).clamp_(0, 2**16 - 1)
+    return q_ranges.cpu().numpy().astype(np.uint16)
+
+
+def _expand_ranges(
+    q_ranges: Tensor,
+    mins: Tensor,
+    maxs: Tensor,
+    grid_shape: Tuple[int, int],
+    block_size: int,
+) -> Tuple[Tensor, Tensor]:
+    """The min and max of the block of each cell of the grid, [H, W, C] each, from
+    the quantized ranges of `_block_ranges()`."""
+    H, W = grid_shape
+    ranges = q_ranges.to(mins) / (2**16 - 1) * (maxs - mins) + mins
+    ranges = ranges.repeat_interleave(block_size, dim=1)
+    ranges = ranges.repeat_interleave(block_size, dim=2)
+    return ranges[0, :H, :W], ranges[1, :H, :W]
+
+
+def _block_normalize(
+    compress_dir: str,
+    param_name: str,
+    grid: Tensor,
+    mins: Tensor,
+    maxs: Tensor,
+    block_size: int,
+) -> Tensor:
+    """Normalizes a grid of parameters to [0, 1] by the ranges of their blocks, and
+    saves the ranges to "{param_name}_ranges.npz"."""
+    grid, mins, maxs = grid.float(), mins.float(), maxs.float()
+    q_ranges = _block_ranges(grid, mins, maxs, block_size)
+    np.savez_compressed(
+        os.path.join(compress_dir, f"{param_name}_ranges.npz"), arr=q_ranges
+    )
+    block_mins, block_maxs = _expand_ranges(
+        torch.from_numpy(q_ranges.astype(np.int32)).to(grid.device),
+        mins,
+        maxs,
+        grid.shape[:2],
+        block_size,
+    )
+    grid_norm = (grid - block_mins) / (block_maxs - block_mins).clamp_min(1e-12)
+    return grid_norm.clamp(0, 1)
+
+
+def _block_bounds(
+    compress_dir: Union[str, SplatContainer],
+    param_name: str,
+    meta: Dict[str, Any],
+    mins: Tensor,
+    maxs: Tensor,
+) -> Tuple[Tensor, Tensor]:
+    """Loads the ranges saved by `_block_normalize()`, expanded to the cells in the
+    same float32 precision as the encoder, so that they are bit-identical."""
+    with _open(compress_dir, f"{param_name}_ranges.npz") as f:
+        q_ranges = np.load(f)["arr"]
+    return _expand_ranges(
+        torch.from_numpy(q_ranges.astype(np.int32)),
+        mins.float(),
+        maxs.float(),
+        _grid_shape(meta["shape"][0]),
+        meta["block_size"],
+    )
+
+
 def _compress_png(
-    compress_dir: str, param_name: str, params: Tensor, n_sidelen: int, **kwargs
+    compress_dir: str,
+    param_name: str,
+    params: Tensor,
+    grid_shape: Tuple[int, int],
+    block_size: Optional[int] = None,
+    **kwargs,
 ) -> Dict[str, Any]:
     """Compress parameters with 8-bit quantization and lossless PNG compression.
 
@@ -149,7 +410,9 @@ def _compress_png(
         compress_dir (str): compression directory
         param_name (str): parameter field name
         params (Tensor): parameters
-        n_sidelen (int): image side length
+        grid_shape (Tuple[int, int]): image height and width
+        block_size (int, optional): side of the blocks with their own quantization
+            ranges, see `_block_ranges()`. Defaults to None, one range per channel.
 
     Returns:
         Dict[str, Any]: metadata
@@ -163,14 +426,20 @@ def _compress_png(
         }
         return meta
 
-    grid = params.reshape((n_sidelen, n_sidelen, -1))
+    grid = params.reshape((*grid_shape, -1))
     mins = torch.amin(grid, dim=(0, 1))
     maxs = torch.amax(grid, dim=(0, 1))
-    grid_norm = (grid - mins) / (maxs - mins)
+    if block_size is None:
+        grid_norm = (grid - mins) / (maxs - mins)
+    else:
+        grid_norm = _block_normalize(
+            compress_dir, param_name, grid, mins, maxs, block_size
+        )
     img_norm = grid_norm.detach().cpu().numpy()
 
     img = (img_norm * (2**8 - 1)).round().astype(np.uint8)
-    img = img.squeeze()
+    if img.shape[-1] == 1:
+        img = img[..., 0]
     imageio.imwrite(os.path.join(compress_dir, f"{param_name}.png"), img)
 
     meta = {
@@ -179,14 +448,19 @@ def _compress_png(
         "mins": mins.tolist(),
         "maxs": maxs.tolist(),
     }
+    if block_size is not None:
+        meta["block_size"] = block_size
     return meta
 
 
-def _decompress_png(compress_dir: str, param_name: str, meta: Dict[str, Any]) -> Tensor:
+def _decompress_png(
+    compress_dir: Union[str, SplatContainer], param_name: str, meta: Dict[str, Any]
+) -> Tensor:
     """Decompress parameters from PNG file.
 
     Args:
-        compress_dir (str): compression directory
+        compress_dir (Union[str, SplatContainer]): compression directory, or single-file
+            container
         param_name (str): parameter field name
         meta (Dict[str, Any]): metadata
 
@@ -199,12 +473,16 @@ def _decompress_png(compress_dir: str, param_name: str, meta: Dict[str, Any]) ->
         params = torch.zeros(meta["shape"], dtype=getattr(torch, meta["dtype"]))
         return meta
 
-    img = imageio.imread(os.path.join(compress_dir, f"{param_name}.png"))
+    with _open(compress_dir, f"{param_name}.png") as f:
+        img = imageio.imread(f)
     img_norm = img / (2**8 - 1)
 
     grid_norm = torch.tensor(img_norm)
     mins = torch.tensor(meta["mins"])
     maxs = torch.tensor(meta["maxs"])
+    if "block_size" in meta:
+        grid_norm = grid_norm.reshape(*grid_norm.shape[:2], len(mins))
+        mins, maxs = _block_bounds(compress_dir, param_name, meta, mins, maxs)
     grid = grid_norm * (maxs - mins) + mins
 
     params = grid.reshape(meta["shape"])
@@ -213,7 +491,12 @@ def _decompress_png(compress_dir: str, param_name: str, meta: Dict[str, Any]) ->
 
 
 def _compress_png_16bit(
-    compress_dir: str, param_name: str, params: Tensor, n_sidelen: int, **kwargs
+    compress_dir: str,
+    param_name: str,
+    params: Tensor,
+    grid_shape: Tuple[int, int],
+    block_size: Optional[int] = None,
+    **kwargs,
 ) -> Dict[str, Any]:
     """Compress parameters with 16-bit quantization and PNG compression.
 
@@ -221,7 +504,9 @@ def _compress_png_16bit(
         compress_dir (str): compression directory
         param_name (str): parameter field name
         params (Tensor): parameters
-        n_sidelen (int): image side length
+        grid_shape (Tuple[int, int]): image height and width
+        block_size (int, optional): side of the blocks with their own quantization
+            ranges, see `_block_ranges()`. Defaults to None, one range per channel.
 
     Returns:
         Dict[str, Any]: metadata
@@ -235,10 +520,15 @@ def _compress_png_16bit(
         }
         return meta
 
-    grid = params.reshape((n_sidelen, n_sidelen, -1))
+    grid = params.reshape((*grid_shape, -1))
     mins = torch.amin(grid, dim=(0, 1))
     maxs = torch.amax(grid, dim=(0, 1))
-    grid_norm = (grid - mins) / (maxs - mins)
+    if block_size is None:
+        grid_norm = (grid - mins) / (maxs - mins)
+    else:
+        grid_norm = _block_normalize(
+            compress_dir, param_name, grid, mins, maxs, block_size
+        )
     img_norm = grid_norm.detach().cpu().numpy()
     img = (img_norm * (2**16 - 1)).round().astype(np.uint16)
 
@@ -257,16 +547,19 @@ def _compress_png_16bit(
         "mins": mins.tolist(),
         "maxs": maxs.tolist(),
     }
+    if block_size is not None:
+        meta["block_size"] = block_size
     return meta
 
 
 def _decompress_png_16bit(
-    compress_dir: str, param_name: str, meta: Dict[str, Any]
+    compress_dir: Union[str, SplatContainer], param_name: str, meta: Dict[str, Any]
 ) -> Tensor:
     """Decompress parameters from PNG files.
 
     Args:
-        compress_dir (str): compression directory
+        compress_dir (Union[str, SplatContainer]): compression directory, or single-file
+            container
         param_name (str): parameter field name
         meta (Dict[str, Any]): metadata
 
@@ -279,8 +572,10 @@ def _decompress_png_16bit(
         params = torch.zeros(meta["shape"], dtype=getattr(torch, meta["dtype"]))
         return meta
 
-    img_l = imageio.imread(os.path.join(compress_dir, f"{param_name}_l.png"))
-    img_u = imageio.imread(os.path.join(compress_dir, f"{param_name}_u.png"))
+    with _open(compress_dir, f"{param_name}_l.png") as f:
+        img_l = imageio.imread(f)
+    with _open(compress_dir, f"{param_name}_u.png") as f:
+        img_u = imageio.imread(f)
     img_u = img_u.astype(np.uint16)
     img = (img_u << 8) + img_l
 
@@ -288,6 +583,9 @@ def _decompress_png_16bit(
     grid_norm = torch.tensor(img_norm)
     mins = torch.tensor(meta["mins"])
     maxs = torch.tensor(meta["maxs"])
+    if "block_size" in meta:
+        grid_norm = grid_norm.reshape(*grid_norm.shape[:2], len(mins))
+        mins, maxs = _block_bounds(compress_dir, param_name, meta, mins, maxs)
     grid = grid_norm * (maxs - mins) + mins
 
     params = grid.reshape(meta["shape"])
@@ -310,9 +608,12 @@ def _compress_npz(
     return meta
 
 
-def _decompress_npz(compress_dir: str, param_name: str, meta: Dict[str, Any]) -> Tensor:
+def _decompress_npz(
+    compress_dir: Union[str, SplatContainer], param_name: str, meta: Dict[str, Any]
+) -> Tensor:
     """Decompress parameters with numpy's NPZ compression."""
-    arr = np.load(os.path.join(compress_dir, f"{param_name}.npz"))["arr"]
+    with _open(compress_dir, f"{param_name}.npz") as f:
+        arr = np.load(f)["arr"]
     params = torch.tensor(arr)
     params = params.reshape(meta["shape"])
     params = params.to(dtype=getattr(torch, meta["dtype"]))
@@ -326,12 +627,13 @@ def _compress_kmeans(
     n_clusters: int = 65536,
     quantization: int = 6,
     verbose: bool = True,
+    kmeans_backend: Literal["torchpq", "torch"] = "torchpq",
     **kwargs,
 ) -> Dict[str, Any]:
     """Run K-means clustering on parameters and save centroids and labels to a npz file.
 
     .. warning::
-        TorchPQ must installed to use K-means clustering.
+        TorchPQ must installed to use K-means clustering with the "torchpq" backend.
 
     Args:
         compress_dir (str): compression directory
@@ -340,17 +642,12 @@ def _compress_kmeans(
         n_clusters (int): number of K-means clusters
         quantization (int): number of bits in quantization
         verbose (bool, optional): Whether to print verbose information. Default to True.
+        kmeans_backend (str, optional): "torchpq", or "torch" for the built-in
+            mini-batch K-means. Default to "torchpq".
 
     Returns:
         Dict[str, Any]: metadata
     """
-    try:
-        from torchpq.clustering import KMeans
-    except:
-        raise ImportError(
-            "Please install extra dependencies with 'pip install torchpq cupy' to use K-means clustering"
-        )
-
     if torch.numel == 0:
         meta = {
             "shape": list(params.shape),
@@ -358,11 +655,24 @@ def _compress_kmeans(
         }
         return meta
 
-    kmeans = KMeans(n_clusters=n_clusters, distance="manhattan", verbose=verbose)
-    x = params.reshape(params.shape[0], -1).permute(1, 0).contiguous()
-    labels = kmeans.fit(x)
-    labels = labels.detach().cpu().numpy()
-    centroids = kmeans.centroids.permute(1, 0)
+    x = params.reshape(params.shape[0], -1)
+    if kmeans_backend == "torch":
+        centroids, labels = kmeans(x.detach(), n_clusters, verbose=verbose)
+        labels = labels.cpu().numpy()
+    elif kmeans_backend == "torchpq":
+        try:
+            from torchpq.clustering import KMeans
+        except:
+            raise ImportError(
+                "Please install extra dependencies with 'pip install torchpq cupy' to use K-means clustering"
+            )
+
+        kmeans_pq = KMeans(n_clusters=n_clusters, distance="manhattan", verbose=verbose)
+        labels = kmeans_pq.fit(x.permute(1, 0).contiguous())
+        labels = labels.detach().cpu().numpy()
+        centroids = kmeans_pq.centroids.permute(1, 0)
+    else:
+        raise ValueError(f"Unknown K-means backend: {kmeans_backend}")
 
     mins = torch.min(centroids)
     maxs = torch.max(centroids)
@@ -389,12 +699,16 @@ def _compress_kmeans(
 
 
 def _decompress_kmeans(
-    compress_dir: str, param_name: str, meta: Dict[str, Any], **kwargs
+    compress_dir: Union[str, SplatContainer],
+    param_name: str,
+    meta: Dict[str, Any],
+    **kwargs,
 ) -> Tensor:
     """Decompress parameters from K-means compression.
 
     Args:
-        compress_dir (str): compression directory
+        compress_dir (Union[str, SplatContainer]): compression directory, or single-file
+            container
         param_name (str): parameter field name
         meta (Dict[str, Any]): metadata
 
@@ -405,9 +719,10 @@ def _decompress_kmeans(
         params = torch.zeros(meta["shape"], dtype=getattr(torch, meta["dtype"]))
         return meta
 
-    npz_dict = np.load(os.path.join(compress_dir, f"{param_name}.npz"))
-    centroids_quant = npz_dict["centroids"]
-    labels = npz_dict["labels"]
+    with _open(compress_dir, f"{param_name}.npz") as f:
+        npz_dict = np.load(f)
+        centroids_quant = npz_dict["centroids"]
+        labels = npz_dict["labels"]
 
     centroids_norm = centroids_quant / (2 ** meta["quantization"] - 1)
     centroids_norm = torch.tensor(centroids_norm)
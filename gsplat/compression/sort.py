@@ -1,10 +1,14 @@
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 import torch
 from torch import Tensor
 
 
-def sort_splats(splats: Dict[str, Tensor], verbose: bool = True) -> Dict[str, Tensor]:
+def sort_splats(
+    splats: Dict[str, Tensor],
+    verbose: bool = True,
+    grid_shape: Optional[Tuple[int, int]] = None,
+) -> Dict[str, Tensor]:
     """Sort splats with Parallel Linear Assignment Sorting from the paper `Compact 3D Scene Representation via
     Self-Organizing Gaussian Grids <https://arxiv.org/pdf/2312.13299>`_.
 
@@ -14,6 +18,8 @@ def sort_splats(splats: Dict[str, Tensor], verbose: bool = True) -> Dict[str, Te
     Args:
         splats (Dict[str, Tensor]): splats
         verbose (bool, optional): Whether to print verbose information. Default to True.
+        grid_shape (Tuple[int, int], optional): (H, W) of the grid to sort the splats
+            in, with H * W splats. Default to None, the square grid.
 
     Returns:
         Dict[str, Tensor]: sorted splats
@@ -26,16 +32,20 @@ def sort_splats(splats: Dict[str, Tensor], verbose: bool = True) -> Dict[str, Te
         )
 
     n_gs = len(splats["means"])
-    n_sidelen = int(n_gs**0.5)
-    assert n_sidelen**2 == n_gs, "Must be a perfect square"
+    if grid_shape is None:
+        n_sidelen = int(n_gs**0.5)
+        assert n_sidelen**2 == n_gs, "Must be a perfect square"
+        grid_shape = (n_sidelen, n_sidelen)
+    assert grid_shape[0] * grid_shape[1] == n_gs, (grid_shape, n_gs)
 
-    sort_keys = [k for k in splats if k != "shN"]
+    # masks are carried along, but not sorted on
+    sort_keys = [k for k in splats if k != "shN" and splats[k].is_floating_point()]
     params_to_sort = torch.cat([splats[k].reshape(n_gs, -1) for k in sort_keys], dim=-1)
     shuffled_indices = torch.randperm(
         params_to_sort.shape[0], device=params_to_sort.device
     )
     params_to_sort = params_to_sort[shuffled_indices]
-    grid = params_to_sort.reshape((n_sidelen, n_sidelen, -1))
+    grid = params_to_sort.reshape((*grid_shape, -1))
     _, sorted_indices = sort_with_plas(
         grid.permute(2, 0, 1), improvement_break=1e-4, verbose=verbose
     )
@@ -44,3 +54,174 @@ def sort_splats(splats: Dict[str, Tensor], verbose: bool = True) -> Dict[str, Te
     for k, v in splats.items():
         splats[k] = v[sorted_indices]
     return splats
+
+
+def sort_splats_morton(
+    splats: Dict[str, Tensor],
+    verbose: bool = True,
+    grid_shape: Optional[Tuple[int, int]] = None,
+    swap_iters: int = 0,
+) -> Dict[str, Tensor]:
+    """Sort splats along a space-filling curve, without PLAS or a GPU.
+
+    The splats are ordered by interleaving the Morton codes of their means and of
+    their colors ("sh0"), and laid out on the grid along a 2D Z-order curve, so that
+    splats close in position and color end up in nearby pixels. Optionally, the
+    layout is then refined by `swap_iters` passes of swapping neighboring pixels,
+    see `_swap_refine()`.
+
+    Args:
+        splats (Dict[str, Tensor]): splats
+        verbose (bool, optional): Whether to print verbose information. Default to True.
+        grid_shape (Tuple[int, int], optional): (H, W) of the grid to sort the splats
+            in, with H * W splats. Default to None, the square grid.
+        swap_iters (int, optional): Number of passes of the neighbor-swap refinement.
+            Default to 0.
+
+    Returns:
+        Dict[str, Tensor]: sorted splats
+    """
+    from gsplat.exporter import encode_morton3_vec
+
+    n_gs = len(splats["means"])
+    if grid_shape is None:
+        n_sidelen = int(n_gs**0.5)
+        assert n_sidelen**2 == n_gs, "Must be a perfect square"
+        grid_shape = (n_sidelen, n_sidelen)
+    assert grid_shape[0] * grid_shape[1] == n_gs, (grid_shape, n_gs)
+
+    # 10-bit Morton codes of the means and the colors, interleaved by 3-bit groups
+    codes = []
+    for k in ["means", "sh0"]:
+        if k not in splats:
+            continue
+        q = _normalize(splats[k].reshape(n_gs, -1)[:, :3].float())
+        q = (q * 1023).round().long()
+        codes.append(encode_morton3_vec(q[:, 0], q[:, 1], q[:, 2]))
+    key = torch.zeros(n_gs, dtype=torch.long, device=splats["means"].device)
+    for level in range(10):
+        for i, code in enumerate(codes):
+            group = (code >> (3 * level)) & 7
+            key |= group << (len(codes) * 3 * level + 3 * (len(codes) - 1 - i))
+    order = torch.argsort(key, stable=True)
+
+    # the i-th splat of the order goes to the i-th cell of the 2D curve
+    sorted_indices = torch.empty_like(order)
+    sorted_indices[_curve_cells(*grid_shape, device=order.device)] = order
+
+    if swap_iters > 0:
+        sort_keys = [k for k in splats if k != "shN" and splats[k].is_floating_point()]
+        features = torch.cat(
+            [_normalize(splats[k].reshape(n_gs, -1).float()) for k in sort_keys],
+            dim=-1,
+        )
+        sorted_indices = _swap_refine(
+            features, sorted_indices.reshape(grid_shape), swap_iters, verbose
+        ).flatten()
+
+    for k, v in splats.items():
+        splats[k] = v[sorted_indices]
+    return splats
+
+
+def _normalize(x: Tensor) -> Tensor:
+    """Normalizes each channel of [N, C] to [0, 1], like the PNG quantization."""
+    mins = x.amin(dim=0)
+    maxs = x.amax(dim=0)
+    return (x - mins) / (maxs - mins).clamp_min(1e-12)
+
+
+def _part1by1(x: Tensor) -> Tensor:
+    """Interleaves the 16 lower bits of x with 0s."""
+    x = x & 0x0000FFFF
+    x = (x ^ (x << 8)) & 0x00FF00FF
+    x = (x ^ (x << 4)) & 0x0F0F0F0F
+    x = (x ^ (x << 2)) & 0x33333333
+    x = (x ^ (x << 1)) & 0x55555555
+    return x
+
+
+def _curve_cells(height: int, width: int, device=None) -> Tensor:
+    """The flat indices of the cells of a (height, width) grid, in the order of a
+    2D Z-order curve, which is cut to the grid when it is not a power of two."""
+    rows, cols = torch.meshgrid(
+        torch.arange(height, device=device),
+        torch.arange(width, device=device),
+        indexing="ij",
+    )
+    codes = (_part1by1(rows) << 1) | _part1by1(cols)
+    return torch.argsort(codes.flatten())
+
+
+def _swap_refine(
+    features: Tensor, grid: Tensor, n_iters: int, verbose: bool = False
+) -> Tensor:
+    """Refines a layout of splats by swapping pairs of neighboring cells.
+
+    Each pass goes over the disjoint pairs of horizontal, then vertical neighbors,
+    at even and then odd offsets, and swaps all the pairs at once where the swap
+    reduces the squared feature differences of both cells to their other 4-neighbors.
+
+    Args:
+        features (Tensor): features of the splats. [N, C]
+        grid (Tensor): index of the splat in each cell. [H, W]
+        n_iters (int): number of passes
+        verbose (bool, optional): Whether to print verbose information. Default to False.
+
+    Returns:
+        Tensor: the refined grid. [H, W]
+    """
+    grid = grid.clone()
+    for it in range(n_iters):
+        n_swaps = 0
+        for dim in [1, 0]:
+            for offset in [0, 1]:
+                n_swaps += _swap_pairs(features, grid, dim, offset)
+        if verbose:
+            print(f"Swap refinement pass {it + 1}: {n_swaps} swaps")
+        if n_swaps == 0:
+            break
+    return grid
+
+
+def _swap_pairs(features: Tensor, grid: Tensor, dim: int, offset: int) -> int:
+    """Swaps in place the pairs of cells (i, i + 1) along `dim` with i = offset mod 2
+    that reduce the cost, see `_swap_refine()`. Returns the number of swaps."""
+    H, W = grid.shape
+    f = features[grid]  # [H, W, C]
+    sq = f.square().sum(dim=-1)  # [H, W]
+
+    # sums of the features, of their squared norms, and counts over the 4-neighbors
+    f_pad = torch.nn.functional.pad(f, (0, 0, 1, 1, 1, 1))
+    sq_pad = torch.nn.functional.pad(sq, (1, 1, 1, 1))
+    ones_pad = torch.nn.functional.pad(torch.ones_like(sq), (1, 1, 1, 1))
+    shifts = [(0, 1), (2, 1), (1, 0), (1, 2)]
+    S = sum(f_pad[r : r + H, c : c + W] for r, c in shifts)
+    Q = sum(sq_pad[r : r + H, c : c + W] for r, c in shifts)
+    K = sum(ones_pad[r : r + H, c : c + W] for r, c in shifts)
+
+    # the pairs (a, b), where a is at index i and b at i + 1 along `dim`
+    n = grid.shape[dim]
+    ia = torch.arange(offset, n - 1, 2, device=grid.device)
+    if len(ia) == 0:
+        return 0
+    sel_a = (slice(None), ia) if dim == 1 else (ia, slice(None))
+    sel_b = (slice(None), ia + 1) if dim == 1 else (ia + 1, slice(None))
+    fa, fb = f[sel_a], f[sel_b]
+    # neighbors of each cell, except the other cell of the pair
+    Sa, Qa, Ka = S[sel_a] - fb, Q[sel_a] - sq[sel_b], K[sel_a] - 1
+    Sb, Qb, Kb = S[sel_b] - fa, Q[sel_b] - sq[sel_a], K[sel_b] - 1
+
+    def cost(x, x_sq, S, Q, K):
+        # sum of |x - f_n|^2 over the neighbors n
+        return K * x_sq - 2 * (x * S).sum(dim=-1) + Q
+
+    sq_a, sq_b = sq[sel_a], sq[sel_b]
+    before = cost(fa, sq_a, Sa, Qa, Ka) + cost(fb, sq_b, Sb, Qb, Kb)
+    after = cost(fb, sq_b, Sa, Qa, Ka) + cost(fa, sq_a, Sb, Qb, Kb)
+    swap = after < before - 1e-6
+
+    ga, gb = grid[sel_a], grid[sel_b]
+    grid[sel_a] = torch.where(swap, gb, ga)
+    grid[sel_b] = torch.where(swap, ga, gb)
+    return int(swap.sum().item())
@@ -1,12 +1,19 @@
-import struct
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple, Union
 
 import math
+import threading
 import torch
 import torch.nn.functional as F
 from torch import Tensor
 from typing_extensions import Literal, assert_never
 
+# Same thresholds as the CUDA rasterizer: Gaussians with an alpha below
+# `_ALPHA_THRESHOLD` are skipped, and a pixel stops compositing once its
+# transmittance would drop to `_TRANSMITTANCE_THRESHOLD`.
+_ALPHA_THRESHOLD = 1.0 / 255.0
+_TRANSMITTANCE_THRESHOLD = 1e-4
+
 
 def _quat_to_rotmat(quats: Tensor) -> Tensor:
     """Convert quaternion to rotation matrix."""
@@ -53,31 +60,114 @@ def _quat_scale_to_covar_preci(
     batch_dims = quats.shape[:-1]
     assert quats.shape == batch_dims + (4,), quats.shape
     assert scales.shape == batch_dims + (3,), scales.shape
-    R = _quat_to_rotmat(quats)  # [..., 3, 3]
+    if triu:
+        if compute_covar:
+            covars = _quat_scale_to_triu(quats, scales**2)  # [..., 6]
+        if compute_preci:
+            precis = _quat_scale_to_triu(quats, 1 / scales**2)  # [..., 6]
+        return covars if compute_covar else None, precis if compute_preci else None
 
+    R = _quat_to_rotmat(quats)  # [..., 3, 3]
     if compute_covar:
         M = R * scales[..., None, :]  # [..., 3, 3]
         covars = torch.einsum("...ij,...kj -> ...ik", M, M)  # [..., 3, 3]
-        if triu:
-            covars = covars.reshape(batch_dims + (9,))  # [..., 9]
-            covars = (
-                covars[..., [0, 1, 2, 4, 5, 8]] + covars[..., [0, 3, 6, 4, 7, 8]]
-            ) / 2.0  # [..., 6]
     if compute_preci:
         P = R * (1 / scales[..., None, :])  # [..., 3, 3]
         precis = torch.einsum("...ij,...kj -> ...ik", P, P)  # [..., 3, 3]
-        if triu:
-            precis = precis.reshape(batch_dims + (9,))  # [..., 9]
-            precis = (
-                precis[..., [0, 1, 2, 4, 5, 8]] + precis[..., [0, 3, 6, 4, 7, 8]]
-            ) / 2.0  # [..., 6]
 
     return covars if compute_covar else None, precis if compute_preci else None
 
 
+# Row and column of the entries of the upper triangle of a 3x3 symmetric matrix, in
+# the order of the [..., 6] layout: xx, xy, xz, yy, yz, zz.
+_TRIU_ROWS = [0, 0, 0, 1, 1, 2]
+_TRIU_COLS = [0, 1, 2, 1, 2, 2]
+
+
+def _quat_scale_to_triu(
+    quats: Tensor,  # [..., 4],
+    variances: Tensor,  # [..., 3],
+) -> Tensor:
+    """Upper triangle of `R @ diag(variances) @ R^T` in closed form. [..., 6]
+
+    The entries of `R` are computed from the quaternion terms and each entry (i, j)
+    of the result is `sum_k R[i, k] * R[j, k] * variances[k]`, without building the
+    3x3 matrices.
+    """
+    w, x, y, z = F.normalize(quats, p=2, dim=-1).unbind(dim=-1)
+    xx, yy, zz = x * x, y * y, z * z
+    xy, xz, yz = x * y, x * z, y * z
+    wx, wy, wz = w * x, w * y, w * z
+    r00, r01, r02 = 1 - 2 * (yy + zz), 2 * (xy - wz), 2 * (xz + wy)
+    r10, r11, r12 = 2 * (xy + wz), 1 - 2 * (xx + zz), 2 * (yz - wx)
+    r20, r21, r22 = 2 * (xz - wy), 2 * (yz + wx), 1 - 2 * (xx + yy)
+    d0, d1, d2 = variances.unbind(dim=-1)
+    return torch.stack(
+        [
+            r00 * r00 * d0 + r01 * r01 * d1 + r02 * r02 * d2,
+            r00 * r10 * d0 + r01 * r11 * d1 + r02 * r12 * d2,
+            r00 * r20 * d0 + r01 * r21 * d1 + r02 * r22 * d2,
+            r10 * r10 * d0 + r11 * r11 * d1 + r12 * r12 * d2,
+            r10 * r20 * d0 + r11 * r21 * d1 + r12 * r22 * d2,
+            r20 * r20 * d0 + r21 * r21 * d1 + r22 * r22 * d2,
+        ],
+        dim=-1,
+    )
+
+
+def _rotation_triu_matrix(R: Tensor) -> Tensor:  # [..., 3, 3]
+    """The linear map of a rotation `R @ covars @ R^T` on the [..., 6] layout.
+
+    Entry (i, j) of the rotated covariance is the sum of `R[i, a] * R[j, b] *
+    covars[a, b]` over all (a, b), where (a, b) and (b, a) share one slot. [..., 6, 6]
+    """
+    R_rows = R[..., _TRIU_ROWS, :]  # [..., 6, 3]
+    R_cols = R[..., _TRIU_COLS, :]  # [..., 6, 3]
+    T = R_rows[..., _TRIU_ROWS] * R_cols[..., _TRIU_COLS]  # [..., 6, 6]
+    off_diag = torch.tensor(
+        [a != b for a, b in zip(_TRIU_ROWS, _TRIU_COLS)], device=R.device
+    )
+    return T + off_diag * R_rows[..., _TRIU_COLS] * R_cols[..., _TRIU_ROWS]
+
+
+def _project_covars(
+    J: Tensor,  # [..., 2, 3]
+    covars: Tensor,  # [..., 3, 3] or [..., 6]
+) -> Tensor:
+    """`J @ covars @ J^T` for full or upper-triangular covariances. [..., 2, 2]
+
+    The upper-triangular covariances are projected in closed form, without
+    expanding them to 3x3 matrices: with `w = covars @ j` for each row `j` of `J`,
+    the three unique entries of the result are the dot products of the rows with
+    the `w`s.
+    """
+    if covars.shape[-1] != 6:
+        return torch.einsum("...ij,...jk,...kl->...il", J, covars, J.transpose(-1, -2))
+
+    xx, xy, xz, yy, yz, zz = covars.unbind(dim=-1)
+
+    def covars_dot(j: Tensor) -> Tuple[Tensor, Tensor, Tensor]:
+        j0, j1, j2 = j.unbind(dim=-1)
+        return (
+            xx * j0 + xy * j1 + xz * j2,
+            xy * j0 + yy * j1 + yz * j2,
+            xz * j0 + yz * j1 + zz * j2,
+        )
+
+    ju, jv = J.unbind(dim=-2)  # [..., 3]
+    wu0, wu1, wu2 = covars_dot(ju)
+    wv0, wv1, wv2 = covars_dot(jv)
+    ju0, ju1, ju2 = ju.unbind(dim=-1)
+    jv0, jv1, jv2 = jv.unbind(dim=-1)
+    a = ju0 * wu0 + ju1 * wu1 + ju2 * wu2
+    b = ju0 * wv0 + ju1 * wv1 + ju2 * wv2
+    c = jv0 * wv0 + jv1 * wv1 + jv2 * wv2
+    return torch.stack([a, b, b, c], dim=-1).reshape(covars.shape[:-1] + (2, 2))
+
+
 def _persp_proj(
     means: Tensor,  # [..., C, N, 3]
-    covars: Tensor,  # [..., C, N, 3, 3]
+    covars: Tensor,  # [..., C, N, 3, 3] or [..., C, N, 6]
     Ks: Tensor,  # [..., C, 3, 3]
     width: int,
     height: int,
@@ -86,7 +176,8 @@ def _persp_proj(
 
     Args:
         means: Gaussian means in camera coordinate system. [..., C, N, 3].
-        covars: Gaussian covariances in camera coordinate system. [..., C, N, 3, 3].
+        covars: Gaussian covariances in camera coordinate system. [..., C, N, 3, 3]
+            or the upper triangle [..., C, N, 6].
         Ks: Camera intrinsics. [..., C, 3, 3].
         width: Image width.
         height: Image height.
@@ -100,7 +191,10 @@ def _persp_proj(
     batch_dims = means.shape[:-3]
     C, N = means.shape[-3:-1]
     assert means.shape == batch_dims + (C, N, 3), means.shape
-    assert covars.shape == batch_dims + (C, N, 3, 3), covars.shape
+    assert covars.shape in (
+        batch_dims + (C, N, 3, 3),
+        batch_dims + (C, N, 6),
+    ), covars.shape
     assert Ks.shape == batch_dims + (C, 3, 3), Ks.shape
 
     tx, ty, tz = torch.unbind(means, dim=-1)  # [..., C, N]
@@ -125,7 +219,7 @@ def _persp_proj(
         [fx / tz, O, -fx * tx / tz2, O, fy / tz, -fy * ty / tz2], dim=-1
     ).reshape(batch_dims + (C, N, 2, 3))
 
-    cov2d = torch.einsum("...ij,...jk,...kl->...il", J, covars, J.transpose(-1, -2))
+    cov2d = _project_covars(J, covars)
     means2d = torch.einsum(
         "...ij,...nj->...ni", Ks[..., :2, :3], means
     )  # [..., C, N, 2]
@@ -135,7 +229,7 @@ def _persp_proj(
 
 def _fisheye_proj(
     means: Tensor,  # [..., C, N, 3]
-    covars: Tensor,  # [..., C, N, 3, 3]
+    covars: Tensor,  # [..., C, N, 3, 3] or [..., C, N, 6]
     Ks: Tensor,  # [..., C, 3, 3]
     width: int,
     height: int,
@@ -144,7 +238,8 @@ def _fisheye_proj(
 
     Args:
         means: Gaussian means in camera coordinate system. [..., C, N, 3].
-        covars: Gaussian covariances in camera coordinate system. [..., C, N, 3, 3].
+        covars: Gaussian covariances in camera coordinate system. [..., C, N, 3, 3]
+            or the upper triangle [..., C, N, 6].
         Ks: Camera intrinsics. [..., C, 3, 3].
         width: Image width.
         height: Image height.
@@ -158,7 +253,10 @@ def _fisheye_proj(
     batch_dims = means.shape[:-3]
     C, N = means.shape[-3:-1]
     assert means.shape == batch_dims + (C, N, 3), means.shape
-    assert covars.shape == batch_dims + (C, N, 3, 3), covars.shape
+    assert covars.shape in (
+        batch_dims + (C, N, 3, 3),
+        batch_dims + (C, N, 6),
+    ), covars.shape
     assert Ks.shape == batch_dims + (C, 3, 3), Ks.shape
 
     x, y, z = torch.unbind(means, dim=-1)  # [..., C, N]
@@ -198,13 +296,13 @@ def _fisheye_proj(
         dim=-1,
     ).reshape(batch_dims + (C, N, 2, 3))
 
-    cov2d = torch.einsum("...ij,...jk,...kl->...il", J, covars, J.transpose(-1, -2))
+    cov2d = _project_covars(J, covars)
     return means2d, cov2d  # [..., C, N, 2], [..., C, N, 2, 2]
 
 
 def _ortho_proj(
     means: Tensor,  # [..., C, N, 3]
-    covars: Tensor,  # [..., C, N, 3, 3]
+    covars: Tensor,  # [..., C, N, 3, 3] or [..., C, N, 6]
     Ks: Tensor,  # [..., C, 3, 3]
     width: int,
     height: int,
@@ -213,7 +311,8 @@ def _ortho_proj(
 
     Args:
         means: Gaussian means in camera coordinate system. [..., C, N, 3].
-        covars: Gaussian covariances in camera coordinate system. [..., C, N, 3, 3].
+        covars: Gaussian covariances in camera coordinate system. [..., C, N, 3, 3]
+            or the upper triangle [..., C, N, 6].
         Ks: Camera intrinsics. [..., C, 3, 3].
         width: Image width.
         height: Image height.
@@ -227,7 +326,10 @@ def _ortho_proj(
     batch_dims = means.shape[:-3]
     C, N = means.shape[-3:-1]
     assert means.shape == batch_dims + (C, N, 3), means.shape
-    assert covars.shape == batch_dims + (C, N, 3, 3), covars.shape
+    assert covars.shape in (
+        batch_dims + (C, N, 3, 3),
+        batch_dims + (C, N, 6),
+    ), covars.shape
     assert Ks.shape == batch_dims + (C, 3, 3), Ks.shape
 
     fx = Ks[..., 0, 0, None]  # [..., C, 1]
@@ -240,7 +342,7 @@ def _ortho_proj(
         .repeat([1] * len(batch_dims) + [1, N, 1, 1])
     )
 
-    cov2d = torch.einsum("...ij,...jk,...kl->...il", J, covars, J.transpose(-1, -2))
+    cov2d = _project_covars(J, covars)
     means2d = (
         means[..., :2] * Ks[..., None, [0, 1], [0, 1]] + Ks[..., None, [0, 1], [2, 2]]
     )  # [..., C, N, 2]
@@ -249,27 +351,32 @@ def _ortho_proj(
 
 def _world_to_cam(
     means: Tensor,  # [..., N, 3]
-    covars: Tensor,  # [..., N, 3, 3]
+    covars: Tensor,  # [..., N, 3, 3] or [..., N, 6]
     viewmats: Tensor,  # [..., C, 4, 4]
 ) -> Tuple[Tensor, Tensor]:
     """PyTorch implementation of world to camera transformation on Gaussians.
 
     Args:
         means: Gaussian means in world coordinate system. [..., N, 3].
-        covars: Gaussian covariances in world coordinate system. [..., N, 3, 3].
+        covars: Gaussian covariances in world coordinate system. [..., N, 3, 3]
+            or the upper triangle [..., N, 6].
         viewmats: world to camera transformation matrices. [..., C, 4, 4].
 
     Returns:
         A tuple:
 
         - **means_c**: Gaussian means in camera coordinate system. [..., C, N, 3].
-        - **covars_c**: Gaussian covariances in camera coordinate system. [..., C, N, 3, 3].
+        - **covars_c**: Gaussian covariances in camera coordinate system. [..., C, N, 3, 3]
+          or the upper triangle [..., C, N, 6], in the same layout as `covars`.
     """
     batch_dims = means.shape[:-2]
     N = means.shape[-2]
     C = viewmats.shape[-3]
     assert means.shape == batch_dims + (N, 3), means.shape
-    assert covars.shape == batch_dims + (N, 3, 3), covars.shape
+    assert covars.shape in (
+        batch_dims + (N, 3, 3),
+        batch_dims + (N, 6),
+    ), covars.shape
     assert viewmats.shape == batch_dims + (C, 4, 4), viewmats.shape
 
     R = viewmats[..., :3, :3]  # [..., C, 3, 3]
@@ -277,15 +384,21 @@ def _world_to_cam(
     means_c = (
         torch.einsum("...cij,...nj->...cni", R, means) + t[..., None, :]
     )  # [..., C, N, 3]
-    covars_c = torch.einsum(
-        "...cij,...njk,...clk->...cnil", R, covars, R
-    )  # [..., C, N, 3, 3]
+    if covars.shape[-1] == 6:
+        # one [N, 6] x [6, 6] matmul per camera
+        covars_c = torch.einsum(
+            "...cpq,...nq->...cnp", _rotation_triu_matrix(R), covars
+        )  # [..., C, N, 6]
+    else:
+        covars_c = torch.einsum(
+            "...cij,...njk,...clk->...cnil", R, covars, R
+        )  # [..., C, N, 3, 3]
     return means_c, covars_c
 
 
 def _fully_fused_projection(
     means: Tensor,  # [..., N, 3]
-    covars: Tensor,  # [..., N, 3, 3]
+    covars: Tensor,  # [..., N, 3, 3] or [..., N, 6]
     viewmats: Tensor,  # [..., C, 4, 4]
     Ks: Tensor,  # [..., C, 3, 3]
     width: int,
@@ -295,28 +408,80 @@ def _fully_fused_projection(
     far_plane: float = 1e10,
     calc_compensations: bool = False,
     camera_model: Literal["pinhole", "ortho", "fisheye", "ftheta"] = "pinhole",
-) -> Tuple[Tensor, Tensor, Tensor, Tensor, Optional[Tensor]]:
+    radius_clip: float = 0.0,
+    opacities: Optional[Tensor] = None,  # [..., N]
+    packed: bool = False,
+) -> Tuple[Tensor, ...]:
     """PyTorch implementation of `gsplat.cuda._wrapper.fully_fused_projection()`
 
     .. note::
 
         This is a minimal implementation of fully fused version, which has more
         arguments. Not all arguments are supported.
+
+    The covariances could be either full [..., N, 3, 3] matrices or their upper
+    triangle [..., N, 6], which is rotated to the cameras with a single [N, 6] x
+    [6, 6] matmul per camera.
+
+    If `packed` is True, the (camera, Gaussian) pairs are first culled by the view
+    frustum on their means alone, and the covariances and conics are only computed
+    for the remaining pairs. The outputs are packed as in the fully fused version:
+    `(batch_ids, camera_ids, gaussian_ids, radii, means2d, depths, conics,
+    compensations)`.
     """
     batch_dims = means.shape[:-2]
     N = means.shape[-2]
     C = viewmats.shape[-3]
     assert means.shape == batch_dims + (N, 3), means.shape
-    assert covars.shape == batch_dims + (N, 3, 3), covars.shape
+    assert covars.shape in (
+        batch_dims + (N, 3, 3),
+        batch_dims + (N, 6),
+    ), covars.shape
     assert viewmats.shape == batch_dims + (C, 4, 4), viewmats.shape
     assert Ks.shape == batch_dims + (C, 3, 3), Ks.shape
+    if opacities is not None:
+        assert opacities.shape == batch_dims + (N,), opacities.shape
 
     assert (
         camera_model != "ftheta"
     ), "ftheta camera is only supported via UT, please set with_ut=True in the rasterization()"
 
+    kwargs = dict(
+        width=width,
+        height=height,
+        eps2d=eps2d,
+        near_plane=near_plane,
+        far_plane=far_plane,
+        calc_compensations=calc_compensations,
+        camera_model=camera_model,
+        radius_clip=radius_clip,
+    )
+    if packed:
+        return _fully_fused_projection_packed(
+            means, covars, viewmats, Ks, opacities=opacities, **kwargs
+        )
+
     means_c, covars_c = _world_to_cam(means, covars, viewmats)
+    if opacities is not None:
+        opacities = opacities[..., None, :]  # [..., 1, N]
+    return _project_to_image(means_c, covars_c, Ks, opacities=opacities, **kwargs)
+
 
+def _project_to_image(
+    means_c: Tensor,  # [..., C, N, 3]
+    covars_c: Tensor,  # [..., C, N, 3, 3] or [..., C, N, 6]
+    Ks: Tensor,  # [..., C, 3, 3]
+    width: int,
+    height: int,
+    eps2d: float,
+    near_plane: float,
+    far_plane: float,
+    calc_compensations: bool,
+    camera_model: Literal["pinhole", "ortho", "fisheye"],
+    radius_clip: float,
+    opacities: Optional[Tensor],  # broadcastable to [..., C, N]
+) -> Tuple[Tensor, Tensor, Tensor, Tensor, Optional[Tensor]]:
+    """Projects camera-space Gaussians to the image, and computes their radii."""
     if camera_model == "ortho":
         means2d, covars2d = _ortho_proj(means_c, covars_c, Ks, width, height)
     elif camera_model == "fisheye":
@@ -330,7 +495,9 @@ def _fully_fused_projection(
         covars2d[..., 0, 0] * covars2d[..., 1, 1]
         - covars2d[..., 0, 1] * covars2d[..., 1, 0]
     )
-    covars2d = covars2d + torch.eye(2, device=means.device, dtype=means.dtype) * eps2d
+    covars2d = (
+        covars2d + torch.eye(2, device=means_c.device, dtype=means_c.dtype) * eps2d
+    )
 
     det = (
         covars2d[..., 0, 0] * covars2d[..., 1, 1]
@@ -353,13 +520,27 @@ def _fully_fused_projection(
     )  # [..., C, N, 3]
 
     depths = means_c[..., 2]  # [..., C, N]
+    valid = (det > 0) & (depths > near_plane) & (depths < far_plane)
+
+    extend = torch.full_like(depths, 3.33)
+    if opacities is not None:
+        if compensations is not None:
+            # we assume compensation term will be applied later on.
+            opacities = opacities * compensations
+        valid = valid & (opacities >= _ALPHA_THRESHOLD)
+        # Compute opacity-aware bounding box.
+        # https://arxiv.org/pdf/2402.00525 Section B.2
+        extend = torch.minimum(
+            extend,
+            torch.sqrt(2.0 * torch.log(opacities / _ALPHA_THRESHOLD).clamp(min=0.0)),
+        )
 
-    radius_x = torch.ceil(3.33 * torch.sqrt(covars2d[..., 0, 0]))
-    radius_y = torch.ceil(3.33 * torch.sqrt(covars2d[..., 1, 1]))
+    radius_x = torch.ceil(extend * torch.sqrt(covars2d[..., 0, 0]))
+    radius_y = torch.ceil(extend * torch.sqrt(covars2d[..., 1, 1]))
 
     radius = torch.stack([radius_x, radius_y], dim=-1)  # [..., C, N, 2]
 
-    valid = (det > 0) & (depths > near_plane) & (depths < far_plane)
+    valid = valid & ((radius_x > radius_clip) | (radius_y > radius_clip))
     radius[~valid] = 0.0
 
     inside = (
@@ -374,36 +555,355 @@ def _fully_fused_projection(
     return radii, means2d, depths, conics, compensations
 
 
+def _fully_fused_projection_packed(
+    means: Tensor,  # [..., N, 3]
+    covars: Tensor,  # [..., N, 3, 3] or [..., N, 6]
+    viewmats: Tensor,  # [..., C, 4, 4]
+    Ks: Tensor,  # [..., C, 3, 3]
+    width: int,
+    height: int,
+    eps2d: float,
+    near_plane: float,
+    far_plane: float,
+    calc_compensations: bool,
+    camera_model: Literal["pinhole", "ortho", "fisheye"],
+    radius_clip: float,
+    opacities: Optional[Tensor],  # [..., N]
+) -> Tuple[Tensor, ...]:
+    """Packed version of `_fully_fused_projection()`, which never materializes the
+    per-camera covariances of all the Gaussians.
+    """
+    batch_dims = means.shape[:-2]
+    N = means.shape[-2]
+    C = viewmats.shape[-3]
+    B = math.prod(batch_dims)
+    means = means.reshape(B, N, 3)
+    triu = covars.shape[-1] == 6
+    covars = covars.reshape((B, N, 6) if triu else (B, N, 3, 3))
+    viewmats = viewmats.reshape(B, C, 4, 4)
+    Ks = Ks.reshape(B, C, 3, 3)
+    if opacities is not None:
+        opacities = opacities.reshape(B, N)
+
+    R = viewmats[..., :3, :3]  # [B, C, 3, 3]
+    t = viewmats[..., :3, 3]  # [B, C, 3]
+    means_c = torch.einsum("bcij,bnj->bcni", R, means) + t[..., None, :]
+
+    # Cull by the frustum with the means only. The projected radius is bounded by
+    # the largest possible variance `|J|^2 * trace(covar)`, where `J` is the
+    # Jacobian of the projection, so the culled pairs would all get zero radii.
+    with torch.no_grad():
+        x, y, z = means_c.unbind(dim=-1)  # [B, C, N]
+        maybe_visible = (z > near_plane) & (z < far_plane)
+        if opacities is not None:
+            # compensations are at most one
+            maybe_visible &= (opacities >= _ALPHA_THRESHOLD)[:, None, :]
+        if camera_model in ("pinhole", "ortho"):
+            fx, fy = Ks[..., 0, 0, None], Ks[..., 1, 1, None]  # [B, C, 1]
+            cx, cy = Ks[..., 0, 2, None], Ks[..., 1, 2, None]  # [B, C, 1]
+            if camera_model == "pinhole":
+                z = z.clamp(min=near_plane)
+                x, y = x / z, y / z
+                jac_x = (fx / z) ** 2 * (1.0 + x * x)
+                jac_y = (fy / z) ** 2 * (1.0 + y * y)
+            else:
+                jac_x, jac_y = fx * fx, fy * fy
+            if triu:
+                var_max = covars[..., [0, 3, 5]].sum(dim=-1)[:, None, :]
+            else:
+                var_max = covars.diagonal(dim1=-2, dim2=-1).sum(dim=-1)[:, None, :]
+            radius_x = 3.33 * torch.sqrt(jac_x * var_max + eps2d) + 1.0
+            radius_y = 3.33 * torch.sqrt(jac_y * var_max + eps2d) + 1.0
+            u, v = fx * x + cx, fy * y + cy
+            maybe_visible &= (u + radius_x > 0) & (u - radius_x < width)
+            maybe_visible &= (v + radius_y > 0) & (v - radius_y < height)
+        batch_ids, camera_ids, gaussian_ids = torch.nonzero(
+            maybe_visible, as_tuple=True
+        )  # [K]
+        view_ids = batch_ids * C + camera_ids  # [K]
+
+    covars = covars[batch_ids, gaussian_ids]  # [K, 6] or [K, 3, 3]
+    if triu:
+        # the 6x6 maps of the rotations on the upper triangle, once per view
+        T = _rotation_triu_matrix(R.reshape(B * C, 3, 3))[view_ids]  # [K, 6, 6]
+        covars_c = torch.einsum("kpq,kq->kp", T, covars)  # [K, 6]
+    else:
+        R = R.reshape(B * C, 3, 3)[view_ids]  # [K, 3, 3]
+        covars_c = torch.einsum("kij,kjl,kml->kim", R, covars, R)  # [K, 3, 3]
+    # every pair is projected as a camera of its own
+    radii, means2d, depths, conics, compensations = _project_to_image(
+        means_c[batch_ids, camera_ids, gaussian_ids][:, None],
+        covars_c[:, None],
+        Ks.reshape(B * C, 3, 3)[view_ids],
+        width=width,
+        height=height,
+        eps2d=eps2d,
+        near_plane=near_plane,
+        far_plane=far_plane,
+        calc_compensations=calc_compensations,
+        camera_model=camera_model,
+        radius_clip=radius_clip,
+        opacities=(
+            opacities[batch_ids, gaussian_ids][:, None]
+            if opacities is not None
+            else None
+        ),
+    )
+    valid = (radii[:, 0] > 0).all(dim=-1)  # [K]
+    return (
+        batch_ids[valid],
+        camera_ids[valid],
+        gaussian_ids[valid],
+        radii[valid, 0],
+        means2d[valid, 0],
+        depths[valid, 0],
+        conics[valid, 0],
+        compensations[valid, 0] if compensations is not None else None,
+    )
+
+
 @torch.no_grad()
 def _isect_tiles(
-    means2d: Tensor,  # [..., N, 2]
-    radii: Tensor,  # [..., N, 2]
-    depths: Tensor,  # [..., N]
+    means2d: Tensor,  # [..., N, 2] or [nnz, 2]
+    radii: Tensor,  # [..., N, 2] or [nnz, 2]
+    depths: Tensor,  # [..., N] or [nnz]
     tile_size: int,
     tile_width: int,
     tile_height: int,
     sort: bool = True,
-) -> Tuple[Tensor, Tensor, Tensor]:
+    packed: bool = False,
+    n_images: Optional[int] = None,
+    image_ids: Optional[Tensor] = None,  # [nnz]
+    conics: Optional[Tensor] = None,  # [..., N, 3] or [nnz, 3]
+    opacities: Optional[Tensor] = None,  # [..., N] or [nnz]
+    key_bits: Optional[int] = 64,
+    return_offsets: bool = False,
+) -> Union[Tuple[Tensor, Tensor, Tensor], Tuple[Tensor, Tensor, Tensor, Tensor]]:
     """Pytorch implementation of `gsplat.cuda._wrapper.isect_tiles()`.
 
     .. note::
 
         This is a minimal implementation of the fully fused version, which has more
         arguments. Not all arguments are supported.
+
+    With `return_offsets=True` the intersections are bucketed by tile instead of
+    being sorted by their ids. The Gaussians are sorted by depth, which are far
+    fewer than the intersections, and their intersections are enumerated front to
+    back. They are then placed by their `image_id | tile_id` with a counting sort,
+    see `_isect_bucket_order()`, which keeps the depth order within each tile.
+    The tile offsets are counted from the unsorted ids as a by-product, so there
+    is no need for `_isect_offset_encode()`. This requires `sort=True`, and the
+    outputs are identical to the sorted ones for positive depths.
+
+    Returns:
+        A tuple:
+
+        - **Tiles per Gaussian**. [..., N] or [nnz]
+        - **Intersection ids**. [n_isects]
+        - **Flatten ids**. [n_isects]
+        - **Intersection offsets**. [I, tile_height, tile_width], only if
+          `return_offsets` is True.
     """
-    image_dims = means2d.shape[:-2]
-    N = means2d.shape[-2]
-    assert means2d.shape == image_dims + (N, 2), means2d.shape
-    assert radii.shape == image_dims + (N, 2), radii.shape
-    assert depths.shape == image_dims + (N,), depths.shape
+    if packed:
+        nnz = means2d.size(0)
+        assert means2d.shape == (nnz, 2), means2d.shape
+        assert radii.shape == (nnz, 2), radii.shape
+        assert depths.shape == (nnz,), depths.shape
+        assert image_ids is not None, "image_ids is required if packed is True"
+        assert n_images is not None, "n_images is required if packed is True"
+        I = n_images
+        out_shape = (nnz,)
+    else:
+        image_dims = means2d.shape[:-2]
+        N = means2d.shape[-2]
+        assert means2d.shape == image_dims + (N, 2), means2d.shape
+        assert radii.shape == image_dims + (N, 2), radii.shape
+        assert depths.shape == image_dims + (N,), depths.shape
+        I = math.prod(image_dims)
+        out_shape = image_dims + (N,)
+    if conics is not None:
+        assert opacities is not None, "opacities is required with conics"
+        assert conics.shape == out_shape + (3,), conics.shape
+        assert opacities.shape == out_shape, opacities.shape
 
     device = means2d.device
-    I = math.prod(image_dims)
-    means2d = means2d.reshape(I, N, 2)
-    radii = radii.reshape(I, N, 2)
-    depths = depths.reshape(I, N)
+    M = math.prod(out_shape)
+    means2d = means2d.reshape(M, 2)
+    radii = radii.reshape(M, 2)
+    depths = depths.reshape(M)
+
+    tile_mins, tile_maxs, tiles_per_gauss = _isect_tile_bounds(
+        means2d, radii, tile_size, tile_width, tile_height
+    )
+
+    if return_offsets:
+        assert sort, "sort is required if return_offsets is True"
+    key_bits = _isect_key_bits(I, tile_width, tile_height, key_bits)
+    tile_n_bits = (tile_width * tile_height).bit_length()
+
+    # Expand every Gaussian into the tiles of its AABB. The intersections of a
+    # Gaussian are contiguous and enumerated row by row within the AABB, which
+    # is the same order as the CUDA kernel writes them out.
+    if sort and (key_bits == 32 or return_offsets):
+        # The 32-bit keys carry no depth, and neither does the bucketing, so
+        # enumerate the Gaussians front to back and keep that order in each tile.
+        gauss_order = torch.argsort(depths, stable=True)  # [M]
+        counts = tiles_per_gauss[gauss_order]
+    else:
+        gauss_order = None
+        counts = tiles_per_gauss
+    cum_counts = torch.cumsum(counts, dim=0)
+    n_isects = cum_counts[-1].item() if len(cum_counts) > 0 else 0
+    flatten_ids = torch.repeat_interleave(
+        torch.arange(M, dtype=torch.int64, device=device),
+        counts,
+        output_size=n_isects,
+    )  # [n_isects]
+    # position of each intersection within the AABB of its Gaussian
+    local_ids = (
+        torch.arange(n_isects, dtype=torch.int64, device=device)
+        - (cum_counts - counts)[flatten_ids]
+    )  # [n_isects]
+    if gauss_order is not None:
+        flatten_ids = gauss_order[flatten_ids]
+    tile_extents_x = (tile_maxs[..., 0] - tile_mins[..., 0]).long()
+    tile_extents_x = tile_extents_x[flatten_ids]  # [n_isects]
+    tile_mins = tile_mins.long()[flatten_ids]  # [n_isects, 2]
+    tile_x = tile_mins[:, 0] + local_ids % tile_extents_x
+    tile_y = tile_mins[:, 1] + local_ids // tile_extents_x
+    tile_ids = tile_y * tile_width + tile_x  # [n_isects]
+    if packed:
+        image_ids = image_ids.long()[flatten_ids]  # [n_isects]
+    else:
+        image_ids = flatten_ids // N  # [n_isects]
+
+    if key_bits == 32:
+        isect_ids = ((image_ids << tile_n_bits) | tile_ids).int()
+    else:
+        # Reinterpret float bits as int32 (preserving bit pattern), and zero-extend
+        # them into the lower 32 bits of a 64-bit int.
+        depth_ids = depths.float().contiguous().view(torch.int32)
+        depth_ids = depth_ids[flatten_ids].to(torch.int64) & 0xFFFFFFFF
+        isect_ids = (image_ids << (tile_n_bits + 32)) | (tile_ids << 32) | depth_ids
+    flatten_ids = flatten_ids.int()
+
+    if conics is not None:
+        # drop the tiles of the AABB that the ellipse does not touch before sorting
+        tiles_per_gauss, isect_ids, flatten_ids = _cull_isects(
+            isect_ids,
+            flatten_ids,
+            means2d,
+            conics.reshape(M, 3),
+            opacities.reshape(M),
+            tile_size,
+            tile_width,
+            tile_height,
+        )
+
+    if return_offsets:
+        # The start of every tile bucket, counted from the unsorted ids.
+        isect_offsets = _isect_tile_offsets(isect_ids, I, tile_width, tile_height)
+        order = _isect_bucket_order(
+            _isect_tile_keys(isect_ids), I.bit_length() + tile_n_bits
+        )
+        isect_ids, flatten_ids = isect_ids[order], flatten_ids[order]
+    elif sort:
+        # Use a stable sort so that intersections with identical keys keep the
+        # order they are enumerated in, same as the radix sort in the CUDA
+        # implementation.
+        isect_ids, sort_indices = torch.sort(isect_ids, stable=True)
+        flatten_ids = flatten_ids[sort_indices]
+
+    tiles_per_gauss = tiles_per_gauss.reshape(out_shape).int()
+    if return_offsets:
+        return tiles_per_gauss, isect_ids, flatten_ids, isect_offsets
+    return tiles_per_gauss, isect_ids, flatten_ids
+
+
+# Number of bits of the keys that `_isect_bucket_order()` places per pass.
+_BUCKET_RADIX_BITS = 2
+
+
+@torch.no_grad()
+def _isect_bucket_order(tile_keys: Tensor, n_bits: int) -> Tensor:
+    """The stable order of the intersections by their `image_id | tile_id` keys.
+
+    This is a least significant digit radix sort, whose passes are counting sorts
+    of `_BUCKET_RADIX_BITS` bits. Each pass places every intersection at the start
+    of its digit bucket plus its rank within the bucket, which are the prefix sums
+    of the bucket sizes and of the membership of the bucket. There is no
+    comparison sort, and the work is linear in the number of intersections.
+
+    Args:
+        tile_keys: The `image_id | tile_id` of the intersections, in the order to
+            keep within each tile. [n_isects]
+        n_bits: The number of bits of the keys.
+
+    Returns:
+        The indices of the intersections in the bucketed order. [n_isects]
+    """
+    n_digits = 1 << _BUCKET_RADIX_BITS
+    order = torch.arange(len(tile_keys), device=tile_keys.device)
+    for shift in range(0, n_bits, _BUCKET_RADIX_BITS):
+        digits = (tile_keys[order] >> shift) & (n_digits - 1)
+        sizes = torch.bincount(digits, minlength=n_digits)
+        starts = torch.cumsum(sizes, dim=0) - sizes
+        positions = torch.empty_like(order)
+        for digit in range(n_digits):
+            in_bucket = digits == digit
+            ranks = torch.cumsum(in_bucket, dim=0) - 1
+            positions = torch.where(in_bucket, starts[digit] + ranks, positions)
+        order = torch.empty_like(order).scatter_(0, positions, order)
+    return order
+
+
+def _isect_key_bits(
+    I: int, tile_width: int, tile_height: int, key_bits: Optional[int]
+) -> int:
+    """Resolves the width of the intersection ids, choosing it if `key_bits` is None.
+
+    The 64-bit ids are `image_id | tile_id | depth`. The 32-bit ids drop the depth
+    and are only `image_id | tile_id`, which must fit in 31 bits as a signed int32.
+    """
+    image_n_bits = I.bit_length()
+    tile_n_bits = (tile_width * tile_height).bit_length()
+    assert image_n_bits + tile_n_bits + 32 <= 64
+    fits_32_bits = image_n_bits + tile_n_bits <= 31
+    if key_bits is None:
+        return 32 if fits_32_bits else 64
+    assert key_bits in (32, 64), f"key_bits should be 32 or 64, got {key_bits}"
+    assert key_bits == 64 or fits_32_bits, (
+        f"{I} images of {tile_width}x{tile_height} tiles do not fit in 32-bit "
+        "intersection ids"
+    )
+    return key_bits
+
+
+def _isect_tile_keys(isect_ids: Tensor) -> Tensor:
+    """The `image_id | tile_id` part of 32-bit or 64-bit intersection ids, as int64."""
+    if isect_ids.dtype == torch.int32:
+        return isect_ids.long()
+    assert isect_ids.dtype == torch.int64, isect_ids.dtype
+    return isect_ids >> 32
+
+
+@torch.no_grad()
+def _isect_tile_bounds(
+    means2d: Tensor,  # [M, 2]
+    radii: Tensor,  # [M, 2]
+    tile_size: int,
+    tile_width: int,
+    tile_height: int,
+) -> Tuple[Tensor, Tensor, Tensor]:
+    """Tile-space AABBs of the projected Gaussians.
+
+    Returns:
+        A tuple:
 
-    # compute tiles_per_gauss
+        - **tile_mins**: The first tile (inclusive) of the AABB. Int32 [M, 2]
+        - **tile_maxs**: The last tile (exclusive) of the AABB. Int32 [M, 2]
+        - **tiles_per_gauss**: The number of tiles in the AABB. [M]
+    """
     tile_means2d = means2d / tile_size
     tile_radii = radii / tile_size
     tile_mins = torch.floor(tile_means2d - tile_radii).int()
@@ -412,64 +912,95 @@ def _isect_tiles(
     tile_mins[..., 1] = torch.clamp(tile_mins[..., 1], 0, tile_height)
     tile_maxs[..., 0] = torch.clamp(tile_maxs[..., 0], 0, tile_width)
     tile_maxs[..., 1] = torch.clamp(tile_maxs[..., 1], 0, tile_height)
-    tiles_per_gauss = (tile_maxs - tile_mins).prod(dim=-1)  # [..., C, N]
+    tiles_per_gauss = (tile_maxs - tile_mins).prod(dim=-1)  # [M]
     tiles_per_gauss *= (radii > 0.0).all(dim=-1)
+    return tile_mins, tile_maxs, tiles_per_gauss
 
-    n_isects = tiles_per_gauss.sum().item()
-    # store in two int32 tensors instead, otherwise it will trigger out of bounds error
-    # isect_ids = torch.empty(n_isects, dtype=torch.int64, device=device)
-    isect_ids_lo = torch.empty(n_isects, dtype=torch.int32, device=device)
-    isect_ids_hi = torch.empty(n_isects, dtype=torch.int32, device=device)
-    flatten_ids = torch.empty(n_isects, dtype=torch.int32, device=device)
 
-    cum_tiles_per_gauss = torch.cumsum(tiles_per_gauss.flatten(), dim=0)
-    image_n_bits = I.bit_length()
-    tile_n_bits = (tile_width * tile_height).bit_length()
-    assert image_n_bits + tile_n_bits + 32 <= 64
+# Margin on the cutoff of the Gaussian response in `_isect_tile_overlaps()`, so
+# that rounding differences with the rasterizer never drop a contributing tile.
+_ISECT_SIGMA_MARGIN = 1e-3
 
-    def binary(num):
-        return "".join("{:0>8b}".format(c) for c in struct.pack("!f", num))
-
-    def kernel(image_id, gauss_id):
-        if radii[image_id, gauss_id, 0] <= 0.0 or radii[image_id, gauss_id, 1] <= 0.0:
-            return
-        index = image_id * N + gauss_id
-        curr_idx = cum_tiles_per_gauss[index - 1] if index > 0 else 0
-
-        # Reinterpret float bits as int32 (preserving bit pattern)
-        depth_f32 = depths[image_id, gauss_id]
-        depth_id = struct.unpack("i", struct.pack("f", depth_f32))[0]
-        # Store in a 64-bit int, zero-extending to lower 32 bits
-        depth_id = int(depth_id) & 0xFFFFFFFF  # Ensures upper 32 bits are zero
-
-        tile_min = tile_mins[image_id, gauss_id]
-        tile_max = tile_maxs[image_id, gauss_id]
-        for y in range(tile_min[1], tile_max[1]):
-            for x in range(tile_min[0], tile_max[0]):
-                tile_id = y * tile_width + x
-                # isect_ids[curr_idx] = (
-                #     (image_id << (tile_n_bits + 32))
-                #     | (tile_id << 32)
-                #     | depth_id
-                # )
-                isect_ids_lo[curr_idx] = depth_id
-                isect_ids_hi[curr_idx] = (image_id << tile_n_bits) | tile_id
-                flatten_ids[curr_idx] = index  # flattened index
-                curr_idx += 1
-
-    for image_id in range(I):
-        for gauss_id in range(N):
-            kernel(image_id, gauss_id)
-
-    isect_ids = (isect_ids_hi.to(torch.int64) << 32) | (
-        isect_ids_lo.to(torch.int64) & 0xFFFFFFFF
-    )
 
-    if sort:
-        isect_ids, sort_indices = torch.sort(isect_ids)
-        flatten_ids = flatten_ids[sort_indices]
+@torch.no_grad()
+def _isect_tile_overlaps(
+    means2d: Tensor,  # [K, 2]
+    conics: Tensor,  # [K, 3]
+    opacities: Tensor,  # [K]
+    tile_xs: Tensor,  # [K]
+    tile_ys: Tensor,  # [K]
+    tile_size: int,
+) -> Tensor:
+    """Whether the Gaussians contribute to any pixel of the tiles.
+
+    A Gaussian contributes to a pixel when its alpha `opacity * exp(-sigma)` is at
+    least 1/255, i.e. `sigma <= ln(255 * opacity)`. Since sigma is a convex quadratic
+    of the pixel position, its minimum over the pixel centers of a tile is either
+    zero (the mean is inside) or on one of the four edges of the tile, where the
+    minimum of a 1D quadratic clamped to the edge is taken.
+
+    Returns:
+        Boolean mask of the overlapping Gaussian-tile pairs. [K]
+    """
+    a, b, c = conics.unbind(dim=-1)
+    # offsets from the mean to the first and the last pixel center of the tile
+    x_lo = tile_xs * tile_size + 0.5 - means2d[:, 0]
+    y_lo = tile_ys * tile_size + 0.5 - means2d[:, 1]
+    x_hi = x_lo + (tile_size - 1)
+    y_hi = y_lo + (tile_size - 1)
 
-    tiles_per_gauss = tiles_per_gauss.reshape(image_dims + (N,)).int()
+    def sigma(dx: Tensor, dy: Tensor) -> Tensor:
+        return 0.5 * (a * dx * dx + c * dy * dy) + b * dx * dy
+
+    inside = (x_lo <= 0) & (x_hi >= 0) & (y_lo <= 0) & (y_hi >= 0)
+    min_sigma = torch.where(inside, 0.0, float("inf"))
+    for dx in (x_lo, x_hi):
+        dy = torch.minimum(torch.maximum(-b * dx / c, y_lo), y_hi)
+        min_sigma = torch.minimum(min_sigma, sigma(dx, dy))
+    for dy in (y_lo, y_hi):
+        dx = torch.minimum(torch.maximum(-b * dy / a, x_lo), x_hi)
+        min_sigma = torch.minimum(min_sigma, sigma(dx, dy))
+
+    cutoff = torch.log(opacities.clamp(min=0.0) / _ALPHA_THRESHOLD)
+    return min_sigma <= cutoff + _ISECT_SIGMA_MARGIN
+
+
+@torch.no_grad()
+def _cull_isects(
+    isect_ids: Tensor,  # [n_isects]
+    flatten_ids: Tensor,  # [n_isects]
+    means2d: Tensor,  # [M, 2]
+    conics: Tensor,  # [M, 3]
+    opacities: Tensor,  # [M]
+    tile_size: int,
+    tile_width: int,
+    tile_height: int,
+) -> Tuple[Tensor, Tensor, Tensor]:
+    """Drops the intersections whose Gaussian does not touch the tile.
+
+    The order of the kept intersections is preserved, so this could be applied
+    before or after sorting.
+
+    Returns:
+        A tuple:
+
+        - **Tiles per Gaussian**. The number of kept tiles of each Gaussian. [M]
+        - **Intersection ids**. [n_kept]
+        - **Flatten ids**. [n_kept]
+    """
+    tile_n_bits = (tile_width * tile_height).bit_length()
+    tile_ids = _isect_tile_keys(isect_ids) & ((1 << tile_n_bits) - 1)
+    gs_ids = flatten_ids.long()
+    keep = _isect_tile_overlaps(
+        means2d[gs_ids],
+        conics[gs_ids],
+        opacities[gs_ids],
+        tile_ids % tile_width,
+        tile_ids // tile_width,
+        tile_size,
+    )
+    isect_ids, flatten_ids = isect_ids[keep], flatten_ids[keep]
+    tiles_per_gauss = torch.bincount(flatten_ids.long(), minlength=len(means2d))
     return tiles_per_gauss, isect_ids, flatten_ids
 
 
@@ -484,23 +1015,24 @@ def _isect_offset_encode(
         This is a minimal implementation of the fully fused version, which has more
         arguments. Not all arguments are supported.
     """
-    tile_n_bits = (tile_width * tile_height).bit_length()
-    tile_counts = torch.zeros(
-        (I, tile_height, tile_width), dtype=torch.int64, device=isect_ids.device
-    )
+    return _isect_tile_offsets(isect_ids, I, tile_width, tile_height)
 
-    isect_ids_uq, counts = torch.unique_consecutive(isect_ids >> 32, return_counts=True)
 
-    image_ids_uq = isect_ids_uq >> tile_n_bits
-    tile_ids_uq = isect_ids_uq & ((1 << tile_n_bits) - 1)
-    tile_ids_x_uq = tile_ids_uq % tile_width
-    tile_ids_y_uq = tile_ids_uq // tile_width
-
-    tile_counts[image_ids_uq, tile_ids_y_uq, tile_ids_x_uq] = counts
-
-    cum_tile_counts = torch.cumsum(tile_counts.flatten(), dim=0).reshape_as(tile_counts)
+def _isect_tile_offsets(
+    isect_ids: Tensor, I: int, tile_width: int, tile_height: int
+) -> Tensor:
+    """Offsets of the tiles in the sorted intersections, from possibly unsorted ids."""
+    n_tiles = tile_width * tile_height
+    tile_n_bits = n_tiles.bit_length()
+    tile_keys = isect_ids if isect_ids.dtype == torch.int32 else isect_ids >> 32
+
+    # Count the intersections of every tile, which does not need them sorted. The
+    # bins are indexed by `image_id | tile_id`, so drop the ones past the last tile.
+    tile_counts = torch.bincount(tile_keys, minlength=I << tile_n_bits)
+    tile_counts = tile_counts.reshape(I, 1 << tile_n_bits)[:, :n_tiles].flatten()
+    cum_tile_counts = torch.cumsum(tile_counts, dim=0)
     offsets = cum_tile_counts - tile_counts
-    return offsets.int()
+    return offsets.reshape(I, tile_height, tile_width).int()
 
 
 def accumulate(
@@ -604,11 +1136,548 @@ def accumulate(
     return renders, alphas
 
 
+def _tile_pixels(
+    tile_ids: Tensor,  # [G]
+    image_width: int,
+    image_height: int,
+    tile_size: int,
+    tile_width: int,
+    tile_height: int,
+    dtype: torch.dtype = torch.float32,
+) -> Tuple[Tensor, Tensor, Tensor]:
+    """Global pixel indices and pixel centers of a group of tiles.
+
+    Returns:
+        A tuple:
+
+        - **pixel_ids**: Global pixel indices in [I * image_height * image_width],
+          -1 for the pixels outside of the image. [G, tile_size * tile_size]
+        - **px**: The x coordinates of the pixel centers. [G, tile_size * tile_size]
+        - **py**: The y coordinates of the pixel centers. [G, tile_size * tile_size]
+    """
+    n_tiles = tile_width * tile_height
+    image_ids = tile_ids // n_tiles
+    tile_ys = (tile_ids % n_tiles) // tile_width
+    tile_xs = tile_ids % tile_width
+    local_ids = torch.arange(tile_size * tile_size, device=tile_ids.device)
+    pix_ys = tile_ys[:, None] * tile_size + local_ids // tile_size  # [G, P]
+    pix_xs = tile_xs[:, None] * tile_size + local_ids % tile_size  # [G, P]
+    inside = (pix_ys < image_height) & (pix_xs < image_width)  # [G, P]
+    pixel_ids = torch.where(
+        inside,
+        image_ids[:, None] * image_height * image_width + pix_ys * image_width + pix_xs,
+        -1,
+    )
+    px = pix_xs.to(dtype) + 0.5  # [G, P]
+    py = pix_ys.to(dtype) + 0.5  # [G, P]
+    return pixel_ids, px, py
+
+
+def _rasterize_tiles(
+    means2d: Tensor,  # [M, 2]
+    conics: Tensor,  # [M, 3]
+    colors: Tensor,  # [M, channels]
+    opacities: Tensor,  # [M]
+    image_width: int,
+    image_height: int,
+    tile_size: int,
+    tile_width: int,
+    tile_height: int,
+    tile_offsets: Tensor,  # [I * tile_height * tile_width + 1]
+    flatten_ids: Tensor,  # [n_isects]
+    tile_ids: Tensor,  # [G]
+) -> Tuple[Tensor, Tensor, Tensor, Tensor]:
+    """Front-to-back alpha compositing of a group of tiles in Pure Pytorch.
+
+    This follows the CUDA forward kernel: every tile walks through its intersections
+    in batches of `tile_size * tile_size` Gaussians, and all the pixels of all the
+    tiles in the group are processed together as one batched tensor.
+
+    Args:
+        means2d: Projected Gaussian means, flattened. [M, 2]
+        conics: Inverse of the projected covariances, flattened. [M, 3]
+        colors: Gaussian colors, flattened. [M, channels]
+        opacities: Gaussian opacities, flattened. [M]
+        image_width: Image width.
+        image_height: Image height.
+        tile_size: Tile size.
+        tile_width: Number of tiles along the image width.
+        tile_height: Number of tiles along the image height.
+        tile_offsets: Flattened `isect_offsets` with `n_isects` appended at the end.
+            [I * tile_height * tile_width + 1]
+        flatten_ids: The global flatten indices from `isect_tiles()`. [n_isects]
+        tile_ids: The global indices of the tiles to rasterize, in
+            [I * tile_height * tile_width]. [G]
+
+    Returns:
+        A tuple:
+
+        - **pixel_ids**: Global pixel indices in [I * image_height * image_width],
+          -1 for the pixels outside of the image. [G, tile_size * tile_size]
+        - **pixel_colors**: Accumulated colors. [G, tile_size * tile_size, channels]
+        - **transmittances**: Transmittance after the last Gaussian. [G, tile_size * tile_size]
+        - **last_ids**: Index into `flatten_ids` of the last contributing Gaussian,
+          or -1 if no Gaussian contributes. [G, tile_size * tile_size]
+    """
+    device = means2d.device
+    G = len(tile_ids)
+    P = tile_size * tile_size
+    channels = colors.shape[-1]
+
+    pixel_ids, px, py = _tile_pixels(
+        tile_ids,
+        image_width,
+        image_height,
+        tile_size,
+        tile_width,
+        tile_height,
+        dtype=means2d.dtype,
+    )
+    inside = pixel_ids >= 0  # [G, P]
+
+    range_starts = tile_offsets[tile_ids].long()  # [G]
+    range_ends = tile_offsets[tile_ids + 1].long()  # [G]
+    max_range = (range_ends - range_starts).max().item() if G > 0 else 0
+    num_batches = (max_range + P - 1) // P
+
+    pix_out = torch.zeros((G, P, channels), device=device, dtype=colors.dtype)
+    T = torch.ones((G, P), device=device, dtype=means2d.dtype)
+    last_ids = torch.full((G, P), -1, device=device, dtype=torch.int64)
+    done = ~inside
+    batch_ids = torch.arange(P, device=device)
+    for b in range(num_batches):
+        # end early if all the pixels in the group are done
+        if done.all():
+            break
+
+        isect_ids = range_starts[:, None] + b * P + batch_ids  # [G, P]
+        in_range = isect_ids < range_ends[:, None]  # [G, P]
+        gs_ids = flatten_ids[torch.where(in_range, isect_ids, 0)].long()  # [G, P]
+
+        # evaluate the batch of Gaussians at the pixels: [G, pixels, gaussians]
+        conic = conics[gs_ids]  # [G, P, 3]
+        dx = means2d[gs_ids, 0][:, None, :] - px[:, :, None]
+        dy = means2d[gs_ids, 1][:, None, :] - py[:, :, None]
+        sigmas = (
+            0.5 * (conic[:, None, :, 0] * dx * dx + conic[:, None, :, 2] * dy * dy)
+            + conic[:, None, :, 1] * dx * dy
+        )
+        alphas = torch.clamp_max(
+            opacities[gs_ids][:, None, :] * torch.exp(-sigmas), 0.999
+        )
+        valid = (
+            in_range[:, None, :]
+            & ~done[:, :, None]
+            & (sigmas >= 0.0)
+            & (alphas >= _ALPHA_THRESHOLD)
+        )
+        alphas = torch.where(valid, alphas, 0.0)
+
+        # transmittances before and after each Gaussian, multiplied in the
+        # same order as the CUDA kernel.
+        trans = torch.cumprod(torch.cat([T[..., None], 1.0 - alphas], dim=-1), dim=-1)
+        # a Gaussian that would bring the transmittance below the threshold
+        # terminates the pixel, and is itself excluded.
+        contrib = valid & (trans[..., 1:] > _TRANSMITTANCE_THRESHOLD)
+        weights = torch.where(contrib, alphas * trans[..., :-1], 0.0)
+        pix_out = pix_out + torch.bmm(weights, colors[gs_ids])
+
+        n_contrib = (contrib * (batch_ids + 1)).amax(dim=-1)  # [G, P]
+        T = trans.gather(-1, n_contrib[..., None]).squeeze(-1)
+        last_ids = torch.where(
+            n_contrib > 0, range_starts[:, None] + b * P + n_contrib - 1, last_ids
+        )
+        done = done | (valid & ~contrib).any(dim=-1)
+
+    return pixel_ids, pix_out, T, last_ids
+
+
+@torch.no_grad()
+def _rasterize_tiles_bwd(
+    means2d: Tensor,  # [M, 2]
+    conics: Tensor,  # [M, 3]
+    colors: Tensor,  # [M, channels]
+    opacities: Tensor,  # [M]
+    image_width: int,
+    image_height: int,
+    tile_size: int,
+    tile_width: int,
+    tile_height: int,
+    tile_offsets: Tensor,  # [I * tile_height * tile_width + 1]
+    flatten_ids: Tensor,  # [n_isects]
+    tile_ids: Tensor,  # [G]
+    render_trans: Tensor,  # [I * image_height * image_width]
+    last_ids: Tensor,  # [I * image_height * image_width]
+    v_render_colors: Tensor,  # [I * image_height * image_width, channels]
+    v_render_alphas: Tensor,  # [I * image_height * image_width]
+    absgrad: bool = False,
+) -> Tuple[Tensor, Tensor, Tensor, Tensor, Tensor, Optional[Tensor]]:
+    """Back-to-front gradients of a group of tiles rasterized by `_rasterize_tiles()`.
+
+    This follows the CUDA backward kernel: every tile walks through its intersections
+    in batches from back to front, starting from the last contributing Gaussian of
+    each pixel, and recovers the transmittance in front of each Gaussian from the
+    final transmittance of the pixel, so nothing but the per-pixel outputs of the
+    forward pass needs to be stored.
+
+    Returns:
+        A tuple of the gradients of the Gaussians seen by the group, which could
+        contain duplicated ids:
+
+        - **gaussian_ids**: Indices into the flattened Gaussians. [K]
+        - **v_means2d**: [K, 2]
+        - **v_conics**: [K, 3]
+        - **v_colors**: [K, channels]
+        - **v_opacities**: [K]
+        - **v_means2d_abs**: [K, 2] if `absgrad` is True, otherwise None.
+    """
+    device = means2d.device
+    G = len(tile_ids)
+    P = tile_size * tile_size
+
+    pixel_ids, px, py = _tile_pixels(
+        tile_ids,
+        image_width,
+        image_height,
+        tile_size,
+        tile_width,
+        tile_height,
+        dtype=means2d.dtype,
+    )
+    inside = pixel_ids >= 0  # [G, P]
+    pixel_ids = pixel_ids.clamp(min=0)
+    T_final = render_trans[pixel_ids]  # [G, P]
+    bin_final = torch.where(inside, last_ids[pixel_ids].long(), -1)  # [G, P]
+    v_render_c = v_render_colors[pixel_ids]  # [G, P, channels]
+    v_render_a = v_render_alphas[pixel_ids]  # [G, P]
+
+    range_starts = tile_offsets[tile_ids].long()  # [G]
+    range_ends = tile_offsets[tile_ids + 1].long()  # [G]
+    # only the batches up to the last contributing Gaussian need to be visited
+    max_range = (bin_final.amax(dim=-1) + 1 - range_starts).max().item() if G else 0
+    num_batches = (max_range + P - 1) // P
+
+    # the transmittance and the (gradient weighted) color of the Gaussians
+    # behind the current batch.
+    T = T_final
+    buffer = torch.zeros_like(T_final)
+    results = []
+    # the Gaussians of each batch are ordered from back to front
+    batch_ids = torch.arange(P - 1, -1, -1, device=device)
+    for b in reversed(range(num_batches)):
+        isect_ids = range_starts[:, None] + b * P + batch_ids  # [G, P]
+        in_range = isect_ids < range_ends[:, None]  # [G, P]
+        gs_ids = flatten_ids[torch.where(in_range, isect_ids, 0)].long()  # [G, P]
+
+        # recompute the alphas of the batch: [G, pixels, gaussians]
+        conic = conics[gs_ids]  # [G, P, 3]
+        opac = opacities[gs_ids]  # [G, P]
+        dx = means2d[gs_ids, 0][:, None, :] - px[:, :, None]
+        dy = means2d[gs_ids, 1][:, None, :] - py[:, :, None]
+        sigmas = (
+            0.5 * (conic[:, None, :, 0] * dx * dx + conic[:, None, :, 2] * dy * dy)
+            + conic[:, None, :, 1] * dx * dy
+        )
+        vis = torch.exp(-sigmas)
+        alphas = opac[:, None, :] * vis
+        valid = (
+            in_range[:, None, :]
+            & (isect_ids[:, None, :] <= bin_final[:, :, None])
+            & (sigmas >= 0.0)
+            & (alphas >= _ALPHA_THRESHOLD)
+        )
+        if not valid.any():
+            continue
+        # the gradients of sigma and opacity vanish where alpha is clamped.
+        unclamped = valid & (alphas <= 0.999)
+        alphas = torch.where(valid, alphas.clamp_max(0.999), 0.0)
+
+        # transmittance in front of each Gaussian, T *= 1 / (1 - alpha) from
+        # back to front as in the CUDA kernel.
+        ra = 1.0 / (1.0 - alphas)
+        T_front = T[..., None] * ra.cumprod(dim=-1)
+        fac = alphas * T_front  # [G, P, P]
+        # color of each Gaussian dotted with the pixel gradient
+        v_dot_c = torch.bmm(v_render_c, colors[gs_ids].transpose(1, 2))
+        contrib = fac * v_dot_c
+        # the contribution from the Gaussians behind each Gaussian
+        buffer_behind = buffer[..., None] + contrib.cumsum(dim=-1) - contrib
+
+        v_alpha = (
+            v_dot_c * T_front + ((T_final * v_render_a)[..., None] - buffer_behind) * ra
+        )
+        v_sigma = torch.where(unclamped, -alphas * v_alpha, 0.0)
+        v_sigma_dx = v_sigma * dx
+        v_sigma_dy = v_sigma * dy
+        sum_dx = v_sigma_dx.sum(dim=1)  # [G, P]
+        sum_dy = v_sigma_dy.sum(dim=1)  # [G, P]
+        v_conic = torch.stack(
+            [
+                0.5 * (v_sigma_dx * dx).sum(dim=1),
+                (v_sigma_dx * dy).sum(dim=1),
+                0.5 * (v_sigma_dy * dy).sum(dim=1),
+            ],
+            dim=-1,
+        )  # [G, P, 3]
+        v_xy = torch.stack(
+            [
+                conic[..., 0] * sum_dx + conic[..., 1] * sum_dy,
+                conic[..., 1] * sum_dx + conic[..., 2] * sum_dy,
+            ],
+            dim=-1,
+        )  # [G, P, 2]
+        # v_opacity = vis * v_alpha = -v_sigma / opacity
+        v_opac = torch.where(opac > 0.0, -v_sigma.sum(dim=1) / opac, 0.0)  # [G, P]
+        v_rgb = torch.bmm(fac.transpose(1, 2), v_render_c)  # [G, P, channels]
+        if absgrad:
+            c = conic[:, None, :, :]
+            v_xy_abs = torch.stack(
+                [
+                    (c[..., 0] * v_sigma_dx + c[..., 1] * v_sigma_dy).abs().sum(dim=1),
+                    (c[..., 1] * v_sigma_dx + c[..., 2] * v_sigma_dy).abs().sum(dim=1),
+                ],
+                dim=-1,
+            )  # [G, P, 2]
+
+        results.append(
+            (
+                gs_ids[in_range],
+                v_xy[in_range],
+                v_conic[in_range],
+                v_rgb[in_range],
+                v_opac[in_range],
+                v_xy_abs[in_range] if absgrad else None,
+            )
+        )
+        T = T_front[..., -1]
+        buffer = buffer + contrib.sum(dim=-1)
+
+    if len(results) == 0:
+        channels = colors.shape[-1]
+        gs_ids = torch.zeros((0,), device=device, dtype=torch.int64)
+        return (
+            gs_ids,
+            means2d.new_zeros((0, 2)),
+            conics.new_zeros((0, 3)),
+            colors.new_zeros((0, channels)),
+            opacities.new_zeros((0,)),
+            means2d.new_zeros((0, 2)) if absgrad else None,
+        )
+    return tuple(
+        torch.cat(grads) if grads[0] is not None else None for grads in zip(*results)
+    )
+
+
+@torch.no_grad()
+def _tile_costs(isect_offsets: Tensor, n_isects: int) -> Tensor:
+    """Number of intersections of every tile, i.e., the cost to rasterize it.
+
+    Args:
+        isect_offsets: Intersection offsets outputs from `isect_offset_encode()`. [..., tile_height, tile_width]
+        n_isects: Total number of intersections.
+
+    Returns:
+        Number of intersections of every tile. Int64 [..., tile_height, tile_width]
+    """
+    tile_offsets = torch.cat(
+        [
+            isect_offsets.flatten().long(),
+            torch.tensor([n_isects], device=isect_offsets.device, dtype=torch.int64),
+        ]
+    )
+    return (tile_offsets[1:] - tile_offsets[:-1]).reshape(isect_offsets.shape)
+
+
+def _group_tiles(
+    tile_ids: Tensor,  # [T]
+    tile_costs: Tensor,  # [T]
+    group_size: int,
+    n_groups: int = 1,
+) -> List[Tensor]:
+    """Splits tiles into groups of similar cost, sorted from the most expensive.
+
+    Tiles are grouped by their number of intersections instead of their index, so
+    that the tiles rasterized together as one batch need little padding. There are
+    at least `n_groups` groups (if there are enough tiles), each with at most
+    `group_size` tiles, so that the groups could be balanced over `n_groups` threads.
+    """
+    order = torch.argsort(tile_costs, descending=True)
+    tile_ids = tile_ids[order]
+    group_size = max(min(group_size, math.ceil(len(tile_ids) / n_groups)), 1)
+    return list(tile_ids.split(group_size))
+
+
+def _map_tile_groups(fn: Callable, tile_groups: List[Tensor], num_threads: int):
+    """Runs `fn` over the tile groups, in parallel threads if `num_threads > 1`."""
+    if num_threads > 1 and len(tile_groups) > 1:
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            return list(executor.map(fn, tile_groups))
+    return [fn(tile_ids) for tile_ids in tile_groups]
+
+
+class _RasterizeToPixels(torch.autograd.Function):
+    """Rasterize gaussians with `_rasterize_tiles()`, and backpropagate with
+    `_rasterize_tiles_bwd()`. Only the per-pixel transmittances and last ids are
+    saved for the backward pass."""
+
+    @staticmethod
+    def forward(
+        ctx,
+        means2d: Tensor,  # [..., N, 2] or [nnz, 2]
+        conics: Tensor,  # [..., N, 3] or [nnz, 3]
+        colors: Tensor,  # [..., N, channels] or [nnz, channels]
+        opacities: Tensor,  # [..., N] or [nnz]
+        image_width: int,
+        image_height: int,
+        tile_size: int,
+        tile_width: int,
+        tile_height: int,
+        tile_offsets: Tensor,  # [I * tile_height * tile_width + 1]
+        flatten_ids: Tensor,  # [n_isects]
+        tile_groups: List[Tensor],
+        num_threads: int,
+        absgrad: bool,
+    ) -> Tuple[Tensor, Tensor]:
+        channels = colors.shape[-1]
+        n_pixels = (len(tile_offsets) - 1) // (tile_width * tile_height)
+        n_pixels *= image_height * image_width
+        device = means2d.device
+
+        render_colors = torch.zeros(
+            (n_pixels, channels), device=device, dtype=colors.dtype
+        )
+        render_trans = torch.ones((n_pixels,), device=device, dtype=means2d.dtype)
+        last_ids = torch.full((n_pixels,), -1, device=device, dtype=torch.int32)
+        lock = threading.Lock()
+
+        def rasterize_group(tile_ids: Tensor):
+            with torch.no_grad():
+                pixel_ids, pixel_colors, pixel_trans, pixel_last_ids = _rasterize_tiles(
+                    means2d.reshape(-1, 2),
+                    conics.reshape(-1, 3),
+                    colors.reshape(-1, channels),
+                    opacities.reshape(-1),
+                    image_width,
+                    image_height,
+                    tile_size,
+                    tile_width,
+                    tile_height,
+                    tile_offsets,
+                    flatten_ids,
+                    tile_ids,
+                )
+                inside = pixel_ids >= 0
+                pixel_ids = pixel_ids[inside]
+                with lock:
+                    render_colors[pixel_ids] = pixel_colors[inside]
+                    render_trans[pixel_ids] = pixel_trans[inside]
+                    last_ids[pixel_ids] = pixel_last_ids[inside].int()
+
+        _map_tile_groups(rasterize_group, tile_groups, num_threads)
+
+        ctx.save_for_backward(
+            means2d,
+            conics,
+            colors,
+            opacities,
+            tile_offsets,
+            flatten_ids,
+            render_trans,
+            last_ids,
+        )
+        ctx.image_width = image_width
+        ctx.image_height = image_height
+        ctx.tile_size = tile_size
+        ctx.tile_width = tile_width
+        ctx.tile_height = tile_height
+        ctx.tile_groups = tile_groups
+        ctx.num_threads = num_threads
+        ctx.absgrad = absgrad
+
+        render_alphas = 1.0 - render_trans
+        return render_colors, render_alphas
+
+    @staticmethod
+    def backward(
+        ctx,
+        v_render_colors: Tensor,  # [I * H * W, channels]
+        v_render_alphas: Tensor,  # [I * H * W]
+    ):
+        (
+            means2d,
+            conics,
+            colors,
+            opacities,
+            tile_offsets,
+            flatten_ids,
+            render_trans,
+            last_ids,
+        ) = ctx.saved_tensors
+        channels = colors.shape[-1]
+
+        v_means2d = torch.zeros_like(means2d).reshape(-1, 2)
+        v_conics = torch.zeros_like(conics).reshape(-1, 3)
+        v_colors = torch.zeros_like(colors).reshape(-1, channels)
+        v_opacities = torch.zeros_like(opacities).reshape(-1)
+        v_means2d_abs = torch.zeros_like(v_means2d) if ctx.absgrad else None
+        lock = threading.Lock()
+
+        def backward_group(tile_ids: Tensor):
+            gs_ids, v_xy, v_conic, v_rgb, v_opac, v_xy_abs = _rasterize_tiles_bwd(
+                means2d.reshape(-1, 2),
+                conics.reshape(-1, 3),
+                colors.reshape(-1, channels),
+                opacities.reshape(-1),
+                ctx.image_width,
+                ctx.image_height,
+                ctx.tile_size,
+                ctx.tile_width,
+                ctx.tile_height,
+                tile_offsets,
+                flatten_ids,
+                tile_ids,
+                render_trans,
+                last_ids,
+                v_render_colors,
+                v_render_alphas,
+                absgrad=ctx.absgrad,
+            )
+            with lock:
+                v_means2d.index_add_(0, gs_ids, v_xy)
+                v_conics.index_add_(0, gs_ids, v_conic)
+                v_colors.index_add_(0, gs_ids, v_rgb)
+                v_opacities.index_add_(0, gs_ids, v_opac)
+                if v_means2d_abs is not None:
+                    v_means2d_abs.index_add_(0, gs_ids, v_xy_abs)
+
+        _map_tile_groups(backward_group, ctx.tile_groups, ctx.num_threads)
+
+        if ctx.absgrad:
+            means2d.absgrad = v_means2d_abs.reshape(means2d.shape)
+
+        return (
+            v_means2d.reshape(means2d.shape),
+            v_conics.reshape(conics.shape),
+            v_colors.reshape(colors.shape),
+            v_opacities.reshape(opacities.shape),
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+        )
+
+
 def _rasterize_to_pixels(
-    means2d: Tensor,  # [..., N, 2]
-    conics: Tensor,  # [..., N, 3]
-    colors: Tensor,  # [..., N, channels]
-    opacities: Tensor,  # [..., N]
+    means2d: Tensor,  # [..., N, 2] or [nnz, 2]
+    conics: Tensor,  # [..., N, 3] or [nnz, 3]
+    colors: Tensor,  # [..., N, channels] or [nnz, channels]
+    opacities: Tensor,  # [..., N] or [nnz]
     image_width: int,
     image_height: int,
     tile_size: int,
@@ -616,102 +1685,100 @@ def _rasterize_to_pixels(
     flatten_ids: Tensor,  # [n_isects]
     backgrounds: Optional[Tensor] = None,  # [..., channels]
     batch_per_iter: int = 100,
+    masks: Optional[Tensor] = None,  # [..., tile_height, tile_width]
+    packed: bool = False,
+    num_threads: Optional[int] = None,
+    absgrad: bool = False,
 ):
     """Pytorch implementation of `gsplat.cuda._wrapper.rasterize_to_pixels()`.
 
-    This function rasterizes 2D Gaussians to pixels in a Pytorch-friendly way. It
-    iteratively accumulates the renderings within each batch of Gaussians. The
-    interations are controlled by `batch_per_iter`.
+    This function rasterizes 2D Gaussians to pixels tile by tile, following the
+    CUDA forward kernel, including the transmittance early termination and the
+    clamping of alphas to 0.999. Tiles are rasterized in groups of at most
+    `batch_per_iter` tiles with similar numbers of intersections, which are
+    processed together as batched tensors. It runs on any device, without the
+    CUDA extension.
 
-    .. note::
-        This is a minimal implementation of the fully fused version, which has more
-        arguments. Not all arguments are supported.
+    The groups are rasterized in parallel by `num_threads` threads (default:
+    `torch.get_num_threads()`), from the most expensive one, so the threads stay
+    balanced. Torch ops release the GIL so the threads run concurrently. Note the
+    peak memory grows with `num_threads * batch_per_iter`.
 
     .. note::
 
-        This function relies on Pytorch's autograd for the backpropagation. It is much slower
-        than our fully fused rasterization implementation and comsumes much more GPU memory.
-        But it could serve as a playground for new ideas or debugging, as no backward
-        implementation is needed.
-
-    .. warning::
-
-        This function requires the `nerfacc` package to be installed. Please install it
-        using the following command `pip install nerfacc`.
+        The backward pass is hand-written after the CUDA backward kernel: it walks
+        the intersections of every tile from back to front, and recovers the
+        transmittances from the final transmittance of each pixel. So only
+        O(pixels) values are saved for the backward, instead of all the
+        pixel-Gaussian intersections an autograd graph would keep.
     """
-    from ._wrapper import rasterize_to_indices_in_range
-
-    image_dims = means2d.shape[:-2]
+    image_dims = isect_offsets.shape[:-2]
     channels = colors.shape[-1]
-    N = means2d.shape[-2]
     tile_height = isect_offsets.shape[-2]
     tile_width = isect_offsets.shape[-1]
 
-    assert means2d.shape == image_dims + (N, 2), means2d.shape
-    assert conics.shape == image_dims + (N, 3), conics.shape
-    assert colors.shape == image_dims + (N, channels), colors.shape
-    assert opacities.shape == image_dims + (N,), opacities.shape
-    assert isect_offsets.shape == image_dims + (
-        tile_height,
-        tile_width,
-    ), isect_offsets.shape
+    if packed:
+        nnz = means2d.shape[0]
+        assert means2d.shape == (nnz, 2), means2d.shape
+        assert conics.shape == (nnz, 3), conics.shape
+        assert colors.shape == (nnz, channels), colors.shape
+        assert opacities.shape == (nnz,), opacities.shape
+    else:
+        N = means2d.shape[-2]
+        assert means2d.shape == image_dims + (N, 2), means2d.shape
+        assert conics.shape == image_dims + (N, 3), conics.shape
+        assert colors.shape == image_dims + (N, channels), colors.shape
+        assert opacities.shape == image_dims + (N,), opacities.shape
+    if backgrounds is not None:
+        assert backgrounds.shape == image_dims + (channels,), backgrounds.shape
+    if masks is not None:
+        assert masks.shape == isect_offsets.shape, masks.shape
+    if num_threads is None:
+        num_threads = torch.get_num_threads()
     n_isects = len(flatten_ids)
     device = means2d.device
 
-    render_colors = torch.zeros(
-        image_dims + (image_height, image_width, channels), device=device
-    )
-    render_alphas = torch.zeros(
-        image_dims + (image_height, image_width, 1), device=device
+    tile_offsets = torch.cat(
+        [
+            isect_offsets.flatten().long(),
+            torch.tensor([n_isects], device=device, dtype=torch.int64),
+        ]
     )
 
-    # Split Gaussians into batches and iteratively accumulate the renderings
-    block_size = tile_size * tile_size
-    isect_offsets_fl = torch.cat(
-        [isect_offsets.flatten(), torch.tensor([n_isects], device=device)]
+    # only visit the tiles that have any intersection, and group the tiles with
+    # similar number of intersections together to reduce the padding.
+    tile_counts = _tile_costs(isect_offsets, n_isects).flatten()
+    tile_ids = torch.where(tile_counts > 0)[0]
+    if masks is not None:
+        tile_ids = tile_ids[masks.flatten()[tile_ids]]
+    tile_groups = _group_tiles(
+        tile_ids, tile_counts[tile_ids], batch_per_iter, num_threads
     )
-    max_range = (isect_offsets_fl[1:] - isect_offsets_fl[:-1]).max().item()
-    num_batches = (max_range + block_size - 1) // block_size
-    for step in range(0, num_batches, batch_per_iter):
-        transmittances = 1.0 - render_alphas[..., 0]
-
-        # Find the M intersections between pixels and gaussians.
-        # Each intersection corresponds to a tuple (gs_id, pixel_id, image_id)
-        gs_ids, pixel_ids, image_ids = rasterize_to_indices_in_range(
-            step,
-            step + batch_per_iter,
-            transmittances,
-            means2d,
-            conics,
-            opacities,
-            image_width,
-            image_height,
-            tile_size,
-            isect_offsets,
-            flatten_ids,
-        )  # [M], [M], [M]
-        if len(gs_ids) == 0:
-            break
 
-        # Accumulate the renderings within this batch of Gaussians.
-        renders_step, accs_step = accumulate(
-            means2d,
-            conics,
-            opacities,
-            colors,
-            gs_ids,
-            pixel_ids,
-            image_ids,
-            image_width,
-            image_height,
-        )
-        render_colors = render_colors + renders_step * transmittances[..., None]
-        render_alphas = render_alphas + accs_step * transmittances[..., None]
+    render_colors, render_alphas = _RasterizeToPixels.apply(
+        means2d,
+        conics,
+        colors,
+        opacities,
+        image_width,
+        image_height,
+        tile_size,
+        tile_width,
+        tile_height,
+        tile_offsets,
+        flatten_ids,
+        tile_groups,
+        num_threads,
+        absgrad,
+    )
+    render_colors = render_colors.reshape(
+        image_dims + (image_height, image_width, channels)
+    )
+    render_alphas = render_alphas.reshape(image_dims + (image_height, image_width, 1))
 
-    render_alphas = render_alphas
     if backgrounds is not None:
-        render_colors = render_colors + backgrounds[..., None, None, :] * (
-            1.0 - render_alphas
+        render_colors = (
+            render_colors + (1.0 - render_alphas) * backgrounds[..., None, None, :]
         )
 
     return render_colors, render_alphas
@@ -805,6 +1872,7 @@ def _spherical_harmonics(
     degrees_to_use: int,
     dirs: torch.Tensor,  # [..., 3]
     coeffs: torch.Tensor,  # [..., K, 3]
+    masks: Optional[torch.Tensor] = None,  # [...,]
 ):
     """Pytorch implementation of `gsplat.cuda._wrapper.spherical_harmonics()`."""
     assert (degrees_to_use + 1) ** 2 <= coeffs.shape[-2], coeffs.shape
@@ -815,8 +1883,184 @@ def _spherical_harmonics(
         and coeffs.shape[:-2] == batch_dims
         and coeffs.shape[-1] == 3
     ), coeffs.shape
-    dirs = F.normalize(dirs, p=2, dim=-1)
+    # only the active bands are read, before anything is gathered
     num_bases = (degrees_to_use + 1) ** 2
-    bases = torch.zeros_like(coeffs[..., 0])
-    bases[..., :num_bases] = _eval_sh_bases_fast(num_bases, dirs)
-    return (bases[..., None] * coeffs).sum(dim=-2)
+    coeffs = coeffs[..., :num_bases, :]
+    if masks is not None:
+        assert masks.shape == batch_dims, masks.shape
+        # evaluate the masked rows only, and leave the others as zeros
+        colors = torch.zeros(
+            batch_dims + (3,),
+            dtype=torch.result_type(dirs, coeffs),
+            device=coeffs.device,
+        )
+        colors[masks] = _eval_sh(num_bases, dirs[masks], coeffs[masks])
+        return colors
+    return _eval_sh(num_bases, dirs, coeffs)
+
+
+def _eval_sh(
+    num_bases: int,
+    dirs: Tensor,  # [..., 3]
+    coeffs: Tensor,  # [..., num_bases, 3]
+) -> Tensor:
+    """Colors from the SH coefficients of the active bands. [..., 3]"""
+    bases = _eval_sh_bases_fast(num_bases, F.normalize(dirs, p=2, dim=-1))
+    return (bases[..., None, :] @ coeffs)[..., 0, :]
+
+
+def _compute_relocation(
+    opacities: Tensor,  # [N]
+    scales: Tensor,  # [N, 3]
+    ratios: Tensor,  # [N]
+    binoms: Tensor,  # [n_max, n_max]
+) -> Tuple[Tensor, Tensor]:
+    """PyTorch implementation of `gsplat.relocation.compute_relocation()`.
+
+    Evaluates Equation 9 of the MCMC paper for all the Gaussians at once. The double
+    sum over `i <= n` and `k < i` is rearranged into a single masked sum over the
+    `n_max` powers of the new opacity, whose coefficients are the cumulative sums of
+    the rows of `binoms`.
+    """
+    n_max = binoms.shape[0]
+    # new opacities: 1 - (1 - o)^(1/n), without the cancellation for small o
+    new_opacities = -torch.expm1(torch.log1p(-opacities) / ratios)
+    # coeffs[n - 1, k] = sum_{i=k+1}^{n} binoms[i - 1, k], which is zero for k >= n
+    coeffs = torch.cumsum(torch.tril(binoms.to(opacities)), dim=0)  # [n_max, n_max]
+    k = torch.arange(n_max, device=opacities.device, dtype=opacities.dtype)
+    signs = torch.where(k % 2 == 0, 1.0, -1.0) / torch.sqrt(k + 1)  # [n_max]
+    # powers[:, k] = new_opacities^(k + 1)
+    powers = torch.cumprod(new_opacities[:, None].expand(-1, n_max), dim=-1)
+    denom = (coeffs[ratios.long() - 1] * signs * powers).sum(dim=-1)  # [N]
+    new_scales = (opacities / denom)[:, None] * scales
+    return new_opacities, new_scales
+
+
+# Rows of the reduced precision moments updated at once by a dense `_adam()`,
+# which bounds the float32 copies of the moments.
+_ADAM_CHUNK_ROWS = 1 << 20
+
+
+def _round_to(x: Tensor, dtype: torch.dtype, stochastic: bool = False) -> Tensor:
+    """Rounds float32 `x` to `dtype`, stochastically for bfloat16.
+
+    With stochastic rounding, `x` is rounded up or down to its two neighbours in
+    bfloat16 with probabilities proportional to how close it is to them, so that the
+    rounding is unbiased and small updates to the moments are not lost. That is, a
+    random 16-bit integer is added to the float32 bits, which are then truncated.
+    """
+    if x.dtype == dtype:
+        return x
+    if not stochastic or dtype != torch.bfloat16 or x.dtype != torch.float32:
+        return x.to(dtype)
+    bits = x.view(torch.int32)
+    bits = (bits + torch.randint_like(bits, 0, 1 << 16)).bitwise_and_(-(1 << 16))
+    # exact, as the truncated bits are all zeros
+    return bits.view(torch.float32).to(dtype)
+
+
+def _adam_rows(
+    grad: Tensor,  # [M, D]
+    exp_avg: Tensor,  # [M, D]
+    exp_avg_sq: Tensor,  # [M, D]
+    lr: float,
+    b1: float,
+    b2: float,
+    eps: float,
+    stochastic_rounding: bool,
+) -> Tuple[Tensor, Tensor, Tensor]:
+    """Adam update of rows whose moments are stored in reduced precision.
+
+    The moments are accumulated in the precision of `grad` and rounded back to
+    their storage dtype. Returns the new moments and the step of the parameters.
+    """
+    m = exp_avg.to(grad.dtype).lerp_(grad, 1.0 - b1)
+    v = exp_avg_sq.to(grad.dtype).mul_(b2).addcmul_(grad, grad, value=1.0 - b2)
+    step = m / v.sqrt().add_(eps) * -lr
+    new_exp_avg = _round_to(m, exp_avg.dtype, stochastic_rounding)
+    new_exp_avg_sq = _round_to(v, exp_avg_sq.dtype, stochastic_rounding)
+    return new_exp_avg, new_exp_avg_sq, step
+
+
+def _adam(
+    param: Tensor,  # [N, ...]
+    param_grad: Tensor,  # [N, ...]
+    exp_avg: Tensor,  # [N, ...]
+    exp_avg_sq: Tensor,  # [N, ...]
+    valid: Optional[Tensor],  # [N] bool mask, or [M] row indices
+    lr: float,
+    b1: float,
+    b2: float,
+    eps: float,
+    stochastic_rounding: bool = False,
+) -> None:
+    """PyTorch implementation of `gsplat.cuda._wrapper.adam()`.
+
+    Updates `param`, `exp_avg` and `exp_avg_sq` in place, only at the rows given by
+    `valid`. The valid rows are gathered once, updated, and written back with
+    `index_copy_` / `index_add_`, so the cost scales with the number of valid rows
+    rather than with N. `valid` may also be the indices of the valid rows, which
+    saves the `nonzero()` when several tensors share the same mask.
+
+    The moments may be stored in a lower precision than `param` (e.g. bfloat16).
+    They are then updated in the precision of `param` and rounded back, with
+    stochastic rounding if `stochastic_rounding` is True.
+    """
+    N = param.shape[0]
+    assert param_grad.shape == param.shape, param_grad.shape
+    assert exp_avg.shape == param.shape, exp_avg.shape
+    assert exp_avg_sq.shape == param.shape, exp_avg_sq.shape
+    lowp = exp_avg.dtype != param.dtype
+    assert exp_avg_sq.dtype == exp_avg.dtype, (exp_avg.dtype, exp_avg_sq.dtype)
+    if valid is None and not lowp:
+        exp_avg.lerp_(param_grad, 1.0 - b1)
+        exp_avg_sq.mul_(b2).addcmul_(param_grad, param_grad, value=1.0 - b2)
+        param.addcdiv_(exp_avg, exp_avg_sq.sqrt().add_(eps), value=-lr)
+        return
+    # 2D views, so that the rows are updated with a single index op each
+    param = param.view(N, -1)
+    exp_avg = exp_avg.view(N, -1)
+    exp_avg_sq = exp_avg_sq.view(N, -1)
+    param_grad = param_grad.reshape(N, -1)
+    if valid is None:
+        for i in range(0, N, _ADAM_CHUNK_ROWS):
+            rows = slice(i, i + _ADAM_CHUNK_ROWS)
+            m, v, step = _adam_rows(
+                param_grad[rows],
+                exp_avg[rows],
+                exp_avg_sq[rows],
+                lr,
+                b1,
+                b2,
+                eps,
+                stochastic_rounding,
+            )
+            exp_avg[rows] = m
+            exp_avg_sq[rows] = v
+            param[rows] += step
+        return
+    if valid.dtype not in (torch.int32, torch.int64):
+        assert valid.shape == (N,), valid.shape
+        valid = valid.nonzero().squeeze(-1)
+    grad = param_grad.index_select(0, valid)
+    if lowp:
+        m, v, step = _adam_rows(
+            grad,
+            exp_avg.index_select(0, valid),
+            exp_avg_sq.index_select(0, valid),
+            lr,
+            b1,
+            b2,
+            eps,
+            stochastic_rounding,
+        )
+        exp_avg.index_copy_(0, valid, m)
+        exp_avg_sq.index_copy_(0, valid, v)
+        param.index_add_(0, valid, step)
+        return
+    m = exp_avg.index_select(0, valid).lerp_(grad, 1.0 - b1)
+    v = exp_avg_sq.index_select(0, valid).mul_(b2)
+    v.addcmul_(grad, grad, value=1.0 - b2)
+    exp_avg.index_copy_(0, valid, m)
+    exp_avg_sq.index_copy_(0, valid, v)
+    param.index_add_(0, valid, m.div_(v.sqrt_().add_(eps)), alpha=-lr)
@@ -2,12 +2,25 @@ import math
 import warnings
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Callable, Optional, Tuple
+from typing import Any, Callable, Optional, Tuple, Union
 
 import torch
 from torch import Tensor
 from typing_extensions import Literal
 
+from ._torch_impl import (
+    _adam,
+    _cull_isects,
+    _fully_fused_projection,
+    _isect_key_bits,
+    _isect_offset_encode,
+    _isect_tile_keys,
+    _isect_tiles,
+    _quat_scale_to_covar_preci,
+    _rasterize_to_pixels,
+    _spherical_harmonics,
+)
+
 
 def _make_lazy_cuda_func(name: str) -> Callable:
     def call_cuda(*args, **kwargs):
@@ -29,6 +42,68 @@ def _make_lazy_cuda_obj(name: str) -> Any:
     return obj
 
 
+# The ops that have a PyTorch implementation in `_torch_impl.py`, and the CUDA
+# functions each of them needs. These ops are dispatched by `_select_backend()`.
+_CUDA_FUNCS = {
+    "quat_scale_to_covar_preci": (
+        "quat_scale_to_covar_preci_fwd",
+        "quat_scale_to_covar_preci_bwd",
+    ),
+    "fully_fused_projection": (
+        "projection_ewa_3dgs_fused_fwd",
+        "projection_ewa_3dgs_fused_bwd",
+        "projection_ewa_3dgs_packed_fwd",
+        "projection_ewa_3dgs_packed_bwd",
+    ),
+    "spherical_harmonics": ("spherical_harmonics_fwd", "spherical_harmonics_bwd"),
+    "isect_tiles": ("intersect_tile",),
+    "isect_offset_encode": ("intersect_offset",),
+    "rasterize_to_pixels": (
+        "rasterize_to_pixels_3dgs_fwd",
+        "rasterize_to_pixels_3dgs_bwd",
+    ),
+    "relocation": ("relocation",),
+    "adam": ("adam",),
+}
+_TORCH_FALLBACK_WARNED = set()
+
+
+def _select_backend(
+    op: str,
+    device: torch.device,
+    backend: Optional[Literal["cuda", "torch"]] = None,
+) -> Literal["cuda", "torch"]:
+    """Selects the backend to run an op with.
+
+    Ops on non-CUDA tensors always run with the PyTorch implementation, so the CUDA
+    extension is never loaded (nor JIT compiled) for them. Ops on CUDA tensors fall
+    back to the PyTorch implementation if the CUDA extension does not provide them,
+    unless `backend="cuda"` is requested explicitly.
+    """
+    assert backend in (None, "cuda", "torch"), backend
+    if backend == "torch":
+        return "torch"
+    if device.type != "cuda":
+        assert backend is None, f"The CUDA backend does not support {device} tensors."
+        return "torch"
+
+    # pylint: disable=import-outside-toplevel
+    from ._backend import _C
+
+    missing = [name for name in _CUDA_FUNCS[op] if not hasattr(_C, name)]
+    if not missing:
+        return "cuda"
+    if backend == "cuda":
+        raise RuntimeError(f"gsplat: `{op}` has no CUDA build, missing {missing}.")
+    if op not in _TORCH_FALLBACK_WARNED:
+        _TORCH_FALLBACK_WARNED.add(op)
+        warnings.warn(
+            f"gsplat: `{op}` has no CUDA build, falling back to the PyTorch "
+            "implementation."
+        )
+    return "torch"
+
+
 class RollingShutterType(Enum):
     ROLLING_TOP_TO_BOTTOM = 0
     ROLLING_LEFT_TO_RIGHT = 1
@@ -143,6 +218,8 @@ def adam(
     b2: float,
     eps: float,
 ) -> None:
+    if _select_backend("adam", param.device) == "torch":
+        return _adam(param, param_grad, exp_avg, exp_avg_sq, valid, lr, b1, b2, eps)
     _make_lazy_cuda_func("adam")(
         param, param_grad, exp_avg, exp_avg_sq, valid, lr, b1, b2, eps
     )
@@ -153,6 +230,7 @@ def spherical_harmonics(
     dirs: Tensor,  # [..., 3]
     coeffs: Tensor,  # [..., K, 3]
     masks: Optional[Tensor] = None,  # [...,]
+    backend: Optional[Literal["cuda", "torch"]] = None,
 ) -> Tensor:
     """Computes spherical harmonics.
 
@@ -161,6 +239,8 @@ def spherical_harmonics(
         dirs: Directions. [..., 3]
         coeffs: Coefficients. [..., K, 3]
         masks: Optional boolen masks to skip some computation. [...,] Default: None.
+        backend: The implementation to run with, "cuda" or "torch". Default: None, which
+            runs CUDA tensors with the CUDA backend and other tensors with PyTorch.
 
     Returns:
         Spherical harmonics. [..., 3]
@@ -176,6 +256,10 @@ def spherical_harmonics(
     if masks is not None:
         assert masks.shape == batch_dims, masks.shape
         masks = masks.contiguous()
+    if _select_backend("spherical_harmonics", dirs.device, backend) == "torch":
+        return _spherical_harmonics(degrees_to_use, dirs, coeffs, masks=masks)
+    # only copy the active bands into a contiguous tensor
+    coeffs = coeffs[..., : (degrees_to_use + 1) ** 2, :]
     return _SphericalHarmonics.apply(
         degrees_to_use, dirs.contiguous(), coeffs.contiguous(), masks
     )
@@ -208,6 +292,10 @@ def quat_scale_to_covar_preci(
     batch_dims = quats.shape[:-1]
     assert quats.shape == batch_dims + (4,), quats.shape
     assert scales.shape == batch_dims + (3,), scales.shape
+    if _select_backend("quat_scale_to_covar_preci", quats.device) == "torch":
+        return _quat_scale_to_covar_preci(
+            quats, scales, compute_covar, compute_preci, triu
+        )
     quats = quats.contiguous()
     scales = scales.contiguous()
     covars, precis = _QuatScaleToCovarPreci.apply(
@@ -303,6 +391,7 @@ def fully_fused_projection(
     calc_compensations: bool = False,
     camera_model: Literal["pinhole", "ortho", "fisheye", "ftheta"] = "pinhole",
     opacities: Optional[Tensor] = None,  # [..., N] or None
+    backend: Optional[Literal["cuda", "torch"]] = None,
 ) -> Tuple[Tensor, Tensor, Tensor, Tensor, Tensor]:
     """Projects Gaussians to 2D.
 
@@ -347,6 +436,8 @@ def fully_fused_projection(
           is useful for anti-aliasing. Default: False.
         opacities: Gaussian opacities in range [0, 1]. If provided, will use it to compute a tighter bounds.
             [..., N] or None. Default: None.
+        backend: The implementation to run with, "cuda" or "torch". Default: None, which
+            runs CUDA tensors with the CUDA backend and other tensors with PyTorch.
 
     Returns:
         A tuple:
@@ -400,6 +491,28 @@ def fully_fused_projection(
 
     viewmats = viewmats.contiguous()
     Ks = Ks.contiguous()
+    if _select_backend("fully_fused_projection", means.device, backend) == "torch":
+        assert not sparse_grad, "sparse_grad is not supported by the torch backend"
+        if covars is None:
+            covars, _ = _quat_scale_to_covar_preci(
+                quats, scales, compute_preci=False, triu=True
+            )
+        return _fully_fused_projection(
+            means,
+            covars,
+            viewmats,
+            Ks,
+            width,
+            height,
+            eps2d=eps2d,
+            near_plane=near_plane,
+            far_plane=far_plane,
+            calc_compensations=calc_compensations,
+            camera_model=camera_model,
+            radius_clip=radius_clip,
+            opacities=opacities,
+            packed=packed,
+        )
     if packed:
         return _FullyFusedProjectionPacked.apply(
             means,
@@ -453,9 +566,29 @@ def isect_tiles(
     n_images: Optional[int] = None,
     image_ids: Optional[Tensor] = None,
     gaussian_ids: Optional[Tensor] = None,
-) -> Tuple[Tensor, Tensor, Tensor]:
+    conics: Optional[Tensor] = None,
+    opacities: Optional[Tensor] = None,
+    key_bits: Optional[Literal[32, 64]] = 64,
+    return_offsets: bool = False,
+    backend: Optional[Literal["cuda", "torch"]] = None,
+) -> Union[Tuple[Tensor, Tensor, Tensor], Tuple[Tensor, Tensor, Tensor, Tensor]]:
     """Maps projected Gaussians to intersecting tiles.
 
+    .. note::
+
+        By default a Gaussian intersects all the tiles of its `radii` AABB. If `conics`
+        and `opacities` are provided, only the tiles that the ellipse actually touches
+        are kept, where the ellipse is the cutoff `sigma <= ln(255 * opacity)` below
+        which the rasterizer skips the Gaussian. This is a lossless culling, which helps
+        thin and rotated Gaussians the most.
+
+    .. note::
+
+        With `key_bits=32` the intersection ids only hold `image_id | tile_id`, which
+        halves the memory and bandwidth of the sort. The depth order within each tile
+        comes from enumerating the Gaussians front to back before a stable sort, so
+        the sorted `flatten_ids` are identical to the ones of the 64-bit ids.
+
     Args:
         means2d: Projected Gaussian means. [..., N, 2] if packed is False, [nnz, 2] if packed is True.
         radii: Maximum radii of the projected Gaussians. [..., N, 2] if packed is False, [nnz, 2] if packed is True.
@@ -469,18 +602,34 @@ def isect_tiles(
         n_images: Number of images. Required if packed is True.
         image_ids: The image indices of the projected Gaussians. Required if packed is True.
         gaussian_ids: The column indices of the projected Gaussians. Required if packed is True.
+        conics: Inverse of the projected covariances. If provided together with `opacities`,
+            the intersections are culled to the tiles the ellipse touches.
+            [..., N, 3] if packed is False, [nnz, 3] if packed is True. Default: None.
+        opacities: Opacities of the projected Gaussians, including the compensations if any.
+            [..., N] if packed is False, [nnz] if packed is True. Default: None.
+        key_bits: Width of the intersection ids, 32 or 64. None chooses 32 bits when the
+            image and tile ids fit in 31 bits, and 64 bits otherwise. Default: 64.
+        return_offsets: If True, also returns the offsets of `isect_offset_encode()`.
+            The PyTorch backend then buckets the intersections by tile with a counting
+            sort, which gives the offsets as a by-product. Requires `sort`. Default: False.
+        backend: The implementation to run with, "cuda" or "torch". Default: None, which
+            runs CUDA tensors with the CUDA backend and other tensors with PyTorch.
 
     Returns:
         A tuple:
 
         - **Tiles per Gaussian**. The number of tiles intersected by each Gaussian.
           Int32 [..., N] if packed is False, Int32 [nnz] if packed is True.
-        - **Intersection ids**. Each id is an 64-bit integer with the following
-          information: image_id (Xc bits) | tile_id (Xt bits) | depth (32 bits).
-          Xc and Xt are the maximum number of bits required to represent the image and
-          tile ids, respectively. Int64 [n_isects]
+        - **Intersection ids**. Each 64-bit id has the following information:
+          image_id (Xc bits) | tile_id (Xt bits) | depth (32 bits). Xc and Xt are the
+          maximum number of bits required to represent the image and tile ids,
+          respectively. The 32-bit ids are image_id (Xc bits) | tile_id (Xt bits).
+          Int64 or Int32 [n_isects]
         - **Flatten ids**. The global flatten indices in [I * N] or [nnz] (packed). [n_isects]
+        - **Intersection offsets**. [I, tile_height, tile_width], only if `return_offsets`
+          is True.
     """
+    assert sort or not return_offsets, "sort is required if return_offsets is True"
     if packed:
         nnz = means2d.size(0)
         assert means2d.shape == (nnz, 2), means2d.shape
@@ -500,20 +649,89 @@ def isect_tiles(
         assert means2d.shape == image_dims + (N, 2), means2d.shape
         assert radii.shape == image_dims + (N, 2), radii.shape
         assert depths.shape == image_dims + (N,), depths.shape
+    if conics is not None:
+        assert opacities is not None, "opacities is required with conics"
+        assert conics.shape == means2d.shape[:-1] + (3,), conics.shape
+        assert opacities.shape == means2d.shape[:-1], opacities.shape
 
+    if _select_backend("isect_tiles", means2d.device, backend) == "torch":
+        return _isect_tiles(
+            means2d,
+            radii,
+            depths,
+            tile_size,
+            tile_width,
+            tile_height,
+            sort=sort,
+            packed=packed,
+            n_images=n_images,
+            image_ids=image_ids,
+            conics=conics,
+            opacities=opacities,
+            key_bits=key_bits,
+            return_offsets=return_offsets,
+        )
+    key_bits = _isect_key_bits(I, tile_width, tile_height, key_bits)
+    gauss_order = None
+    if key_bits == 32 and sort:
+        # The kernel writes out the intersections Gaussian by Gaussian, so feed it
+        # the Gaussians front to back within each image.
+        if packed:
+            gauss_order = torch.argsort(depths, stable=True)
+            image_ids = image_ids[gauss_order]
+            gaussian_ids = gaussian_ids[gauss_order]
+        else:
+            gauss_order = torch.argsort(depths.reshape(I, N), dim=-1, stable=True)
+            gauss_order += torch.arange(I, device=depths.device)[:, None] * N
+            gauss_order = gauss_order.flatten()
+        kernel_inputs = [
+            x.reshape(len(gauss_order), -1)[gauss_order].reshape(x.shape)
+            for x in (means2d, radii, depths)
+        ]
+    else:
+        kernel_inputs = [x.contiguous() for x in (means2d, radii, depths)]
     tiles_per_gauss, isect_ids, flatten_ids = _make_lazy_cuda_func("intersect_tile")(
-        means2d.contiguous(),
-        radii.contiguous(),
-        depths.contiguous(),
+        *kernel_inputs,
         image_ids,
         gaussian_ids,
         I,
         tile_size,
         tile_width,
         tile_height,
-        sort,
+        sort and conics is None and key_bits == 64,
         segmented,
     )
+    if gauss_order is not None:
+        flatten_ids = gauss_order[flatten_ids.long()].int()
+        tiles_per_gauss = (
+            torch.empty_like(tiles_per_gauss)
+            .flatten()
+            .scatter_(0, gauss_order, tiles_per_gauss.flatten())
+        )
+        tiles_per_gauss = tiles_per_gauss.reshape(means2d.shape[:-1])
+    if conics is not None:
+        # cull the intersections before sorting them
+        tiles_per_gauss, isect_ids, flatten_ids = _cull_isects(
+            isect_ids,
+            flatten_ids,
+            means2d.reshape(-1, 2),
+            conics.reshape(-1, 3),
+            opacities.reshape(-1),
+            tile_size,
+            tile_width,
+            tile_height,
+        )
+        tiles_per_gauss = tiles_per_gauss.int().reshape(means2d.shape[:-1])
+    if key_bits == 32:
+        isect_ids = _isect_tile_keys(isect_ids).int()
+    if sort and (conics is not None or key_bits == 32):
+        isect_ids, sort_indices = torch.sort(isect_ids, stable=True)
+        flatten_ids = flatten_ids[sort_indices]
+    if return_offsets:
+        isect_offsets = isect_offset_encode(
+            isect_ids, I, tile_width, tile_height, backend=backend
+        )
+        return tiles_per_gauss, isect_ids, flatten_ids, isect_offsets
     return tiles_per_gauss, isect_ids, flatten_ids
 
 
@@ -523,18 +741,29 @@ def isect_offset_encode(
     n_images: int,
     tile_width: int,
     tile_height: int,
+    backend: Optional[Literal["cuda", "torch"]] = None,
 ) -> Tensor:
     """Encodes intersection ids to offsets.
 
     Args:
-        isect_ids: Intersection ids. [n_isects]
+        isect_ids: Sorted intersection ids from `isect_tiles()`, either the 64-bit or
+            the 32-bit ones, which are told apart by the dtype. [n_isects]
         n_images: Number of images.
         tile_width: Tile width.
         tile_height: Tile height.
+        backend: The implementation to run with, "cuda" or "torch". Default: None, which
+            runs CUDA tensors with the CUDA backend and other tensors with PyTorch.
 
     Returns:
         Offsets. [I, tile_height, tile_width]
     """
+    if (
+        _select_backend("isect_offset_encode", isect_ids.device, backend) == "torch"
+        # The kernel reads the image and tile ids from the upper 32 bits of 64-bit
+        # ids. Count the 32-bit ones in place rather than widening a copy of them.
+        or isect_ids.dtype == torch.int32
+    ):
+        return _isect_offset_encode(isect_ids, n_images, tile_width, tile_height)
     return _make_lazy_cuda_func("intersect_offset")(
         isect_ids.contiguous(), n_images, tile_width, tile_height
     )
@@ -554,6 +783,7 @@ def rasterize_to_pixels(
     masks: Optional[Tensor] = None,  # [..., tile_height, tile_width]
     packed: bool = False,
     absgrad: bool = False,
+    backend: Optional[Literal["cuda", "torch"]] = None,
 ) -> Tuple[Tensor, Tensor]:
     """Rasterizes Gaussians to pixels.
 
@@ -571,6 +801,8 @@ def rasterize_to_pixels(
         masks: Optional tile mask to skip rendering GS to masked tiles. [..., tile_height, tile_width]. Default: None.
         packed: If True, the input tensors are expected to be packed with shape [nnz, ...]. Default: False.
         absgrad: If True, the backward pass will compute a `.absgrad` attribute for `means2d`. Default: False.
+        backend: The implementation to run with, "cuda" or "torch". Default: None, which
+            runs CUDA tensors with the CUDA backend and other tensors with PyTorch.
 
     Returns:
         A tuple:
@@ -601,6 +833,23 @@ def rasterize_to_pixels(
         assert masks.shape == isect_offsets.shape, masks.shape
         masks = masks.contiguous()
 
+    if _select_backend("rasterize_to_pixels", device, backend) == "torch":
+        return _rasterize_to_pixels(
+            means2d,
+            conics,
+            colors,
+            opacities,
+            image_width,
+            image_height,
+            tile_size,
+            isect_offsets,
+            flatten_ids,
+            backgrounds=backgrounds,
+            masks=masks,
+            packed=packed,
+            absgrad=absgrad,
+        )
+
     # Pad the channels to the nearest supported number if necessary
     if channels > 513 or channels == 0:
         # TODO: maybe worth to support zero channels?
@@ -1 +1,2 @@
+from .gaussian_adam import GaussianAdam
 from .selective_adam import SelectiveAdam
@@ -0,0 +1,217 @@
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from torch import Tensor
+
+from ..cuda._torch_impl import _adam
+from .selective_adam import _check_moment_dtype
+
+
+class GaussianAdam(torch.optim.Adam):
+    """
+    A single Adam optimizer for all the attributes of the Gaussians.
+
+    Instead of one optimizer per attribute, each attribute is a param group of this
+    optimizer, with its own learning rate, and all of them are updated together
+    by one `step()` call with multi-tensor (`torch._foreach_*`) ops. Each param group
+    holds exactly one tensor, so that the densification strategies can replace it
+    with `_update_param_with_optimizer()`. Pass the same optimizer for every
+    attribute in the `optimizers` dictionary of the strategies.
+
+    Without `visibility`, `step()` computes the same update as `torch.optim.Adam`.
+    With `visibility`, it computes the same update as `SelectiveAdam` on the
+    visible Gaussians only, with one visibility mask shared by all the attributes.
+    On CPU and CUDA alike, the visible rows of all the attributes are gathered with
+    the same indices, updated by the same multi-tensor ops and scattered back.
+    Moments in reduced precision are updated one attribute at a time.
+
+    Args:
+        params (iterable): Iterable of dicts defining parameter groups, one for each
+            attribute, e.g. `{"params": [means], "lr": 1.6e-4, "name": "means"}`.
+        lr (float): Default learning rate (default: 1e-3).
+        eps (float): Term added to the denominator to improve numerical stability (default: 1e-8).
+        betas (Tuple[float, float]): Coefficients used for computing running averages of gradient and its square (default: (0.9, 0.999)).
+        moment_dtype (torch.dtype, optional): Storage dtype of `exp_avg` and `exp_avg_sq`,
+            `torch.float32` or `torch.bfloat16`. See `SelectiveAdam`. Default: None, which
+            stores them like the parameters.
+        stochastic_rounding (bool): Whether to round the bfloat16 moments stochastically
+            rather than to nearest (default: True).
+
+    Examples:
+
+        >>> N = 100
+        >>> means = torch.randn(N, 3, requires_grad=True)
+        >>> scales = torch.randn(N, 3, requires_grad=True)
+        >>> optimizer = GaussianAdam(
+        ...     [
+        ...         {"params": [means], "lr": 1.6e-4, "name": "means"},
+        ...         {"params": [scales], "lr": 5e-3, "name": "scales"},
+        ...     ],
+        ...     eps=1e-15,
+        ... )
+        >>> optimizers = {"means": optimizer, "scales": optimizer}
+
+        >>> loss = torch.sum(means**2) + torch.sum(scales**2)
+        >>> loss.backward()
+
+        >>> # Update all the attributes at once, optionally only the visible Gaussians
+        >>> optimizer.step(visibility=torch.rand(N) > 0.5)
+        >>> optimizer.zero_grad(set_to_none=True)
+
+    """
+
+    def __init__(
+        self,
+        params,
+        lr: float = 1e-3,
+        eps: float = 1e-8,
+        betas: Tuple[float, float] = (0.9, 0.999),
+        moment_dtype: Optional[torch.dtype] = None,
+        stochastic_rounding: bool = True,
+    ):
+        super().__init__(params=params, lr=lr, eps=eps, betas=betas)
+        _check_moment_dtype(moment_dtype)
+        self.moment_dtype = moment_dtype
+        self.stochastic_rounding = stochastic_rounding
+        for group in self.param_groups:
+            assert (
+                len(group["params"]) == 1
+            ), "GaussianAdam expects one tensor per group"
+
+    def _init_state(self, param: Tensor) -> Dict[str, Tensor]:
+        # Lazy state initialization, in the same layout as `torch.optim.Adam`
+        state = self.state[param]
+        if len(state) == 0:
+            state["step"] = torch.tensor(0.0, dtype=torch.float32)
+            state["exp_avg"] = torch.zeros_like(
+                param, dtype=self.moment_dtype, memory_format=torch.preserve_format
+            )
+            state["exp_avg_sq"] = torch.zeros_like(
+                param, dtype=self.moment_dtype, memory_format=torch.preserve_format
+            )
+        return state
+
+    @torch.no_grad()
+    def step(self, visibility: Optional[Tensor] = None):
+        if visibility is None:
+            self._step_dense()
+        else:
+            self._step_visible(visibility)
+
+    def _step_dense(self):
+        # Tensors that share (betas, eps) are updated by the same foreach calls,
+        # which is usually all of them.
+        buckets: Dict[tuple, Tuple[List[Tensor], ...]] = {}
+        for group in self.param_groups:
+            param = group["params"][0]
+            if param.grad is None:
+                continue
+            assert (
+                not param.grad.is_sparse
+            ), "GaussianAdam does not support sparse grads"
+            state = self._init_state(param)
+            state["step"] += 1
+            beta1, beta2 = group["betas"]
+            step = state["step"].item()
+            bias_correction1 = 1 - beta1**step
+            bias_correction2_sqrt = (1 - beta2**step) ** 0.5
+
+            if state["exp_avg"].dtype != param.dtype:
+                # Reduced precision moments are updated one tensor at a time, with
+                # the bias corrections folded into lr and eps.
+                _adam(
+                    param,
+                    param.grad,
+                    state["exp_avg"],
+                    state["exp_avg_sq"],
+                    None,
+                    group["lr"] * bias_correction2_sqrt / bias_correction1,
+                    beta1,
+                    beta2,
+                    group["eps"] * bias_correction2_sqrt,
+                    stochastic_rounding=self.stochastic_rounding,
+                )
+                continue
+            key = (beta1, beta2, group["eps"], param.device)
+            bucket = buckets.setdefault(key, ([], [], [], [], [], []))
+            bucket[0].append(param)
+            bucket[1].append(param.grad)
+            bucket[2].append(state["exp_avg"])
+            bucket[3].append(state["exp_avg_sq"])
+            bucket[4].append(-group["lr"] / bias_correction1)
+            bucket[5].append(bias_correction2_sqrt)
+
+        for (beta1, beta2, eps, _), bucket in buckets.items():
+            params, grads, exp_avgs, exp_avg_sqs, step_sizes, bc2_sqrts = bucket
+            torch._foreach_lerp_(exp_avgs, grads, 1 - beta1)
+            torch._foreach_mul_(exp_avg_sqs, beta2)
+            torch._foreach_addcmul_(exp_avg_sqs, grads, grads, 1 - beta2)
+            denoms = torch._foreach_sqrt(exp_avg_sqs)
+            torch._foreach_div_(denoms, bc2_sqrts)
+            torch._foreach_add_(denoms, eps)
+            torch._foreach_addcdiv_(params, exp_avgs, denoms, step_sizes)
+
+    def _step_visible(self, visibility: Tensor):
+        N = visibility.numel()
+        # The indices of the visible rows are computed once per device and shared by
+        # all the attributes.
+        valid = {}
+        # Tensors that share (betas, eps) have their visible rows updated by the same
+        # foreach calls, which is usually all of them.
+        buckets: Dict[tuple, Tuple[List[Tensor], ...]] = {}
+        for group in self.param_groups:
+            param = group["params"][0]
+            if param.grad is None:
+                continue
+            assert param.shape[0] == N, (param.shape, N)
+            state = self._init_state(param)
+            state["step"] += 1
+
+            if param.device not in valid:
+                valid[param.device] = visibility.to(param.device).nonzero().squeeze(-1)
+
+            beta1, beta2 = group["betas"]
+            if state["exp_avg"].dtype != param.dtype:
+                # Reduced precision moments are updated one tensor at a time.
+                _adam(
+                    param,
+                    param.grad,
+                    state["exp_avg"],
+                    state["exp_avg_sq"],
+                    valid[param.device],
+                    group["lr"],
+                    beta1,
+                    beta2,
+                    group["eps"],
+                    stochastic_rounding=self.stochastic_rounding,
+                )
+            else:
+                key = (beta1, beta2, group["eps"], param.device)
+                bucket = buckets.setdefault(key, ([], [], [], [], []))
+                bucket[0].append(param.view(N, -1))
+                bucket[1].append(param.grad.reshape(N, -1))
+                bucket[2].append(state["exp_avg"].view(N, -1))
+                bucket[3].append(state["exp_avg_sq"].view(N, -1))
+                bucket[4].append(-group["lr"])
+
+        for (beta1, beta2, eps, device), bucket in buckets.items():
+            params, grads, exp_avgs, exp_avg_sqs, step_sizes = bucket
+            rows = valid[device]
+            # gather the visible rows of every tensor with the shared indices
+            grads = [x.index_select(0, rows) for x in grads]
+            ms = [x.index_select(0, rows) for x in exp_avgs]
+            vs = [x.index_select(0, rows) for x in exp_avg_sqs]
+            torch._foreach_lerp_(ms, grads, 1 - beta1)
+            torch._foreach_mul_(vs, beta2)
+            torch._foreach_addcmul_(vs, grads, grads, 1 - beta2)
+            denoms = torch._foreach_sqrt(vs)
+            torch._foreach_add_(denoms, eps)
+            steps = torch._foreach_div(ms, denoms)
+            torch._foreach_mul_(steps, step_sizes)
+            # and scatter them back
+            for param, exp_avg, exp_avg_sq, m, v, step in zip(
+                params, exp_avgs, exp_avg_sqs, ms, vs, steps
+            ):
+                exp_avg.index_copy_(0, rows, m)
+                exp_avg_sq.index_copy_(0, rows, v)
+                param.index_add_(0, rows, step)
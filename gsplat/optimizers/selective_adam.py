@@ -1,6 +1,9 @@
+from typing import Optional
+
 import torch
 
-from ..cuda._wrapper import adam
+from ..cuda._torch_impl import _adam
+from ..cuda._wrapper import _select_backend, adam
 
 
 class SelectiveAdam(torch.optim.Adam):
@@ -14,7 +17,9 @@ class SelectiveAdam(torch.optim.Adam):
 
     Additionally, the operations are fused into a single kernel. This optimizer
     leverages the `adam` function from a CUDA backend for
-    optimized sparse updates.
+    optimized sparse updates. On CPU, only the visible rows are gathered, updated
+    and written back, and a parameter group may hold several tensors that share
+    the same visibility.
 
     This is one of the two optimizers mentioned in the Taming3DGS paper.
 
@@ -22,6 +27,14 @@ class SelectiveAdam(torch.optim.Adam):
         params (iterable): Iterable of parameters to optimize or dicts defining parameter groups.
         eps (float): Term added to the denominator to improve numerical stability (default: 1e-8).
         betas (Tuple[float, float]): Coefficients used for computing running averages of gradient and its square (default: (0.9, 0.999)).
+        moment_dtype (torch.dtype, optional): Storage dtype of `exp_avg` and `exp_avg_sq`,
+            e.g. `torch.bfloat16` to halve their memory. The moments are still updated in the
+            precision of the parameters, with the PyTorch implementation. float16 is not
+            supported, since the squared gradients of the Gaussians underflow in it, which
+            blows the updates up with a small `eps`. Default: None, which stores them like
+            the parameters.
+        stochastic_rounding (bool): Whether to round the bfloat16 moments stochastically
+            rather than to nearest (default: True).
 
     Examples:
 
@@ -41,46 +54,92 @@ class SelectiveAdam(torch.optim.Adam):
 
     """
 
-    def __init__(self, params, eps, betas):
+    def __init__(
+        self,
+        params,
+        eps,
+        betas,
+        moment_dtype: Optional[torch.dtype] = None,
+        stochastic_rounding: bool = True,
+    ):
         super().__init__(params=params, eps=eps, betas=betas)
+        _check_moment_dtype(moment_dtype)
+        self.moment_dtype = moment_dtype
+        self.stochastic_rounding = stochastic_rounding
 
     @torch.no_grad()
     def step(self, visibility):
         N = visibility.numel()
+        # The PyTorch backend updates the visible rows with index ops, so their
+        # indices are gathered once and shared by all the tensors.
+        valid = {}
         for group in self.param_groups:
             lr = group["lr"]
             eps = group["eps"]
             beta1, beta2 = group["betas"]
 
-            assert len(group["params"]) == 1, "more than one tensor in group"
-            param = group["params"][0]
-            if param.grad is None:
-                continue
-
-            # Lazy state initialization
-            state = self.state[param]
-            if len(state) == 0:
-                state["step"] = torch.tensor(0.0, dtype=torch.float32)
-                state["exp_avg"] = torch.zeros_like(
-                    param, memory_format=torch.preserve_format
-                )
-                state["exp_avg_sq"] = torch.zeros_like(
-                    param, memory_format=torch.preserve_format
+            for param in group["params"]:
+                if param.grad is None:
+                    continue
+                assert param.shape[0] == N, (param.shape, N)
+
+                # Lazy state initialization
+                state = self.state[param]
+                if len(state) == 0:
+                    state["step"] = torch.tensor(0.0, dtype=torch.float32)
+                    state["exp_avg"] = torch.zeros_like(
+                        param,
+                        dtype=self.moment_dtype,
+                        memory_format=torch.preserve_format,
+                    )
+                    state["exp_avg_sq"] = torch.zeros_like(
+                        param,
+                        dtype=self.moment_dtype,
+                        memory_format=torch.preserve_format,
+                    )
+
+                # the CUDA kernel needs the moments in the dtype of the parameters
+                use_torch = (
+                    state["exp_avg"].dtype != param.dtype
+                    or _select_backend("adam", param.device) == "torch"
                 )
-
-            stored_state = self.state.get(param, None)
-            exp_avg = stored_state["exp_avg"]
-            exp_avg_sq = stored_state["exp_avg_sq"]
-            M = param.numel() // N
-
-            adam(
-                param,
-                param.grad,
-                exp_avg,
-                exp_avg_sq,
-                visibility,
-                lr,
-                beta1,
-                beta2,
-                eps,
-            )
+                if (param.device, use_torch) not in valid:
+                    visibility = visibility.to(param.device)
+                    valid[param.device, use_torch] = (
+                        visibility.nonzero().squeeze(-1) if use_torch else visibility
+                    )
+
+                if use_torch:
+                    _adam(
+                        param,
+                        param.grad,
+                        state["exp_avg"],
+                        state["exp_avg_sq"],
+                        valid[param.device, use_torch],
+                        lr,
+                        beta1,
+                        beta2,
+                        eps,
+                        stochastic_rounding=self.stochastic_rounding,
+                    )
+                else:
+                    adam(
+                        param,
+                        param.grad,
+                        state["exp_avg"],
+                        state["exp_avg_sq"],
+                        valid[param.device, use_torch],
+                        lr,
+                        beta1,
+                        beta2,
+                        eps,
+                    )
+
+
+def _check_moment_dtype(moment_dtype: Optional[torch.dtype]):
+    # float16 has the exponent range of neither the squared gradients nor `eps`
+    if moment_dtype not in (None, torch.float32, torch.bfloat16):
+        raise ValueError(
+            f"moment_dtype should be None, torch.float32 or torch.bfloat16, got "
+            f"{moment_dtype}"
+        )
@@ -4,7 +4,8 @@ from typing import Tuple
 import torch
 from torch import Tensor
 
-from .cuda._wrapper import _make_lazy_cuda_func
+from .cuda._torch_impl import _compute_relocation
+from .cuda._wrapper import _make_lazy_cuda_func, _select_backend
 
 
 def compute_relocation(
@@ -19,6 +20,8 @@ def compute_relocation(
     It uses the old opacities and scales to compute the new opacities and scales.
     This is an implementation of the paper
     `3D Gaussian Splatting as Markov Chain Monte Carlo <https://arxiv.org/pdf/2404.09591>`_,
+    which runs with the CUDA kernel on CUDA tensors and with a vectorized PyTorch
+    implementation otherwise.
 
     Args:
         opacities: The opacities of the Gaussians. [N]
@@ -43,6 +46,8 @@ def compute_relocation(
     ratios.clamp_(min=1, max=n_max)
     ratios = ratios.int().contiguous()
 
+    if _select_backend("relocation", opacities.device) == "torch":
+        return _compute_relocation(opacities, scales, ratios, binoms)
     new_opacities, new_scales = _make_lazy_cuda_func("relocation")(
         opacities, scales, ratios, binoms, n_max
     )
@@ -14,7 +14,6 @@ from .cuda._wrapper import (
     fully_fused_projection,
     fully_fused_projection_2dgs,
     fully_fused_projection_with_ut,
-    isect_offset_encode,
     isect_tiles,
     rasterize_to_pixels,
     rasterize_to_pixels_2dgs,
@@ -67,6 +66,8 @@ def rasterization(
     # rolling shutter
     rolling_shutter: RollingShutterType = RollingShutterType.GLOBAL,
     viewmats_rs: Optional[Tensor] = None,  # [..., C, 4, 4]
+    tight_isect: bool = False,
+    backend: Optional[Literal["cuda", "torch"]] = None,
 ) -> Tuple[Tensor, Tensor, Dict]:
     """Rasterize a set of 3D Gaussians (N) to a batch of image planes (C).
 
@@ -223,6 +224,18 @@ def rasterization(
         rolling_shutter: The rolling shutter type. Default `RollingShutterType.GLOBAL` means
             global shutter.
         viewmats_rs: The second viewmat when rolling shutter is used. Default is None.
+        tight_isect: Whether to only keep the tiles that the ellipse of each Gaussian
+            actually touches, instead of all the tiles of its bounding box. This is
+            lossless and reduces the sorting and rasterization work. The number of
+            intersections with and without it is reported as `meta["n_isects"]` and
+            `meta["n_isects_aabb"]`. Default is False.
+        backend: The implementation to run projection, spherical harmonics, tile
+            intersection and rasterization with, "cuda" or "torch". Default is None,
+            which uses the CUDA backend for CUDA tensors and the PyTorch implementation
+            in `gsplat.cuda._torch_impl` otherwise, so no CUDA extension is loaded
+            on CPU. Ops without a CUDA build fall back to PyTorch one by one.
+            The PyTorch backend buckets the intersections by tile, which gives
+            `meta["isect_offsets"]` directly.
 
     Returns:
         A tuple:
@@ -351,6 +364,9 @@ def rasterization(
         ), "viewmats_rs should be None for global rolling shutter."
 
     if with_ut or with_eval3d:
+        assert (
+            backend != "torch" and device.type == "cuda"
+        ), "UT and eval3d are only supported by the CUDA backend."
         assert (quats is not None) and (
             scales is not None
         ), "UT and eval3d requires to provide quats and scales."
@@ -424,6 +440,7 @@ def rasterization(
             calc_compensations=(rasterize_mode == "antialiased"),
             camera_model=camera_model,
             opacities=opacities,  # use opacities to compute a tigher bound for radii.
+            backend=backend,
         )
 
     if packed:
@@ -492,6 +509,8 @@ def rasterization(
         if viewmats_rs is not None:
             campos_rs = torch.inverse(viewmats_rs)[..., :3, 3]
             campos = 0.5 * (campos + campos_rs)  # [..., C, 3]
+        # only gather the bands in use
+        K = (sh_degree + 1) ** 2
         if packed:
             dirs = (
                 means.view(B, N, 3)[batch_ids, gaussian_ids]
@@ -500,27 +519,40 @@ def rasterization(
             masks = (radii > 0).all(dim=-1)  # [nnz]
             if colors.dim() == num_batch_dims + 3:
                 # Turn [..., N, K, 3] into [nnz, 3]
-                shs = colors.view(B, N, -1, 3)[batch_ids, gaussian_ids]  # [nnz, K, 3]
+                shs = colors.view(B, N, -1, 3)[
+                    batch_ids, gaussian_ids, :K
+                ]  # [nnz, K, 3]
             else:
                 # Turn [..., C, N, K, 3] into [nnz, 3]
                 shs = colors.view(B, C, N, -1, 3)[
-                    batch_ids, camera_ids, gaussian_ids
+                    batch_ids, camera_ids, gaussian_ids, :K
                 ]  # [nnz, K, 3]
-            colors = spherical_harmonics(sh_degree, dirs, shs, masks=masks)  # [nnz, 3]
+            colors = spherical_harmonics(
+                sh_degree, dirs, shs, masks=masks, backend=backend
+            )  # [nnz, 3]
         else:
-            dirs = means[..., None, :, :] - campos[..., None, :]  # [..., C, N, 3]
+            # Only evaluate the visible (camera, Gaussian) pairs, rather than
+            # broadcasting the coefficients to every camera. The others are zeros.
             masks = (radii > 0).all(dim=-1)  # [..., C, N]
+            vis_ids = torch.nonzero(masks.reshape(B, C, N), as_tuple=True)
+            vis_batch_ids, vis_camera_ids, vis_gaussian_ids = vis_ids
+            dirs = (
+                means.reshape(B, N, 3)[vis_batch_ids, vis_gaussian_ids]
+                - campos.reshape(B, C, 3)[vis_batch_ids, vis_camera_ids]
+            )  # [nnz, 3]
             if colors.dim() == num_batch_dims + 3:
-                # Turn [..., N, K, 3] into [..., C, N, K, 3]
-                shs = torch.broadcast_to(
-                    colors[..., None, :, :, :], batch_dims + (C, N, -1, 3)
-                )
+                # Turn [..., N, K, 3] into [nnz, K, 3]
+                shs = colors.reshape(B, N, -1, 3)[vis_batch_ids, vis_gaussian_ids, :K]
             else:
-                # colors is already [..., C, N, K, 3]
-                shs = colors
-            colors = spherical_harmonics(
-                sh_degree, dirs, shs, masks=masks
-            )  # [..., C, N, 3]
+                # Turn [..., C, N, K, 3] into [nnz, K, 3]
+                shs = colors.reshape(B, C, N, -1, 3)[
+                    vis_batch_ids, vis_camera_ids, vis_gaussian_ids, :K
+                ]
+            vis_colors = spherical_harmonics(
+                sh_degree, dirs, shs, backend=backend
+            )  # [nnz, 3]
+            colors = vis_colors.new_zeros((B, C, N, 3)).index_put(vis_ids, vis_colors)
+            colors = colors.reshape(batch_dims + (C, N, 3))
         # make it apple-to-apple with Inria's CUDA Backend.
         colors = torch.clamp_min(colors + 0.5, 0.0)
 
@@ -631,7 +663,7 @@ def rasterization(
     # Identify intersecting tiles
     tile_width = math.ceil(width / float(tile_size))
     tile_height = math.ceil(height / float(tile_size))
-    tiles_per_gauss, isect_ids, flatten_ids = isect_tiles(
+    tiles_per_gauss, isect_ids, flatten_ids, isect_offsets = isect_tiles(
         means2d,
         radii,
         depths,
@@ -643,9 +675,11 @@ def rasterization(
         n_images=I,
         image_ids=image_ids,
         gaussian_ids=gaussian_ids,
+        conics=conics if tight_isect else None,
+        opacities=opacities if tight_isect else None,
+        return_offsets=True,
+        backend=backend,
     )
-    # print("rank", world_rank, "Before isect_offset_encode")
-    isect_offsets = isect_offset_encode(isect_ids, I, tile_width, tile_height)
     isect_offsets = isect_offsets.reshape(batch_dims + (C, tile_height, tile_width))
 
     meta.update(
@@ -661,8 +695,19 @@ def rasterization(
             "tile_size": tile_size,
             "n_batches": B,
             "n_cameras": C,
+            "n_isects": len(isect_ids),
         }
     )
+    if tight_isect:
+        # the tiles of the AABBs, as counted by isect_tiles() without culling
+        tile_bounds = means2d.new_tensor([tile_width, tile_height])
+        tile_mins = torch.floor((means2d - radii) / tile_size)
+        tile_maxs = torch.ceil((means2d + radii) / tile_size)
+        tile_mins = tile_mins.clamp(min=0).minimum(tile_bounds)
+        tile_maxs = tile_maxs.clamp(min=0).minimum(tile_bounds)
+        tiles_per_gauss_aabb = (tile_maxs - tile_mins).prod(dim=-1)
+        tiles_per_gauss_aabb *= (radii > 0).all(dim=-1)
+        meta["n_isects_aabb"] = int(tiles_per_gauss_aabb.sum().item())
 
     # print("rank", world_rank, "Before rasterize_to_pixels")
     if colors.shape[-1] > channel_chunk:
@@ -713,6 +758,7 @@ def rasterization(
                     backgrounds=backgrounds_chunk,
                     packed=packed,
                     absgrad=absgrad,
+                    backend=backend,
                 )
             render_colors.append(render_colors_)
             render_alphas.append(render_alphas_)
@@ -756,6 +802,7 @@ def rasterization(
                 backgrounds=backgrounds,
                 packed=packed,
                 absgrad=absgrad,
+                backend=backend,
             )
     if render_mode in ["ED", "RGB+ED"]:
         # normalize the accumulated depth to get the expected depth
@@ -795,12 +842,9 @@ def _rasterization(
 
     .. note::
         This function still relies on gsplat's CUDA backend for some computation, but the
-        entire differentiable graph is on of PyTorch (and nerfacc) so could use Pytorch's
-        autograd for backpropagation.
-
-    .. note::
-        This function relies on installing latest nerfacc, via:
-        pip install git+https://github.com/nerfstudio-project/nerfacc
+        entire differentiable graph is on of PyTorch so could use Pytorch's autograd for
+        backpropagation. The rasterization step backpropagates with the hand-written
+        backward of `_rasterize_to_pixels()`, which mirrors the CUDA one.
 
     .. note::
         Compared to rasterization(), this function does not support some arguments such as
@@ -877,7 +921,7 @@ def _rasterization(
     # Identify intersecting tiles
     tile_width = math.ceil(width / float(tile_size))
     tile_height = math.ceil(height / float(tile_size))
-    tiles_per_gauss, isect_ids, flatten_ids = isect_tiles(
+    tiles_per_gauss, isect_ids, flatten_ids, isect_offsets = isect_tiles(
         means2d,
         radii,
         depths,
@@ -888,8 +932,8 @@ def _rasterization(
         n_images=I,
         image_ids=image_ids,
         gaussian_ids=gaussian_ids,
+        return_offsets=True,
     )
-    isect_offsets = isect_offset_encode(isect_ids, I, tile_width, tile_height)
     isect_offsets = isect_offsets.reshape(batch_dims + (C, tile_height, tile_width))
 
     # Turn colors into [..., C, N, D] or [..., nnz, D] to pass into rasterize_to_pixels()
@@ -1483,7 +1527,7 @@ def rasterization_2dgs(
     # Identify intersecting tiles
     tile_width = math.ceil(width / float(tile_size))
     tile_height = math.ceil(height / float(tile_size))
-    tiles_per_gauss, isect_ids, flatten_ids = isect_tiles(
+    tiles_per_gauss, isect_ids, flatten_ids, isect_offsets = isect_tiles(
         means2d,
         radii,
         depths,
@@ -1494,8 +1538,8 @@ def rasterization_2dgs(
         n_images=I,
         image_ids=image_ids,
         gaussian_ids=gaussian_ids,
+        return_offsets=True,
     )
-    isect_offsets = isect_offset_encode(isect_ids, I, tile_width, tile_height)
     isect_offsets = isect_offsets.reshape(batch_dims + (C, tile_height, tile_width))
 
     # TODO: SH also suport N-D.
@@ -26,12 +26,25 @@ class Strategy:
             f"but got {trainable_params} and {optimizers.keys()}"
         )
 
+        # An optimizer may be shared by several parameters (e.g. `GaussianAdam`), in
+        # which case it has one param_group for each of them.
+        n_shared = {}
         for optimizer in optimizers.values():
-            assert len(optimizer.param_groups) == 1, (
+            n_shared[id(optimizer)] = n_shared.get(id(optimizer), 0) + 1
+        for name, optimizer in optimizers.items():
+            assert len(optimizer.param_groups) == n_shared[id(optimizer)], (
                 "Each optimizer must have exactly one param_group, "
                 "that cooresponds to each parameter, "
                 f"but got {len(optimizer.param_groups)}"
             )
+            groups = [
+                group
+                for group in optimizer.param_groups
+                if any(p is params[name] for p in group["params"])
+            ]
+            assert (
+                len(groups) == 1 and len(groups[0]["params"]) == 1
+            ), f"The optimizer of {name} must hold it alone in one param_group."
 
     def step_pre_backward(
         self,
@@ -1,11 +1,12 @@
 from dataclasses import dataclass
-from typing import Any, Dict, Tuple, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
 import torch
+from torch import Tensor
 from typing_extensions import Literal
 
 from .base import Strategy
-from .ops import duplicate, remove, reset_opa, split
+from .ops import _capacity, duplicate, grow_and_prune, remove, reset_opa, split
 
 
 @dataclass
@@ -58,6 +59,14 @@ class DefaultStrategy(Strategy):
         key_for_gradient (str): Which variable uses for densification strategy.
           3DGS uses "means2d" gradient and 2DGS uses a similar gradient which stores
           in variable "gradient_2dgs".
+        reuse_storage (bool): Keep the parameters, the optimizer states and the running
+          state in storage with slack (grown by doubling), so that densification writes
+          the new GSs in place, and pruned GSs free slots that are filled with the last
+          GSs. This avoids reallocating every tensor at each refinement, but changes
+          the order of the GSs when pruning, and the tensors hold up to twice the
+          memory of their length. Default is False, in which case the GSs are grown
+          and pruned in a single pass that copies each tensor once, see
+          :func:`gsplat.strategy.ops.grow_and_prune`.
 
     Examples:
 
@@ -92,6 +101,7 @@ class DefaultStrategy(Strategy):
     revised_opacity: bool = False
     verbose: bool = False
     key_for_gradient: Literal["means2d", "gradient_2dgs"] = "means2d"
+    reuse_storage: bool = False
 
     def initialize_state(self, scene_scale: float = 1.0) -> Dict[str, Any]:
         """Initialize and return the running state for this strategy.
@@ -169,28 +179,36 @@ class DefaultStrategy(Strategy):
             and step % self.refine_every == 0
             and step % self.reset_every >= self.pause_refine_after_reset
         ):
-            # grow GSs
-            n_dupli, n_split = self._grow_gs(params, optimizers, state, step)
+            n_before = len(params["means"])
+            if self.reuse_storage:
+                # grow GSs
+                n_dupli, n_split = self._grow_gs(params, optimizers, state, step)
+                # prune GSs
+                n_prune = self._prune_gs(params, optimizers, state, step)
+            else:
+                # grow and prune GSs in a single pass
+                n_dupli, n_split, n_prune = self._refine_gs(
+                    params, optimizers, state, step
+                )
             if self.verbose:
                 print(
                     f"Step {step}: {n_dupli} GSs duplicated, {n_split} GSs split. "
-                    f"Now having {len(params['means'])} GSs."
+                    f"Now having {n_before + n_dupli + n_split} GSs."
                 )
-
-            # prune GSs
-            n_prune = self._prune_gs(params, optimizers, state, step)
-            if self.verbose:
                 print(
                     f"Step {step}: {n_prune} GSs pruned. "
                     f"Now having {len(params['means'])} GSs."
                 )
+                if self.reuse_storage:
+                    print(f"Step {step}: Capacity {_capacity(params['means'])} GSs.")
 
             # reset running stats
             state["grad2d"].zero_()
             state["count"].zero_()
             if self.refine_scale2d_stop_iter > 0:
                 state["radii"].zero_()
-            torch.cuda.empty_cache()
+            if not self.reuse_storage:
+                torch.cuda.empty_cache()
 
         if step % self.reset_every == 0 & step > 0:
             reset_opa(
@@ -217,13 +235,10 @@ class DefaultStrategy(Strategy):
         ]:
             assert key in info, f"{key} is required but missing."
 
-        # normalize grads to [-1, 1] screen space
         if self.absgrad:
-            grads = info[self.key_for_gradient].absgrad.clone()
+            grads = info[self.key_for_gradient].absgrad
         else:
-            grads = info[self.key_for_gradient].grad.clone()
-        grads[..., 0] *= info["width"] / 2.0 * info["n_cameras"]
-        grads[..., 1] *= info["height"] / 2.0 * info["n_cameras"]
+            grads = info[self.key_for_gradient].grad
 
         # initialize state on the first run
         n_gaussian = len(list(params.values())[0])
@@ -247,29 +262,38 @@ class DefaultStrategy(Strategy):
             gs_ids = torch.where(sel)[1]  # [nnz]
             grads = grads[sel]  # [nnz, 2]
             radii = info["radii"][sel].max(dim=-1).values  # [nnz]
-        state["grad2d"].index_add_(0, gs_ids, grads.norm(dim=-1))
-        state["count"].index_add_(
-            0, gs_ids, torch.ones_like(gs_ids, dtype=torch.float32)
+
+        # normalize grads to [-1, 1] screen space, without modifying the grads
+        scale = grads.new_tensor(
+            [
+                info["width"] / 2.0 * info["n_cameras"],
+                info["height"] / 2.0 * info["n_cameras"],
+            ]
         )
+        # accumulate [grad_norm, 1] of all the GSs with one index_add_ into an [N, 2]
+        # tensor, where the same GS appears several times with batch_size > 1, and
+        # add its columns to grad2d and count
+        grad_norms = torch.linalg.vector_norm(grads * scale, dim=-1)
+        values = torch.stack([grad_norms, torch.ones_like(grad_norms)], dim=-1)
+        stats = values.new_zeros((n_gaussian, 2)).index_add_(0, gs_ids, values)
+        state["grad2d"] += stats[:, 0]
+        state["count"] += stats[:, 1]
         if self.refine_scale2d_stop_iter > 0:
-            # Should be ideally using scatter max
-            state["radii"][gs_ids] = torch.maximum(
-                state["radii"][gs_ids],
-                # normalize radii to [0, 1] screen space
-                radii / float(max(info["width"], info["height"])),
+            # normalize radii to [0, 1] screen space
+            state["radii"].scatter_reduce_(
+                0, gs_ids, radii / float(max(info["width"], info["height"])), "amax"
             )
 
     @torch.no_grad()
-    def _grow_gs(
+    def _grow_masks(
         self,
         params: Union[Dict[str, torch.nn.Parameter], torch.nn.ParameterDict],
-        optimizers: Dict[str, torch.optim.Optimizer],
         state: Dict[str, Any],
         step: int,
-    ) -> Tuple[int, int]:
+    ) -> Tuple[Tensor, Tensor]:
+        """The masks of the GSs to duplicate and to split."""
         count = state["count"]
         grads = state["grad2d"] / count.clamp_min(1)
-        device = grads.device
 
         is_grad_high = grads > self.grow_grad2d
         is_small = (
@@ -277,17 +301,83 @@ class DefaultStrategy(Strategy):
             <= self.grow_scale3d * state["scene_scale"]
         )
         is_dupli = is_grad_high & is_small
-        n_dupli = is_dupli.sum().item()
 
         is_large = ~is_small
         is_split = is_grad_high & is_large
         if step < self.refine_scale2d_stop_iter:
             is_split |= state["radii"] > self.grow_scale2d
+        return is_dupli, is_split
+
+    @torch.no_grad()
+    def _prune_mask(
+        self,
+        params: Union[Dict[str, Tensor], torch.nn.ParameterDict],
+        state: Dict[str, Any],
+        step: int,
+    ) -> Tensor:
+        """The mask of the GSs to prune, which only reads the "opacities" and the
+        "scales" of `params`."""
+        is_prune = torch.sigmoid(params["opacities"].flatten()) < self.prune_opa
+        if step > self.reset_every:
+            is_too_big = (
+                torch.exp(params["scales"]).max(dim=-1).values
+                > self.prune_scale3d * state["scene_scale"]
+            )
+            # The official code also implements sreen-size pruning but
+            # it's actually not being used due to a bug:
+            # https://github.com/graphdeco-inria/gaussian-splatting/issues/123
+            # We implement it here for completeness but set `refine_scale2d_stop_iter`
+            # to 0 by default to disable it.
+            if step < self.refine_scale2d_stop_iter:
+                is_too_big |= state["radii"] > self.prune_scale2d
+
+            is_prune = is_prune | is_too_big
+        return is_prune
+
+    @torch.no_grad()
+    def _refine_gs(
+        self,
+        params: Union[Dict[str, torch.nn.Parameter], torch.nn.ParameterDict],
+        optimizers: Dict[str, torch.optim.Optimizer],
+        state: Dict[str, Any],
+        step: int,
+    ) -> Tuple[int, int, int]:
+        """Same as `_grow_gs()` followed by `_prune_gs()`, with a single gather per
+        tensor, see `grow_and_prune()`."""
+        is_dupli, is_split = self._grow_masks(params, state, step)
+        _, n_prune = grow_and_prune(
+            params=params,
+            optimizers=optimizers,
+            state=state,
+            mask_dupli=is_dupli,
+            mask_split=is_split,
+            prune_fn=lambda p, s: self._prune_mask(p, s, step),
+            revised_opacity=self.revised_opacity,
+        )
+        return is_dupli.sum().item(), is_split.sum().item(), n_prune
+
+    @torch.no_grad()
+    def _grow_gs(
+        self,
+        params: Union[Dict[str, torch.nn.Parameter], torch.nn.ParameterDict],
+        optimizers: Dict[str, torch.optim.Optimizer],
+        state: Dict[str, Any],
+        step: int,
+    ) -> Tuple[int, int]:
+        is_dupli, is_split = self._grow_masks(params, state, step)
+        n_dupli = is_dupli.sum().item()
         n_split = is_split.sum().item()
+        device = is_dupli.device
 
         # first duplicate
         if n_dupli > 0:
-            duplicate(params=params, optimizers=optimizers, state=state, mask=is_dupli)
+            duplicate(
+                params=params,
+                optimizers=optimizers,
+                state=state,
+                mask=is_dupli,
+                reuse_storage=self.reuse_storage,
+            )
 
         # new GSs added by duplication will not be split
         is_split = torch.cat(
@@ -305,6 +395,7 @@ class DefaultStrategy(Strategy):
                 state=state,
                 mask=is_split,
                 revised_opacity=self.revised_opacity,
+                reuse_storage=self.reuse_storage,
             )
         return n_dupli, n_split
 
@@ -316,24 +407,15 @@ class DefaultStrategy(Strategy):
         state: Dict[str, Any],
         step: int,
     ) -> int:
-        is_prune = torch.sigmoid(params["opacities"].flatten()) < self.prune_opa
-        if step > self.reset_every:
-            is_too_big = (
-                torch.exp(params["scales"]).max(dim=-1).values
-                > self.prune_scale3d * state["scene_scale"]
-            )
-            # The official code also implements sreen-size pruning but
-            # it's actually not being used due to a bug:
-            # https://github.com/graphdeco-inria/gaussian-splatting/issues/123
-            # We implement it here for completeness but set `refine_scale2d_stop_iter`
-            # to 0 by default to disable it.
-            if step < self.refine_scale2d_stop_iter:
-                is_too_big |= state["radii"] > self.prune_scale2d
-
-            is_prune = is_prune | is_too_big
-
+        is_prune = self._prune_mask(params, state, step)
         n_prune = is_prune.sum().item()
         if n_prune > 0:
-            remove(params=params, optimizers=optimizers, state=state, mask=is_prune)
+            remove(
+                params=params,
+                optimizers=optimizers,
+                state=state,
+                mask=is_prune,
+                reuse_storage=self.reuse_storage,
+            )
 
         return n_prune
@@ -1,6 +1,6 @@
 import math
 from dataclasses import dataclass
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Union
 
 import torch
 from torch import Tensor
@@ -29,6 +29,15 @@ class MCMCStrategy(Strategy):
         refine_every (int): Refine GSs every this steps. Default to 100.
         min_opacity (float): GSs with opacity below this value will be pruned. Default to 0.005.
         verbose (bool): Whether to print verbose information. Default to False.
+        reuse_storage (bool): Write the added GSs into storage with slack, which is
+          allocated for `cap_max` GSs once the current storage is full, instead of
+          reallocating every tensor at each refinement. Default to False.
+        noise_gate_tol (float): Only perturb the GSs whose opacity gate of the noise
+          is above this value, which are the nearly transparent ones, and compute
+          their covariances and noise only. Default to 0.0, which perturbs all GSs.
+        noise_cache_tol (Optional[float]): Reuse the covariances of the noise between
+          refinements for the GSs whose normalized quaternions and log-scales changed
+          by at most this value. Default to None, which recomputes them every step.
 
     Examples:
 
@@ -53,6 +62,9 @@ class MCMCStrategy(Strategy):
     refine_every: int = 100
     min_opacity: float = 0.005
     verbose: bool = False
+    reuse_storage: bool = False
+    noise_gate_tol: float = 0.0
+    noise_cache_tol: Optional[float] = None
 
     def initialize_state(self) -> Dict[str, Any]:
         """Initialize and return the running state for this strategy."""
@@ -137,11 +149,19 @@ class MCMCStrategy(Strategy):
                     f"Now having {len(params['means'])} GSs."
                 )
 
-            torch.cuda.empty_cache()
+            # the cached covariances of the noise are out of date
+            state.pop("noise_cache", None)
+            if not self.reuse_storage:
+                torch.cuda.empty_cache()
 
         # add noise to GSs
         inject_noise_to_position(
-            params=params, optimizers=optimizers, state={}, scaler=lr * self.noise_lr
+            params=params,
+            optimizers=optimizers,
+            state=state,
+            scaler=lr * self.noise_lr,
+            gate_tol=self.noise_gate_tol,
+            cache_tol=self.noise_cache_tol,
         )
 
     @torch.no_grad()
@@ -183,5 +203,7 @@ class MCMCStrategy(Strategy):
                 n=n_gs,
                 binoms=binoms,
                 min_opacity=self.min_opacity,
+                reuse_storage=self.reuse_storage,
+                capacity=self.cap_max,
             )
         return n_gs
@@ -1,5 +1,4 @@
-import numpy as np
-from typing import Callable, Dict, List, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import torch
 import torch.nn.functional as F
@@ -10,13 +9,46 @@ from gsplat.relocation import compute_relocation
 from gsplat.utils import normalized_quat_to_rotmat
 
 
+@torch.no_grad()
+def _cdf_sample(weights: Tensor, n: int, replacement: bool = True) -> Tensor:
+    """Sample from a distribution on the device of `weights`, for any number of elements.
+
+    With replacement, uniform samples are located in the cumulative sum of the
+    weights with `torch.searchsorted`, which is accumulated in float64 so that small
+    weights are not lost among billions of elements. Without replacement, the `n`
+    elements with the smallest exponential keys `-log(u) / w` are taken
+    (Efraimidis & Spirakis, 2006). Both only draw from the torch generator, so they
+    are deterministic under `torch.manual_seed`.
+
+    Args:
+        weights (Tensor): A 1D tensor of non-negative weights for each element.
+        n (int): The number of samples to draw.
+        replacement (bool): Whether to sample with replacement. Default is True.
+
+    Returns:
+        Tensor: A 1D tensor of sampled indices.
+    """
+    if replacement:
+        cdf = torch.cumsum(weights, dim=0, dtype=torch.float64)
+        u = torch.rand(n, dtype=torch.float64, device=weights.device) * cdf[-1]
+        # elements of zero weight have an empty interval, and are never sampled
+        sampled_idxs = torch.searchsorted(cdf, u, right=True)
+        return sampled_idxs.clamp_max_(len(weights) - 1)
+    else:
+        assert n <= (weights > 0).sum().item(), "not enough elements to sample"
+        keys = torch.rand(weights.shape, device=weights.device).log_().neg_()
+        keys.div_(weights)
+        return torch.topk(keys, n, largest=False, sorted=False).indices
+
+
 @torch.no_grad()
 def _multinomial_sample(weights: Tensor, n: int, replacement: bool = True) -> Tensor:
-    """Sample from a distribution using torch.multinomial or numpy.random.choice.
+    """Sample from a distribution using torch.multinomial or `_cdf_sample()`.
 
-    This function adaptively chooses between `torch.multinomial` and `numpy.random.choice`
+    This function adaptively chooses between `torch.multinomial` and `_cdf_sample()`
     based on the number of elements in `weights`. If the number of elements exceeds
-    the torch.multinomial limit (2^24), it falls back to using `numpy.random.choice`.
+    the torch.multinomial limit (2^24), it falls back to `_cdf_sample()`, which
+    samples on the same device without copying the weights to the host.
 
     Args:
         weights (Tensor): A 1D tensor of weights for each element.
@@ -32,16 +64,8 @@ def _multinomial_sample(weights: Tensor, n: int, replacement: bool = True) -> Te
         # Use torch.multinomial for elements within the limit
         return torch.multinomial(weights, n, replacement=replacement)
     else:
-        # Fallback to numpy.random.choice for larger element spaces
-        weights = weights / weights.sum()
-        weights_np = weights.detach().cpu().numpy()
-        sampled_idxs_np = np.random.choice(
-            num_elements, size=n, p=weights_np, replace=replacement
-        )
-        sampled_idxs = torch.from_numpy(sampled_idxs_np)
-
-        # Return the sampled indices on the original device
-        return sampled_idxs.to(weights.device)
+        # Fallback to the inverse CDF for larger element spaces
+        return _cdf_sample(weights, n, replacement=replacement)
 
 
 @torch.no_grad()
@@ -78,23 +102,93 @@ def _update_param_with_optimizer(
             )
             continue
         optimizer = optimizers[name]
-        for i in range(len(optimizer.param_groups)):
+        # The optimizer may be shared by several parameters (e.g. `GaussianAdam`),
+        # in which case only the param group that holds this parameter is updated.
+        for group in optimizer.param_groups:
+            if not any(p is param for p in group["params"]):
+                continue
             param_state = optimizer.state[param]
             del optimizer.state[param]
             for key in param_state.keys():
                 if key != "step":
                     v = param_state[key]
                     param_state[key] = optimizer_fn(key, v)
-            optimizer.param_groups[i]["params"] = [new_param]
+            group["params"] = [new_param]
             optimizer.state[new_param] = param_state
 
 
+def _capacity(t: Tensor) -> int:
+    """Number of rows that the storage of `t` holds from the first row of `t`.
+
+    Tensors grown by `_append_rows()` keep some slack in their storage, so their
+    capacity is larger than their length.
+    """
+    assert t.is_contiguous(), "only contiguous tensors have a capacity"
+    if t.numel() == 0:
+        return len(t)
+    n_elements = t.untyped_storage().nbytes() // t.element_size() - t.storage_offset()
+    return n_elements // t.stride(0)
+
+
+def _with_rows(t: Tensor, n: int) -> Tensor:
+    """A view of the storage of `t` with `n` rows, which may go past the end of `t`
+    as long as they fit in its capacity."""
+    assert n <= _capacity(t), (n, _capacity(t))
+    return torch.empty(0, dtype=t.dtype, device=t.device).set_(
+        t.untyped_storage(), t.storage_offset(), (n, *t.shape[1:]), t.stride()
+    )
+
+
+def _append_rows(t: Tensor, rows: Tensor, capacity: Optional[int] = None) -> Tensor:
+    """Appends `rows` to `t`, writing them into the slack of its storage.
+
+    When the slack is too small, the storage is reallocated with twice the rows
+    (or `capacity` rows, if given), so that growing one row at a time costs
+    amortized O(1) copies per row. Returns a view of the storage with all the rows.
+    """
+    n, k = len(t), len(rows)
+    if _capacity(t) < n + k:
+        capacity = max(n + k, 2 * n if capacity is None else capacity)
+        buffer = torch.empty((capacity, *t.shape[1:]), dtype=t.dtype, device=t.device)
+        buffer[:n] = t
+        t = buffer[:n]
+    t = _with_rows(t, n + k)
+    t[n:] = rows
+    return t
+
+
+def _free_slots(mask: Tensor) -> Tuple[Tensor, Tensor, int]:
+    """Plans the removal of the rows given by `mask` for `_remove_rows()`.
+
+    The free slots of the removed rows among the first rows are reused by the kept
+    rows from the end, so only as many rows as removed are moved, at the cost of
+    changing the order of the rows.
+
+    Returns:
+        A tuple of the free slots, the rows moved into them, and the number of
+        rows that are kept.
+    """
+    n_keep = len(mask) - int(mask.sum().item())
+    holes = torch.where(mask[:n_keep])[0]
+    movers = torch.where(~mask[n_keep:])[0] + n_keep
+    return holes, movers, n_keep
+
+
+def _remove_rows(t: Tensor, slots: Tuple[Tensor, Tensor, int]) -> Tensor:
+    """Removes rows of `t` in place, as planned by `_free_slots()`. Returns a view
+    of the storage with the kept rows, which keeps the capacity of `t`."""
+    holes, movers, n_keep = slots
+    t[holes] = t[movers]
+    return _with_rows(t, n_keep)
+
+
 @torch.no_grad()
 def duplicate(
     params: Union[Dict[str, torch.nn.Parameter], torch.nn.ParameterDict],
     optimizers: Dict[str, torch.optim.Optimizer],
     state: Dict[str, Tensor],
     mask: Tensor,
+    reuse_storage: bool = False,
 ):
     """Inplace duplicate the Gaussian with the given mask.
 
@@ -102,22 +196,31 @@ def duplicate(
         params: A dictionary of parameters.
         optimizers: A dictionary of optimizers, each corresponding to a parameter.
         mask: A boolean mask to duplicate the Gaussians.
+        reuse_storage: Whether to write the new Gaussians into the slack of the
+          storage of the tensors, see `_append_rows()`. Default: False.
     """
     device = mask.device
     sel = torch.where(mask)[0]
 
+    def append(t: Tensor, rows: Tensor) -> Tensor:
+        if reuse_storage:
+            return _append_rows(t, rows)
+        return torch.cat([t, rows])
+
     def param_fn(name: str, p: Tensor) -> Tensor:
-        return torch.nn.Parameter(torch.cat([p, p[sel]]), requires_grad=p.requires_grad)
+        return torch.nn.Parameter(append(p, p[sel]), requires_grad=p.requires_grad)
 
     def optimizer_fn(key: str, v: Tensor) -> Tensor:
-        return torch.cat([v, torch.zeros((len(sel), *v.shape[1:]), device=device)])
+        return append(
+            v, torch.zeros((len(sel), *v.shape[1:]), device=device, dtype=v.dtype)
+        )
 
     # update the parameters and the state in the optimizers
     _update_param_with_optimizer(param_fn, optimizer_fn, params, optimizers)
     # update the extra running state
     for k, v in state.items():
         if isinstance(v, torch.Tensor):
-            state[k] = torch.cat((v, v[sel]))
+            state[k] = append(v, v[sel])
 
 
 @torch.no_grad()
@@ -127,6 +230,7 @@ def split(
     state: Dict[str, Tensor],
     mask: Tensor,
     revised_opacity: bool = False,
+    reuse_storage: bool = False,
 ):
     """Inplace split the Gaussian with the given mask.
 
@@ -136,6 +240,9 @@ def split(
         mask: A boolean mask to split the Gaussians.
         revised_opacity: Whether to use revised opacity formulation
           from arXiv:2404.06109. Default: False.
+        reuse_storage: Whether to write the first half of the new Gaussians over the
+          split ones, and the second half into the slack of the storage of the
+          tensors, see `_append_rows()`. Default: False.
     """
     device = mask.device
     sel = torch.where(mask)[0]
@@ -162,12 +269,24 @@ def split(
             p_split = torch.logit(new_opacities).repeat(repeats)  # [2N]
         else:
             p_split = p[sel].repeat(repeats)
-        p_new = torch.cat([p[rest], p_split])
+        if reuse_storage:
+            p[sel] = p_split[: len(sel)]
+            p_new = _append_rows(p, p_split[len(sel) :])
+        else:
+            p_new = torch.cat([p[rest], p_split])
         p_new = torch.nn.Parameter(p_new, requires_grad=p.requires_grad)
         return p_new
 
     def optimizer_fn(key: str, v: Tensor) -> Tensor:
-        v_split = torch.zeros((2 * len(sel), *v.shape[1:]), device=device)
+        if reuse_storage:
+            v[sel] = 0
+            v_split = torch.zeros(
+                (len(sel), *v.shape[1:]), device=device, dtype=v.dtype
+            )
+            return _append_rows(v, v_split)
+        v_split = torch.zeros(
+            (2 * len(sel), *v.shape[1:]), device=device, dtype=v.dtype
+        )
         return torch.cat([v[rest], v_split])
 
     # update the parameters and the state in the optimizers
@@ -175,6 +294,9 @@ def split(
     # update the extra running state
     for k, v in state.items():
         if isinstance(v, torch.Tensor):
+            if reuse_storage:
+                state[k] = _append_rows(v, v[sel])
+                continue
             repeats = [2] + [1] * (v.dim() - 1)
             v_new = v[sel].repeat(repeats)
             state[k] = torch.cat((v[rest], v_new))
@@ -186,6 +308,7 @@ def remove(
     optimizers: Dict[str, torch.optim.Optimizer],
     state: Dict[str, Tensor],
     mask: Tensor,
+    reuse_storage: bool = False,
 ):
     """Inplace remove the Gaussian with the given mask.
 
@@ -193,21 +316,177 @@ def remove(
         params: A dictionary of parameters.
         optimizers: A dictionary of optimizers, each corresponding to a parameter.
         mask: A boolean mask to remove the Gaussians.
+        reuse_storage: Whether to fill the free slots of the removed Gaussians with
+          the last Gaussians in place, which keeps the storage of the tensors but
+          changes the order of the Gaussians, see `_free_slots()`. Default: False.
+    """
+    if reuse_storage:
+        slots = _free_slots(mask)
+    else:
+        sel = torch.where(~mask)[0]
+
+    def remove_fn(t: Tensor) -> Tensor:
+        if reuse_storage:
+            return _remove_rows(t, slots)
+        return t[sel]
+
+    def param_fn(name: str, p: Tensor) -> Tensor:
+        return torch.nn.Parameter(remove_fn(p), requires_grad=p.requires_grad)
+
+    def optimizer_fn(key: str, v: Tensor) -> Tensor:
+        return remove_fn(v)
+
+    # update the parameters and the state in the optimizers
+    _update_param_with_optimizer(param_fn, optimizer_fn, params, optimizers)
+    # update the extra running state
+    for k, v in state.items():
+        if isinstance(v, torch.Tensor):
+            state[k] = remove_fn(v)
+
+
+@torch.no_grad()
+def _grow_plan(
+    params: Union[Dict[str, torch.nn.Parameter], torch.nn.ParameterDict],
+    mask_dupli: Tensor,
+    mask_split: Tensor,
+    revised_opacity: bool = False,
+) -> Tuple[Tensor, Tensor, Dict[str, Tensor]]:
+    """Plans `duplicate()` followed by `split()` as an index map into the current
+    Gaussians, without touching any tensor.
+
+    The grown Gaussians are laid out as the sequential ops would leave them: the
+    Gaussians that are not split, then the duplicated ones, then the first and the
+    second halves of the split ones. The noise of the split is drawn the same way
+    as `split()`, so the plan matches the sequential ops for the same seed.
+
+    Args:
+        params: A dictionary of parameters.
+        mask_dupli: A boolean mask [N] of the Gaussians to duplicate.
+        mask_split: A boolean mask [N] of the Gaussians to split. The duplicates
+          are not split.
+        revised_opacity: Whether to use revised opacity formulation
+          from arXiv:2404.06109. Default: False.
+
+    Returns:
+        A tuple of:
+
+        - **index**: [M] The current Gaussian that each grown Gaussian is copied from.
+        - **is_new**: [M] Whether each grown Gaussian is new, i.e. has zero optimizer states.
+        - **children**: The values of the split Gaussians, which are the last rows
+          of the grown Gaussians, for the parameters that are not copied from their
+          parents.
     """
-    sel = torch.where(~mask)[0]
+    device = mask_dupli.device
+    sel_dupli = torch.where(mask_dupli)[0]
+    sel = torch.where(mask_split)[0]
+    rest = torch.where(~mask_split)[0]
+
+    index = torch.cat([rest, sel_dupli, sel, sel])
+    is_new = torch.ones(len(index), dtype=torch.bool, device=device)
+    is_new[: len(rest)] = False
+
+    children = {}
+    if len(sel) > 0:
+        # same as `split()`
+        scales = torch.exp(params["scales"][sel])
+        quats = F.normalize(params["quats"][sel], dim=-1)
+        rotmats = normalized_quat_to_rotmat(quats)  # [N, 3, 3]
+        samples = torch.einsum(
+            "nij,nj,bnj->bni",
+            rotmats,
+            scales,
+            torch.randn(2, len(scales), 3, device=device),
+        )  # [2, N, 3]
+        children["means"] = (params["means"][sel] + samples).reshape(-1, 3)
+        children["scales"] = torch.log(scales / 1.6).repeat(2, 1)
+        if revised_opacity:
+            p = params["opacities"]
+            repeats = [2] + [1] * (p.dim() - 1)
+            new_opacities = 1.0 - torch.sqrt(1.0 - torch.sigmoid(p[sel]))
+            children["opacities"] = torch.logit(new_opacities).repeat(repeats)
+    return index, is_new, children
+
+
+@torch.no_grad()
+def grow_and_prune(
+    params: Union[Dict[str, torch.nn.Parameter], torch.nn.ParameterDict],
+    optimizers: Dict[str, torch.optim.Optimizer],
+    state: Dict[str, Tensor],
+    mask_dupli: Tensor,
+    mask_split: Tensor,
+    prune_fn: Callable[[Dict[str, Tensor], Dict[str, Any]], Tensor],
+    revised_opacity: bool = False,
+) -> Tuple[int, int]:
+    """Inplace duplicate, split and then remove Gaussians in a single pass.
+
+    This gives the same result as `duplicate()` with `mask_dupli`, `split()` with
+    `mask_split` (padded for the duplicates), and `remove()` with the mask that
+    `prune_fn` returns for the grown Gaussians, for the same seed. But instead of
+    copying every tensor once per op, the ops are planned into one index map of the
+    final Gaussians, and each parameter, optimizer state and running state is
+    built by a single gather.
+
+    Args:
+        params: A dictionary of parameters.
+        optimizers: A dictionary of optimizers, each corresponding to a parameter.
+        mask_dupli: A boolean mask to duplicate the Gaussians.
+        mask_split: A boolean mask to split the Gaussians.
+        prune_fn: A function that takes the "opacities" and "scales" of the grown
+          Gaussians and their running state, and returns the boolean mask of the
+          grown Gaussians to remove.
+        revised_opacity: Whether to use revised opacity formulation
+          from arXiv:2404.06109. Default: False.
+
+    Returns:
+        A tuple of the number of grown Gaussians and the number of removed ones.
+    """
+    index, is_new, children = _grow_plan(
+        params, mask_dupli, mask_split, revised_opacity
+    )
+    n_grown = len(index)
+    n_parents = n_grown - 2 * int(mask_split.sum().item())
+
+    def grow(name: str, p: Tensor) -> Tensor:
+        p_new = p[index]
+        if name in children:
+            p_new[n_parents:] = children[name]
+        return p_new
+
+    # decide the pruning on the grown Gaussians, which only needs a few of them
+    is_prune = prune_fn(
+        {name: grow(name, params[name]) for name in ["opacities", "scales"]},
+        {k: v[index] if isinstance(v, Tensor) else v for k, v in state.items()},
+    )
+    keep = torch.where(~is_prune)[0]
+    n_prune = n_grown - len(keep)
+    if n_grown == len(mask_dupli) and n_prune == 0:
+        return n_grown, n_prune
+
+    # the final index map, and where the kept split Gaussians end up
+    final_index = index[keep]
+    final_is_new = is_new[keep]
+    is_child = keep >= n_parents
+    child_rows = torch.where(is_child)[0]
+    child_sel = keep[is_child] - n_parents
 
     def param_fn(name: str, p: Tensor) -> Tensor:
-        return torch.nn.Parameter(p[sel], requires_grad=p.requires_grad)
+        p_new = p[final_index]
+        if name in children:
+            p_new[child_rows] = children[name][child_sel]
+        return torch.nn.Parameter(p_new, requires_grad=p.requires_grad)
 
     def optimizer_fn(key: str, v: Tensor) -> Tensor:
-        return v[sel]
+        v_new = v[final_index]
+        v_new[final_is_new] = 0
+        return v_new
 
     # update the parameters and the state in the optimizers
     _update_param_with_optimizer(param_fn, optimizer_fn, params, optimizers)
     # update the extra running state
     for k, v in state.items():
         if isinstance(v, torch.Tensor):
-            state[k] = v[sel]
+            state[k] = v[final_index]
+    return n_grown, n_prune
 
 
 @torch.no_grad()
@@ -305,9 +584,22 @@ def sample_add(
     n: int,
     binoms: Tensor,
     min_opacity: float = 0.005,
+    reuse_storage: bool = False,
+    capacity: Optional[int] = None,
 ):
+    """Add Gaussians sampled from the current ones by opacity.
+
+    With `reuse_storage`, the new Gaussians are written into the slack of the storage
+    of the tensors, which is reallocated to `capacity` rows (e.g. the maximum
+    number of Gaussians) when too small, see `_append_rows()`.
+    """
     opacities = torch.sigmoid(params["opacities"])
 
+    def append(t: Tensor, rows: Tensor) -> Tensor:
+        if reuse_storage:
+            return _append_rows(t, rows, capacity)
+        return torch.cat([t, rows])
+
     eps = torch.finfo(torch.float32).eps
     probs = opacities.flatten()
     sampled_idxs = _multinomial_sample(probs, n, replacement=True)
@@ -324,12 +616,14 @@ def sample_add(
             p[sampled_idxs] = torch.logit(new_opacities)
         elif name == "scales":
             p[sampled_idxs] = torch.log(new_scales)
-        p_new = torch.cat([p, p[sampled_idxs]])
+        p_new = append(p, p[sampled_idxs])
         return torch.nn.Parameter(p_new, requires_grad=p.requires_grad)
 
     def optimizer_fn(key: str, v: Tensor) -> Tensor:
-        v_new = torch.zeros((len(sampled_idxs), *v.shape[1:]), device=v.device)
-        return torch.cat([v, v_new])
+        v_new = torch.zeros(
+            (len(sampled_idxs), *v.shape[1:]), device=v.device, dtype=v.dtype
+        )
+        return append(v, v_new)
 
     # update the parameters and the state in the optimizers
     _update_param_with_optimizer(param_fn, optimizer_fn, params, optimizers)
@@ -337,33 +631,114 @@ def sample_add(
     for k, v in state.items():
         v_new = torch.zeros((len(sampled_idxs), *v.shape[1:]), device=v.device)
         if isinstance(v, torch.Tensor):
-            state[k] = torch.cat((v, v_new))
+            state[k] = append(v, v_new)
+
+
+def _noise_covars(quats: Tensor, log_scales: Tensor) -> Tensor:
+    """The covariances [N, 3, 3] of `inject_noise_to_position()`."""
+    covars, _ = quat_scale_to_covar_preci(
+        quats,
+        torch.exp(log_scales),
+        compute_covar=True,
+        compute_preci=False,
+        triu=False,
+    )
+    return covars
+
+
+def _cached_noise_covars(
+    cache: Dict[str, Tensor],
+    n: int,
+    sel: Optional[Tensor],
+    quats: Tensor,
+    log_scales: Tensor,
+    tol: float,
+) -> Tensor:
+    """The covariances of `inject_noise_to_position()` for the Gaussians `sel` (all
+    if None), reusing the ones in `cache` whose normalized quaternions and log-scales
+    changed by at most `tol` since they were computed, and updating the others."""
+    if "covars" not in cache or len(cache["covars"]) != n:
+        # rows that were never computed have NaN scales, and are always stale
+        cache["covars"] = quats.new_zeros((n, 3, 3))
+        cache["quats"] = quats.new_zeros((n, 4))
+        cache["scales"] = quats.new_full((n, 3), float("nan"))
+    quats = F.normalize(quats, dim=-1)
+    rows = slice(None) if sel is None else sel
+    covars = cache["covars"][rows]
+    is_stale = ~(
+        ((quats - cache["quats"][rows]).abs().amax(dim=-1) <= tol)
+        & ((log_scales - cache["scales"][rows]).abs().amax(dim=-1) <= tol)
+    )
+    stale = torch.where(is_stale)[0]
+    if len(stale) > 0:
+        covars[stale] = _noise_covars(quats[stale], log_scales[stale])
+        stale_rows = stale if sel is None else sel[stale]
+        cache["covars"][stale_rows] = covars[stale]
+        cache["quats"][stale_rows] = quats[stale]
+        cache["scales"][stale_rows] = log_scales[stale]
+    return covars
 
 
 @torch.no_grad()
 def inject_noise_to_position(
     params: Union[Dict[str, torch.nn.Parameter], torch.nn.ParameterDict],
     optimizers: Dict[str, torch.optim.Optimizer],
-    state: Dict[str, Tensor],
+    state: Dict[str, Any],
     scaler: float,
+    gate_tol: float = 0.0,
+    cache_tol: Optional[float] = None,
 ):
+    """Inplace add noise to the positions of the Gaussians, shaped by their
+    covariances and gated by their opacities.
+
+    Args:
+        params: A dictionary of parameters.
+        optimizers: A dictionary of optimizers, each corresponding to a parameter.
+        state: The running state, which holds the cached covariances under
+          "noise_cache" when `cache_tol` is set.
+        scaler: The scale of the noise.
+        gate_tol: Only the Gaussians whose opacity gate is above this value get
+          noise, and the covariances and the noise are only computed for them. The
+          gate vanishes for all but the nearly transparent Gaussians. Default: 0.0,
+          which adds noise to all the Gaussians.
+        cache_tol: If set, reuse the covariances cached in `state` for the Gaussians
+          whose normalized quaternions and log-scales changed by at most this value
+          since their covariances were computed. The cache must be dropped whenever
+          Gaussians are added, removed or moved. Default: None, no caching.
+    """
     opacities = torch.sigmoid(params["opacities"].flatten())
-    scales = torch.exp(params["scales"])
-    covars, _ = quat_scale_to_covar_preci(
-        params["quats"],
-        scales,
-        compute_covar=True,
-        compute_preci=False,
-        triu=False,
-    )
 
     def op_sigmoid(x, k=100, x0=0.995):
         return 1 / (1 + torch.exp(-k * (x - x0)))
 
+    gates = op_sigmoid(1 - opacities)
+    if gate_tol > 0:
+        sel = torch.where(gates > gate_tol)[0]
+        gates = gates[sel]
+        quats, log_scales = params["quats"][sel], params["scales"][sel]
+    else:
+        sel = None
+        quats, log_scales = params["quats"], params["scales"]
+
+    if cache_tol is None:
+        covars = _noise_covars(quats, log_scales)
+    else:
+        covars = _cached_noise_covars(
+            state.setdefault("noise_cache", {}),
+            len(opacities),
+            sel,
+            quats,
+            log_scales,
+            cache_tol,
+        )
+
     noise = (
-        torch.randn_like(params["means"])
-        * (op_sigmoid(1 - opacities)).unsqueeze(-1)
+        torch.randn((len(gates), 3), dtype=quats.dtype, device=quats.device)
+        * gates.unsqueeze(-1)
         * scaler
     )
     noise = torch.einsum("bij,bj->bi", covars, noise)
-    params["means"].add_(noise)
+    if sel is None:
+        params["means"].add_(noise)
+    else:
+        params["means"].index_add_(0, sel, noise)
@@ -0,0 +1,118 @@
+"""Profile the block-wise quantization ranges of `PngCompression`.
+
+Compares the compressed size and the error of each PNG attribute with one
+quantization range per channel (`block_size=None`) and with one range per block of
+the grid (`block_size=32, 16, 8`), which includes the size of the ranges. The splats
+are the Gaussians of the garden scene, with synthetic attributes that vary smoothly
+in space, and a fraction of outliers with large scales and low opacities, like the
+floaters of trained scenes. They are sorted with `sort_method="morton"`, so this
+runs on CPU.
+
+Usage:
+```bash
+python profiling/block_quantization.py --block_sizes 0 32 16 8 --outliers 0.0 0.001
+```
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from gsplat.compression import PngCompression
+
+PNG_KEYS = ["means", "scales", "quats", "opacities", "sh0"]
+
+
+def load_splats(outliers: float):
+    data = np.load(os.path.join(os.path.dirname(__file__), "../assets/test_garden.npz"))
+    means = torch.from_numpy(data["means3d"]).float()
+    # 8-bit colors, which would be exact on the 8-bit grid of the global range
+    colors = torch.from_numpy(data["colors"]).float() / 255.0
+    colors = colors + 0.01 * torch.randn_like(colors)
+    N = len(means)
+
+    def smooth(n_channels: int):
+        # varies smoothly in space, with some noise, like the attributes of a scene
+        freqs = torch.randn(3, n_channels) / means.std(dim=0)[:, None]
+        x = torch.sin(means @ freqs)
+        return x + 0.1 * torch.randn_like(x)
+
+    splats = {
+        "means": means,
+        "scales": smooth(3) - 4.0,
+        "quats": F.normalize(smooth(4), dim=-1),
+        "opacities": smooth(1)[:, 0],
+        "sh0": ((colors - 0.5) / 0.28209479177387814)[:, None],
+    }
+    idxs = torch.randperm(N)[: int(N * outliers)]
+    splats["scales"][idxs] += 6.0
+    splats["opacities"][idxs] -= 10.0
+    # to match the decompressed splats, which are sorted, to the original ones
+    splats["ids"] = torch.arange(N)
+    return splats
+
+
+def main(block_size, outliers: float):
+    torch.manual_seed(42)
+    splats = load_splats(outliers)
+    compression_method = PngCompression(
+        sort_method="morton", verbose=False, block_size=block_size
+    )
+    with tempfile.TemporaryDirectory() as compress_dir:
+        compression_method.compress(compress_dir, dict(splats))
+        sizes = {k: 0 for k in PNG_KEYS}
+        for name in os.listdir(compress_dir):
+            key = name.split(".")[0]
+            if key not in sizes:  # e.g. "means_l" and "scales_ranges"
+                key = key.rsplit("_", 1)[0]
+            if key in sizes:
+                sizes[key] += os.path.getsize(os.path.join(compress_dir, name))
+        splats_c = compression_method.decompress(compress_dir)
+
+    ids = splats_c["ids"]
+    errors = {
+        k: (splats_c[k] - splats[k][ids]).square().mean().sqrt().item()
+        for k in PNG_KEYS
+    }
+    return sizes, errors
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--block_sizes",
+        nargs="+",
+        type=int,
+        default=[0, 32, 16, 8],
+        help="Sides of the quantization blocks, 0 for one range per channel",
+    )
+    parser.add_argument(
+        "--outliers",
+        nargs="+",
+        type=float,
+        default=[0.0, 0.001],
+        help="Fractions of outlier Gaussians",
+    )
+    args = parser.parse_args()
+
+    collection = []
+    for outliers in args.outliers:
+        for block_size in args.block_sizes:
+            sizes, errors = main(block_size or None, outliers)
+            row = [outliers, block_size or "-"]
+            for k in PNG_KEYS:
+                row += [f"{sizes[k] / 1024:.1f}", f"{errors[k]:.2e}"]
+            row.append(f"{sum(sizes.values()) / 1024:.1f}")
+            collection.append(row)
+    headers = ["Outliers", "Block"]
+    for k in PNG_KEYS:
+        headers += [f"{k} (KB)", f"{k} RMSE"]
+    headers.append("Total (KB)")
+    print(tabulate(collection, headers, tablefmt="rst"))
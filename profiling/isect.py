@@ -0,0 +1,211 @@
+"""Profile the PyTorch implementation of tile intersection.
+
+Reports how `_isect_tiles` scales with the number of Gaussians and the number of
+tiles, and compares against the CUDA `isect_tiles` when a GPU is available. Both
+are timed with the default 64-bit and with the compact 32-bit intersection ids,
+and the PyTorch version also with `return_offsets=True`, which buckets the
+intersections by tile and includes the offsets that `_isect_offset_encode` would
+otherwise compute.
+
+Usage:
+```bash
+python profiling/isect.py --n_gaussians 10000 100000 1000000 --resolutions 360p 1080p
+```
+"""
+
+import math
+import time
+
+import torch
+from typing_extensions import Callable
+
+from gsplat.cuda._torch_impl import _isect_tiles
+
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+
+def timeit(repeats: int, f: Callable, *args, **kwargs) -> float:
+    device = kwargs.pop("device")
+    f(*args, **kwargs)  # warmup
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.time()
+    for _ in range(repeats):
+        results = f(*args, **kwargs)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    end = time.time()
+    return (end - start) / repeats, results
+
+
+def main(
+    n_gaussians: int,
+    width: int,
+    height: int,
+    tile_size: int = 16,
+    max_radius: int = 32,
+    repeats: int = 3,
+    device: torch.device = torch.device("cpu"),
+):
+    torch.manual_seed(42)
+    means2d = torch.rand(n_gaussians, 2, device=device) * torch.tensor(
+        [width, height], device=device
+    )
+    radii = torch.randint(
+        0, max_radius, (n_gaussians, 2), device=device, dtype=torch.int32
+    )
+    depths = torch.rand(n_gaussians, device=device)
+    tile_width = math.ceil(width / tile_size)
+    tile_height = math.ceil(height / tile_size)
+
+    stats = {"n_tiles": tile_width * tile_height}
+    stats["time_torch"], (_, isect_ids, flatten_ids) = timeit(
+        repeats,
+        _isect_tiles,
+        means2d,
+        radii,
+        depths,
+        tile_size,
+        tile_width,
+        tile_height,
+        device=device,
+    )
+    stats["n_isects"] = len(isect_ids)
+    stats["time_torch_32"], (_, _, _flatten_ids) = timeit(
+        repeats,
+        _isect_tiles,
+        means2d,
+        radii,
+        depths,
+        tile_size,
+        tile_width,
+        tile_height,
+        key_bits=32,
+        device=device,
+    )
+    assert torch.equal(flatten_ids, _flatten_ids)
+    stats["time_torch_bucketed"], (_, _, _flatten_ids, _) = timeit(
+        repeats,
+        _isect_tiles,
+        means2d,
+        radii,
+        depths,
+        tile_size,
+        tile_width,
+        tile_height,
+        return_offsets=True,
+        device=device,
+    )
+    assert torch.equal(flatten_ids, _flatten_ids)
+
+    if device.type == "cuda":
+        from gsplat.cuda._wrapper import isect_tiles
+
+        stats["time_cuda"], (_, _isect_ids, _flatten_ids) = timeit(
+            repeats,
+            isect_tiles,
+            means2d,
+            radii,
+            depths,
+            tile_size,
+            tile_width,
+            tile_height,
+            device=device,
+        )
+        assert torch.equal(isect_ids, _isect_ids)
+        assert torch.equal(flatten_ids, _flatten_ids)
+        stats["time_cuda_32"], (_, _, _flatten_ids) = timeit(
+            repeats,
+            isect_tiles,
+            means2d,
+            radii,
+            depths,
+            tile_size,
+            tile_width,
+            tile_height,
+            key_bits=32,
+            device=device,
+        )
+        assert torch.equal(flatten_ids, _flatten_ids)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n_gaussians",
+        nargs="+",
+        type=int,
+        default=[10_000, 100_000, 1_000_000],
+        help="Number of Gaussians for profiling",
+    )
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        type=str,
+        default=["360p", "1080p"],
+        help="Resolutions for profiling, which decide the number of tiles",
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="cuda" if torch.cuda.is_available() else "cpu",
+        help="Device for profiling",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Number of repeats for profiling",
+    )
+    args = parser.parse_args()
+
+    collection = []
+    for reso in args.resolutions:
+        width, height = RESOLUTIONS[reso]
+        for n_gaussians in args.n_gaussians:
+            stats = main(
+                n_gaussians,
+                width,
+                height,
+                repeats=args.repeats,
+                device=torch.device(args.device),
+            )
+            collection.append(
+                [
+                    reso,
+                    stats["n_tiles"],
+                    n_gaussians,
+                    stats["n_isects"],
+                    f"{stats['time_torch'] * 1000:.1f}",
+                    f"{stats['time_torch_32'] * 1000:.1f}",
+                    f"{stats['time_torch_bucketed'] * 1000:.1f}",
+                    f"{stats['time_cuda'] * 1000:.1f}" if "time_cuda" in stats else "-",
+                    (
+                        f"{stats['time_cuda_32'] * 1000:.1f}"
+                        if "time_cuda_32" in stats
+                        else "-"
+                    ),
+                ]
+            )
+    headers = [
+        "Resolution",
+        "#Tiles",
+        "#Gaussians",
+        "#Isects",
+        "Torch (ms)",
+        "Torch 32-bit (ms)",
+        "Torch bucketed (ms)",
+        "CUDA (ms)",
+        "CUDA 32-bit (ms)",
+    ]
+    print(tabulate(collection, headers, tablefmt="rst"))
@@ -0,0 +1,119 @@
+"""Profile the K-means clustering of the shN codebook of `PngCompression`.
+
+Compares the built-in mini-batch K-means (`gsplat.compression.kmeans.kmeans`) on
+CPU, and on GPU when available, against `torchpq`, which runs on CUDA only and is
+skipped when not installed. Reports the time and the quantization error, i.e. the
+mean squared error between the coefficients and their centroids, on synthetic shN
+coefficients with heavy tails like trained ones.
+
+Usage:
+```bash
+python profiling/kmeans.py --n_gaussians 100000 1000000 --n_clusters 4096 65536
+```
+"""
+
+import time
+
+import torch
+from typing_extensions import Callable
+
+from gsplat.compression.kmeans import kmeans
+
+
+def timeit(repeats: int, f: Callable, *args, **kwargs) -> float:
+    device = kwargs.pop("device")
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.time()
+    for _ in range(repeats):
+        results = f(*args, **kwargs)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    end = time.time()
+    return (end - start) / repeats, results
+
+
+def torch_kmeans(x, n_clusters, n_iters):
+    return kmeans(x, n_clusters, n_iters=n_iters)
+
+
+def torchpq_kmeans(x, n_clusters, n_iters):
+    from torchpq.clustering import KMeans
+
+    # same as `_compress_kmeans()`
+    kmeans_pq = KMeans(n_clusters=n_clusters, distance="manhattan", verbose=False)
+    labels = kmeans_pq.fit(x.permute(1, 0).contiguous())
+    return kmeans_pq.centroids.permute(1, 0), labels
+
+
+def main(n_gaussians: int, n_clusters: int, n_iters: int, repeats: int = 1):
+    torch.manual_seed(42)
+    # shN of SH degree 3, with a scale per Gaussian for heavy tails
+    x = torch.randn(n_gaussians, 45) * torch.rand(n_gaussians, 1) ** 2
+
+    methods = [("torch (cpu)", torch_kmeans, torch.device("cpu"))]
+    if torch.cuda.is_available():
+        cuda = torch.device("cuda")
+        methods.append(("torch (cuda)", torch_kmeans, cuda))
+        try:
+            import torchpq  # noqa: F401
+
+            methods.append(("torchpq (cuda)", torchpq_kmeans, cuda))
+        except ImportError:
+            print("torchpq is not installed, skipping it.")
+
+    stats = {}
+    for name, fn, device in methods:
+        x_device = x.to(device)
+        elapsed, (centroids, labels) = timeit(
+            repeats, fn, x_device, n_clusters, n_iters, device=device
+        )
+        error = (centroids[labels.long()] - x_device).square().mean().item()
+        stats[name] = (elapsed, error)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n_gaussians",
+        nargs="+",
+        type=int,
+        default=[100_000, 1_000_000],
+        help="Number of Gaussians to cluster",
+    )
+    parser.add_argument(
+        "--n_clusters",
+        nargs="+",
+        type=int,
+        default=[4096, 65536],
+        help="Number of clusters",
+    )
+    parser.add_argument(
+        "--n_iters",
+        type=int,
+        default=20,
+        help="Number of mini-batch iterations of the built-in K-means",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=1,
+        help="Number of repeats for profiling",
+    )
+    args = parser.parse_args()
+
+    collection = []
+    for n_gaussians in args.n_gaussians:
+        for n_clusters in args.n_clusters:
+            stats = main(n_gaussians, n_clusters, args.n_iters, args.repeats)
+            for name, (elapsed, error) in stats.items():
+                collection.append(
+                    [n_gaussians, n_clusters, name, f"{elapsed:.2f}", f"{error:.5f}"]
+                )
+    headers = ["#Gaussians", "#Clusters", "K-means", "Time (s)", "Quantization MSE"]
+    print(tabulate(collection, headers, tablefmt="rst"))
@@ -0,0 +1,116 @@
+"""Profile the multinomial sampling of `relocate()` and `sample_add()`.
+
+Compares `torch.multinomial`, which is limited to 2^24 elements, the former
+`numpy.random.choice` fallback, which copies the weights to the host, and the
+on-device inverse CDF sampler `_cdf_sample()` that `_multinomial_sample()` now uses
+beyond 2^24 elements.
+
+Usage:
+```bash
+python profiling/multinomial.py --n_elements 1000000 16000000 100000000
+```
+"""
+
+import time
+
+import numpy as np
+import torch
+from typing_extensions import Callable
+
+from gsplat.strategy.ops import _cdf_sample
+
+
+def timeit(repeats: int, f: Callable, *args, **kwargs) -> float:
+    device = kwargs.pop("device")
+    f(*args, **kwargs)  # warmup
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.time()
+    for _ in range(repeats):
+        results = f(*args, **kwargs)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    end = time.time()
+    return (end - start) / repeats, results
+
+
+def numpy_choice(weights, n):
+    weights = weights / weights.sum()
+    weights_np = weights.detach().cpu().numpy()
+    sampled_idxs_np = np.random.choice(len(weights_np), size=n, p=weights_np)
+    return torch.from_numpy(sampled_idxs_np).to(weights.device)
+
+
+def main(
+    n_elements: int,
+    n_samples: int,
+    repeats: int = 3,
+    device: torch.device = torch.device("cpu"),
+):
+    torch.manual_seed(42)
+    np.random.seed(42)
+    weights = torch.rand(n_elements, device=device)
+
+    methods = [("numpy", numpy_choice), ("cdf", _cdf_sample)]
+    if n_elements <= 2**24:
+        methods.insert(0, ("torch", torch.multinomial))
+
+    stats = {}
+    for name, fn in methods:
+        kwargs = {"replacement": True} if name == "torch" else {}
+        stats[name], idxs = timeit(
+            repeats, fn, weights, n_samples, **kwargs, device=device
+        )
+        # the mean weight of the samples, E[w^2] / E[w] = 2/3 for uniform weights
+        stats[f"{name}_mean"] = weights[idxs].mean().item()
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n_elements",
+        nargs="+",
+        type=int,
+        default=[1_000_000, 16_000_000, 100_000_000],
+        help="Number of weights to sample from",
+    )
+    parser.add_argument(
+        "--n_samples",
+        type=int,
+        default=100_000,
+        help="Number of samples to draw",
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="cuda" if torch.cuda.is_available() else "cpu",
+        help="Device for profiling",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Number of repeats for profiling",
+    )
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    collection = []
+    for n_elements in args.n_elements:
+        stats = main(n_elements, args.n_samples, args.repeats, device=device)
+        row = [n_elements]
+        for name in ["torch", "numpy", "cdf"]:
+            if name in stats:
+                row += [f"{stats[name] * 1000:.1f}", f"{stats[f'{name}_mean']:.4f}"]
+            else:
+                row += ["-", "-"]
+        collection.append(row)
+    headers = ["#Elements"]
+    for name in ["torch", "numpy", "cdf"]:
+        headers += [f"{name} (ms)", f"{name} mean weight"]
+    print(tabulate(collection, headers, tablefmt="rst"))
@@ -0,0 +1,227 @@
+"""Profile the optimizers with reduced precision moments.
+
+Reports the memory of the splat attributes and of the Adam moments for a given
+number of Gaussians, with the moments stored in float32 or bfloat16, and checks
+the convergence of fitting the test scene (`assets/test_garden.npz`) with each
+precision. The scene is rendered into target images, its attributes are perturbed,
+and they are optimized back with `GaussianAdam` to the targets.
+
+Usage:
+```bash
+python profiling/optimizer_precision.py --n_gaussians 1000000 10000000 --steps 200
+```
+"""
+
+import math
+import time
+
+import torch
+import torch.nn.functional as F
+
+from gsplat._helper import load_test_data
+from gsplat.optimizers import GaussianAdam
+from gsplat.rendering import rasterization
+
+# (name, moment dtype, stochastic rounding)
+PRECISIONS = [
+    ("float32", None, False),
+    ("bfloat16", torch.bfloat16, False),
+    ("bfloat16 + SR", torch.bfloat16, True),
+]
+
+
+def memory_report(n_gaussians: int, sh_degree: int = 3, n_probe: int = 1000):
+    """Bytes of the attributes and of the moments, measured on `n_probe` Gaussians
+    and scaled to `n_gaussians`."""
+    K = (sh_degree + 1) ** 2
+    shapes = {
+        "means": (3,),
+        "scales": (3,),
+        "quats": (4,),
+        "opacities": (),
+        "sh0": (1, 3),
+        "shN": (K - 1, 3),
+    }
+    rows = []
+    for name, moment_dtype, stochastic_rounding in PRECISIONS[:2]:
+        params = [torch.nn.Parameter(torch.zeros(n_probe, *s)) for s in shapes.values()]
+        optimizer = GaussianAdam(
+            [{"params": [p]} for p in params],
+            moment_dtype=moment_dtype,
+            stochastic_rounding=stochastic_rounding,
+        )
+        for p in params:
+            p.grad = torch.zeros_like(p)
+        optimizer.step()
+        param_bytes = sum(p.nbytes for p in params)
+        moment_bytes = sum(
+            v.nbytes
+            for state in optimizer.state.values()
+            for k, v in state.items()
+            if k != "step"
+        )
+        scale = n_gaussians / n_probe / 2**30
+        rows.append(
+            [
+                n_gaussians,
+                name,
+                f"{param_bytes * scale:.2f}",
+                f"{moment_bytes * scale:.2f}",
+                f"{(param_bytes + moment_bytes) * scale:.2f}",
+            ]
+        )
+    return rows
+
+
+def fit(
+    moment_dtype,
+    stochastic_rounding: bool,
+    steps: int,
+    n_gaussians: int,
+    scale: float,
+    visible_adam: bool,
+):
+    torch.manual_seed(42)
+    (
+        means,
+        quats,
+        scales,
+        opacities,
+        colors,
+        viewmats,
+        Ks,
+        width,
+        height,
+    ) = load_test_data(device="cpu")
+    sel = torch.randperm(len(means))[:n_gaussians]
+    means, quats, scales = means[sel], quats[sel], scales[sel]
+    opacities, colors = opacities[sel], colors[sel]
+    Ks = Ks.clone()
+    Ks[:, :2] *= scale
+    width, height = int(width * scale), int(height * scale)
+
+    with torch.no_grad():
+        targets, _, _ = rasterization(
+            means, quats, scales, opacities, colors, viewmats, Ks, width, height
+        )
+
+    # perturb the attributes, and optimize them back to the targets
+    splats = torch.nn.ParameterDict(
+        {
+            "means": means + torch.randn_like(means) * 0.01,
+            "scales": torch.log(scales * 1.5),
+            "quats": quats,
+            "opacities": torch.logit(torch.full_like(opacities, 0.5)),
+            "colors": torch.logit(torch.full_like(colors, 0.5)),
+        }
+    )
+    lrs = {"means": 1.6e-4, "scales": 5e-3, "quats": 1e-3, "opacities": 5e-2}
+    optimizer = GaussianAdam(
+        [{"params": [v], "lr": lrs.get(k, 2.5e-3)} for k, v in splats.items()],
+        eps=1e-15,
+        moment_dtype=moment_dtype,
+        stochastic_rounding=stochastic_rounding,
+    )
+
+    start = time.time()
+    for step in range(steps):
+        cid = step % len(viewmats)
+        renders, _, info = rasterization(
+            splats["means"],
+            splats["quats"],
+            torch.exp(splats["scales"]),
+            torch.sigmoid(splats["opacities"]),
+            torch.sigmoid(splats["colors"]),
+            viewmats[cid : cid + 1],
+            Ks[cid : cid + 1],
+            width,
+            height,
+        )
+        loss = F.l1_loss(renders, targets[cid : cid + 1])
+        loss.backward()
+        if visible_adam:
+            optimizer.step((info["radii"] > 0).all(-1).any(0))
+        else:
+            optimizer.step()
+        optimizer.zero_grad(set_to_none=True)
+    elapsed = (time.time() - start) / steps
+
+    with torch.no_grad():
+        renders, _, _ = rasterization(
+            splats["means"],
+            splats["quats"],
+            torch.exp(splats["scales"]),
+            torch.sigmoid(splats["opacities"]),
+            torch.sigmoid(splats["colors"]),
+            viewmats,
+            Ks,
+            width,
+            height,
+        )
+        mse = F.mse_loss(renders, targets).item()
+    return {"psnr": -10 * math.log10(mse), "time": elapsed}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n_gaussians",
+        nargs="+",
+        type=int,
+        default=[1_000_000, 10_000_000],
+        help="Number of Gaussians for the memory report",
+    )
+    parser.add_argument(
+        "--sh_degree",
+        type=int,
+        default=3,
+        help="SH degree for the memory report",
+    )
+    parser.add_argument(
+        "--steps",
+        type=int,
+        default=200,
+        help="Number of optimization steps of the convergence check",
+    )
+    parser.add_argument(
+        "--n_fit",
+        type=int,
+        default=20_000,
+        help="Number of Gaussians of the test scene in the convergence check",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=0.25,
+        help="Scale of the test image resolution in the convergence check",
+    )
+    parser.add_argument(
+        "--visible_adam",
+        action="store_true",
+        help="Only update the visible Gaussians in the convergence check",
+    )
+    args = parser.parse_args()
+
+    collection = []
+    for n_gaussians in args.n_gaussians:
+        collection += memory_report(n_gaussians, args.sh_degree)
+    headers = ["#Gaussians", "Moments", "Params (GB)", "Moments (GB)", "Total (GB)"]
+    print(tabulate(collection, headers, tablefmt="rst"))
+
+    collection = []
+    for name, moment_dtype, stochastic_rounding in PRECISIONS:
+        stats = fit(
+            moment_dtype,
+            stochastic_rounding,
+            args.steps,
+            args.n_fit,
+            args.scale,
+            args.visible_adam,
+        )
+        collection.append([name, f"{stats['psnr']:.2f}", f"{stats['time'] * 1000:.1f}"])
+    headers = ["Moments", f"PSNR after {args.steps} steps", "Time per step (ms)"]
+    print(tabulate(collection, headers, tablefmt="rst"))
@@ -0,0 +1,187 @@
+"""Profile the multi-threaded PyTorch rasterizer on CPU.
+
+Reports the per-tile cost histogram (number of intersections per tile) of the
+test scene, and how `_rasterize_to_pixels` scales with the number of threads.
+
+Usage:
+```bash
+python profiling/rasterize_torch.py --num_threads 1 2 4 8 16 32 64
+```
+"""
+
+import math
+import time
+
+import torch
+from typing_extensions import Callable
+
+from gsplat._helper import load_test_data
+from gsplat.cuda._torch_impl import (
+    _fully_fused_projection,
+    _isect_offset_encode,
+    _isect_tiles,
+    _quat_scale_to_covar_preci,
+    _rasterize_to_pixels,
+    _tile_costs,
+)
+
+
+def timeit(repeats: int, f: Callable, *args, **kwargs) -> float:
+    f(*args, **kwargs)  # warmup
+    start = time.time()
+    for _ in range(repeats):
+        results = f(*args, **kwargs)
+    end = time.time()
+    return (end - start) / repeats, results
+
+
+def cost_histogram(tile_costs: torch.Tensor):
+    """Histogram of the tile costs, in power-of-two bins."""
+    bins = torch.where(
+        tile_costs > 0, torch.floor(torch.log2(tile_costs.clamp(min=1))) + 1, 0
+    ).long()
+    counts = torch.bincount(bins.flatten())
+    rows = []
+    for i, count in enumerate(counts.tolist()):
+        if i == 0:
+            rows.append(["0", count])
+        else:
+            rows.append([f"[{2 ** (i - 1)}, {2 ** i})", count])
+    return rows
+
+
+def main(
+    num_threads: int,
+    scale: float = 1.0,
+    tile_size: int = 16,
+    batch_per_iter: int = 16,
+    repeats: int = 1,
+    backward: bool = False,
+):
+    (
+        means,
+        quats,
+        scales,
+        opacities,
+        colors,
+        viewmats,
+        Ks,
+        width,
+        height,
+    ) = load_test_data(device="cpu")
+    viewmats, Ks = viewmats[:1], Ks[:1].clone()
+    Ks[:, :2] *= scale
+    width, height = int(width * scale), int(height * scale)
+
+    with torch.no_grad():
+        covars, _ = _quat_scale_to_covar_preci(quats, scales, compute_preci=False)
+        radii, means2d, depths, conics, _ = _fully_fused_projection(
+            means, covars, viewmats, Ks, width, height, opacities=opacities
+        )
+        tile_width = math.ceil(width / tile_size)
+        tile_height = math.ceil(height / tile_size)
+        _, isect_ids, flatten_ids = _isect_tiles(
+            means2d, radii, depths, tile_size, tile_width, tile_height
+        )
+        isect_offsets = _isect_offset_encode(isect_ids, 1, tile_width, tile_height)
+        isect_offsets = isect_offsets.reshape(1, tile_height, tile_width)
+    colors = colors[None].requires_grad_(backward)
+    opacities = opacities[None]
+
+    def rasterize():
+        render_colors, _ = _rasterize_to_pixels(
+            means2d,
+            conics,
+            colors,
+            opacities,
+            width,
+            height,
+            tile_size,
+            isect_offsets,
+            flatten_ids,
+            batch_per_iter=batch_per_iter,
+            num_threads=num_threads,
+        )
+        if backward:
+            render_colors.sum().backward()
+
+    with torch.set_grad_enabled(backward):
+        elapsed, _ = timeit(repeats, rasterize)
+    return {
+        "width": width,
+        "height": height,
+        "n_isects": len(isect_ids),
+        "tile_costs": _tile_costs(isect_offsets, len(isect_ids)),
+        "time": elapsed,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--num_threads",
+        nargs="+",
+        type=int,
+        default=[1, 2, 4, 8],
+        help="Number of rasterization threads for profiling",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Scale of the test image resolution",
+    )
+    parser.add_argument(
+        "--batch_per_iter",
+        type=int,
+        default=16,
+        help="Number of tiles rasterized together by one thread",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=1,
+        help="Number of repeats for profiling",
+    )
+    parser.add_argument(
+        "--backward",
+        action="store_true",
+        help="Also profile the backward pass",
+    )
+    args = parser.parse_args()
+
+    collection = []
+    for num_threads in args.num_threads:
+        stats = main(
+            num_threads,
+            scale=args.scale,
+            batch_per_iter=args.batch_per_iter,
+            repeats=args.repeats,
+            backward=args.backward,
+        )
+        if not collection:
+            print(
+                f"Resolution {stats['width']}x{stats['height']}, "
+                f"#Isects {stats['n_isects']}"
+            )
+            print(
+                tabulate(
+                    cost_histogram(stats["tile_costs"]),
+                    ["#Isects per tile", "#Tiles"],
+                    tablefmt="rst",
+                )
+            )
+            base_time = stats["time"]
+        collection.append(
+            [
+                num_threads,
+                f"{stats['time'] * 1000:.1f}",
+                f"{base_time / stats['time']:.2f}x",
+            ]
+        )
+    headers = ["#Threads", "Time (ms)", "Speedup"]
+    print(tabulate(collection, headers, tablefmt="rst"))
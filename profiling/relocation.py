@@ -0,0 +1,127 @@
+"""Profile `compute_relocation()` of the MCMC strategy.
+
+Compares the vectorized PyTorch implementation of Equation 9 against the CUDA kernel
+on the same inputs, when a GPU is available, and reports the largest difference
+between the two.
+
+Usage:
+```bash
+python profiling/relocation.py --n_gaussians 10000 100000 1000000
+```
+"""
+
+import math
+import time
+
+import torch
+from typing_extensions import Callable
+
+from gsplat.cuda._torch_impl import _compute_relocation
+from gsplat.cuda._wrapper import _make_lazy_cuda_func
+
+
+def timeit(repeats: int, f: Callable, *args, **kwargs) -> float:
+    device = kwargs.pop("device")
+    f(*args, **kwargs)  # warmup
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.time()
+    for _ in range(repeats):
+        results = f(*args, **kwargs)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    end = time.time()
+    return (end - start) / repeats, results
+
+
+def main(
+    n_gaussians: int,
+    max_ratio: int,
+    n_max: int = 51,
+    repeats: int = 10,
+    device: torch.device = torch.device("cpu"),
+):
+    torch.manual_seed(42)
+    binoms = torch.zeros((n_max, n_max))
+    for n in range(n_max):
+        for k in range(n + 1):
+            binoms[n, k] = math.comb(n, k)
+    binoms = binoms.to(device)
+    opacities = torch.rand(n_gaussians, device=device)
+    scales = torch.rand(n_gaussians, 3, device=device)
+    ratios = torch.randint(1, max_ratio + 1, (n_gaussians,), device=device)
+    ratios = ratios.clamp(max=n_max).int()
+
+    stats = {}
+    stats["torch"], (new_opacities, new_scales) = timeit(
+        repeats, _compute_relocation, opacities, scales, ratios, binoms, device=device
+    )
+    if device.type == "cuda":
+        stats["cuda"], (_new_opacities, _new_scales) = timeit(
+            repeats,
+            _make_lazy_cuda_func("relocation"),
+            opacities,
+            scales,
+            ratios,
+            binoms,
+            n_max,
+            device=device,
+        )
+        stats["opacity_err"] = (new_opacities - _new_opacities).abs().max().item()
+        stats["scale_err"] = (
+            ((new_scales - _new_scales).abs() / _new_scales.abs()).max().item()
+        )
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n_gaussians",
+        nargs="+",
+        type=int,
+        default=[10_000, 100_000, 1_000_000],
+        help="Number of relocated Gaussians for profiling",
+    )
+    parser.add_argument(
+        "--max_ratios",
+        nargs="+",
+        type=int,
+        default=[4, 51],
+        help="Largest number of copies of a Gaussian",
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="cuda" if torch.cuda.is_available() else "cpu",
+        help="Device for profiling",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=10,
+        help="Number of repeats for profiling",
+    )
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    collection = []
+    for n_gaussians in args.n_gaussians:
+        for max_ratio in args.max_ratios:
+            stats = main(n_gaussians, max_ratio, repeats=args.repeats, device=device)
+            row = [n_gaussians, max_ratio, f"{stats['torch'] * 1000:.2f}"]
+            if device.type == "cuda":
+                row += [
+                    f"{stats['cuda'] * 1000:.2f}",
+                    f"{stats['opacity_err']:.1e}",
+                    f"{stats['scale_err']:.1e}",
+                ]
+            collection.append(row)
+    headers = ["#Gaussians", "Max ratio", "Torch (ms)"]
+    if device.type == "cuda":
+        headers += ["CUDA (ms)", "Max opacity diff", "Max scale rel. diff"]
+    print(tabulate(collection, headers, tablefmt="rst"))
@@ -0,0 +1,167 @@
+"""Profile the spherical harmonics evaluation of `rasterization()`.
+
+Compares evaluating the SH coefficients broadcast to every (camera, Gaussian) pair
+with all the bands ("dense"), against evaluating only the visible pairs with only
+the active bands of `sh_degree` ("compact"), which is what `rasterization()` does.
+Runs with the PyTorch backend on CPU and also with the CUDA backend when a GPU is
+available.
+
+Usage:
+```bash
+python profiling/sh.py --n_gaussians 100000 1000000 --visible 0.1 0.5
+```
+"""
+
+import time
+
+import torch
+from typing_extensions import Callable
+
+from gsplat.cuda._wrapper import spherical_harmonics
+
+
+def timeit(repeats: int, f: Callable, *args, **kwargs) -> float:
+    device = kwargs.pop("device")
+    f(*args, **kwargs)  # warmup
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.time()
+    for _ in range(repeats):
+        results = f(*args, **kwargs)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    end = time.time()
+    return (end - start) / repeats, results
+
+
+def dense(sh_degree, dirs, coeffs, masks, backend, backward):
+    C, N = masks.shape
+    shs = torch.broadcast_to(coeffs[None], (C,) + coeffs.shape)  # [C, N, K, 3]
+    colors = spherical_harmonics(sh_degree, dirs, shs, masks=masks, backend=backend)
+    if backward:
+        colors.sum().backward()
+    return colors
+
+
+def compact(sh_degree, dirs, coeffs, masks, backend, backward):
+    C, N = masks.shape
+    camera_ids, gaussian_ids = torch.nonzero(masks, as_tuple=True)
+    shs = coeffs[gaussian_ids, : (sh_degree + 1) ** 2]  # [nnz, K, 3]
+    vis_colors = spherical_harmonics(
+        sh_degree, dirs[camera_ids, gaussian_ids], shs, backend=backend
+    )
+    colors = vis_colors.new_zeros((C, N, 3)).index_put(
+        (camera_ids, gaussian_ids), vis_colors
+    )
+    if backward:
+        colors.sum().backward()
+    return colors
+
+
+def main(
+    n_gaussians: int,
+    visible: float,
+    sh_degree: int,
+    n_cameras: int = 4,
+    backward: bool = False,
+    repeats: int = 3,
+    device: torch.device = torch.device("cpu"),
+):
+    torch.manual_seed(42)
+    coeffs = torch.randn(n_gaussians, 16, 3, device=device, requires_grad=backward)
+    dirs = torch.randn(n_cameras, n_gaussians, 3, device=device)
+    masks = torch.rand(n_cameras, n_gaussians, device=device) < visible
+
+    stats = {}
+    backends = ["torch"] + (["cuda"] if device.type == "cuda" else [])
+    for backend in backends:
+        for name, fn in [("dense", dense), ("compact", compact)]:
+            stats[f"{backend}_{name}"], colors = timeit(
+                repeats,
+                fn,
+                sh_degree,
+                dirs,
+                coeffs,
+                masks,
+                backend,
+                backward,
+                device=device,
+            )
+            stats[f"{backend}_{name}_colors"] = colors.detach()
+        torch.testing.assert_close(
+            stats[f"{backend}_dense_colors"], stats[f"{backend}_compact_colors"]
+        )
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n_gaussians",
+        nargs="+",
+        type=int,
+        default=[100_000, 1_000_000],
+        help="Number of Gaussians for profiling",
+    )
+    parser.add_argument(
+        "--visible",
+        nargs="+",
+        type=float,
+        default=[0.1, 0.5],
+        help="Fraction of the (camera, Gaussian) pairs that are visible",
+    )
+    parser.add_argument(
+        "--sh_degrees",
+        nargs="+",
+        type=int,
+        default=[0, 1, 3],
+        help="SH degrees in use, out of 16 bases of coefficients",
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="cuda" if torch.cuda.is_available() else "cpu",
+        help="Device for profiling",
+    )
+    parser.add_argument(
+        "--backward",
+        action="store_true",
+        help="Also profile the backward pass",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Number of repeats for profiling",
+    )
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    backends = ["torch"] + (["cuda"] if device.type == "cuda" else [])
+    collection = []
+    for n_gaussians in args.n_gaussians:
+        for visible in args.visible:
+            for sh_degree in args.sh_degrees:
+                stats = main(
+                    n_gaussians,
+                    visible,
+                    sh_degree,
+                    backward=args.backward,
+                    repeats=args.repeats,
+                    device=device,
+                )
+                row = [n_gaussians, visible, sh_degree]
+                for backend in backends:
+                    row += [
+                        f"{stats[f'{backend}_dense'] * 1000:.1f}",
+                        f"{stats[f'{backend}_compact'] * 1000:.1f}",
+                    ]
+                collection.append(row)
+    headers = ["#Gaussians", "Visible", "SH degree"]
+    for backend in backends:
+        headers += [f"{backend} dense (ms)", f"{backend} compact (ms)"]
+    print(tabulate(collection, headers, tablefmt="rst"))
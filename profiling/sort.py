@@ -0,0 +1,161 @@
+"""Profile the sorters of `PngCompression` on the Gaussians of the garden scene.
+
+Compares the compressed sizes of the PNG attributes, and the sort time, for the
+splats in random order, sorted along a Morton curve (`sort_method="morton"`), which
+runs on CPU, refined by neighbor swaps (`sort_method="morton_swap"`), and sorted by
+PLAS (`sort_method="plas"`), which runs on CUDA only and is skipped when not
+installed. The means and colors come from `assets/test_garden.npz`, the other
+attributes are synthetic, varying smoothly in space with some noise.
+
+Usage:
+```bash
+python profiling/sort.py --n_gaussians 16384 65536 138766
+```
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from typing_extensions import Callable
+
+from gsplat.compression import PngCompression
+from gsplat.compression.png_compression import _grid_shape
+
+SORTED_KEYS = ["means", "scales", "quats", "opacities", "sh0"]
+
+
+def timeit(repeats: int, f: Callable, *args, **kwargs) -> float:
+    device = kwargs.pop("device")
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.time()
+    for _ in range(repeats):
+        results = f(*args, **kwargs)
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    end = time.time()
+    return (end - start) / repeats, results
+
+
+def load_splats(n_gaussians: int, device: torch.device):
+    data = np.load(os.path.join(os.path.dirname(__file__), "../assets/test_garden.npz"))
+    means = torch.from_numpy(data["means3d"]).float()
+    colors = torch.from_numpy(data["colors"]).float()
+    idxs = torch.randperm(len(means))[:n_gaussians]
+    means, colors = means[idxs], colors[idxs]
+
+    def smooth(n_channels: int):
+        # varies smoothly in space, with some noise, like the attributes of a scene
+        freqs = torch.randn(3, n_channels) / means.std(dim=0)[:, None]
+        x = torch.sin(means @ freqs)
+        return x + 0.1 * torch.randn_like(x)
+
+    splats = {
+        "means": means,
+        "scales": smooth(3) - 4.0,
+        "quats": F.normalize(smooth(4), dim=-1),
+        "opacities": smooth(1)[:, 0],
+        "sh0": ((colors - 0.5) / 0.28209479177387814)[:, None],
+    }
+    return {k: v.to(device) for k, v in splats.items()}
+
+
+def compressed_sizes(compression_method: PngCompression, splats) -> dict:
+    with tempfile.TemporaryDirectory() as compress_dir:
+        compression_method.compress(compress_dir, dict(splats))
+        sizes = {k: 0 for k in splats}
+        for name in os.listdir(compress_dir):
+            key = name.split(".")[0]
+            if key not in sizes:  # e.g. "means_l" and "means_u"
+                key = key.rsplit("_", 1)[0]
+            if key in sizes:
+                sizes[key] += os.path.getsize(os.path.join(compress_dir, name))
+    return sizes
+
+
+def main(n_gaussians: int, repeats: int = 1, device=torch.device("cpu")):
+    torch.manual_seed(42)
+    splats = load_splats(n_gaussians, device)
+    grid_shape = _grid_shape(len(splats["means"]))
+
+    methods = ["none", "morton", "morton_swap"]
+    if device.type == "cuda":
+        try:
+            import plas  # noqa: F401
+
+            methods.append("plas")
+        except ImportError:
+            pass
+
+    stats = {}
+    for method in methods:
+        compression_method = PngCompression(
+            use_sort=method != "none",
+            sort_method=method if method != "none" else "plas",
+            verbose=False,
+        )
+        if method == "none":
+            sort_time = 0.0
+        else:
+            # the grid must be full to sort, as in `PngCompression.compress()`
+            n = grid_shape[0] * grid_shape[1]
+            full = {
+                k: v[torch.arange(n, device=device) % len(v)] for k, v in splats.items()
+            }
+            sort_fn = compression_method._get_sort_fn()
+            sort_time, _ = timeit(
+                repeats,
+                lambda: sort_fn(dict(full), verbose=False, grid_shape=grid_shape),
+                device=device,
+            )
+        stats[method] = (sort_time, compressed_sizes(compression_method, splats))
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n_gaussians",
+        nargs="+",
+        type=int,
+        default=[16384, 65536, 138766],
+        help="Number of Gaussians of the garden scene to compress",
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="cuda" if torch.cuda.is_available() else "cpu",
+        help="Device for profiling",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=1,
+        help="Number of repeats for profiling",
+    )
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    collection = []
+    for n_gaussians in args.n_gaussians:
+        stats = main(n_gaussians, args.repeats, device=device)
+        for method, (sort_time, sizes) in stats.items():
+            collection.append(
+                [n_gaussians, method, f"{sort_time * 1000:.1f}"]
+                + [f"{sizes[k] / 1024:.1f}" for k in SORTED_KEYS]
+                + [f"{sum(sizes.values()) / 1024:.1f}"]
+            )
+    headers = (
+        ["#Gaussians", "Sort", "Sort time (ms)"]
+        + [f"{k} (KB)" for k in SORTED_KEYS]
+        + ["Total (KB)"]
+    )
+    print(tabulate(collection, headers, tablefmt="rst"))
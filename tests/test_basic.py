@@ -159,6 +159,20 @@ def test_proj(
     torch.testing.assert_close(v_covars, _v_covars, rtol=1e-1, atol=1e-1)
 
 
+def test_quat_scale_to_covar_triu():
+    from gsplat.cuda._torch_impl import _quat_scale_to_covar_preci
+
+    torch.manual_seed(42)
+
+    quats = torch.randn(1000, 4)
+    scales = torch.rand(1000, 3)
+    covars, precis = _quat_scale_to_covar_preci(quats, scales)
+    _covars, _precis = _quat_scale_to_covar_preci(quats, scales, triu=True)
+    triu = [0, 1, 2, 4, 5, 8]
+    torch.testing.assert_close(_covars, covars.reshape(-1, 9)[:, triu])
+    torch.testing.assert_close(_precis, precis.reshape(-1, 9)[:, triu])
+
+
 @pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
 @pytest.mark.parametrize("camera_model", ["pinhole", "ortho", "fisheye"])
 @pytest.mark.parametrize("fused", [False, True])
@@ -444,6 +458,89 @@ def test_fully_fused_projection_packed(
     torch.testing.assert_close(v_means, _v_means, rtol=1e-3, atol=1e-3)
 
 
+@pytest.mark.parametrize("calc_compensations", [False, True])
+@pytest.mark.parametrize("camera_model", ["pinhole", "ortho", "fisheye"])
+def test_fully_fused_projection_packed_torch(
+    calc_compensations: bool, camera_model: Literal["pinhole", "ortho", "fisheye"]
+):
+    from gsplat.cuda._torch_impl import (
+        _fully_fused_projection,
+        _quat_scale_to_covar_preci,
+    )
+
+    torch.manual_seed(42)
+
+    means, quats, scales, opacities, _, viewmats, Ks, width, height = load_test_data(
+        device="cpu",
+        data_path=os.path.join(os.path.dirname(__file__), "../assets/test_garden.npz"),
+    )
+    batch_dims = (2,)
+    test_data = expand(
+        {
+            "means": means,
+            "quats": quats,
+            "scales": scales,
+            "opacities": opacities,
+            "viewmats": viewmats,
+            "Ks": Ks,
+        },
+        batch_dims,
+    )
+    means = test_data["means"].clone().requires_grad_()
+    covars, _ = _quat_scale_to_covar_preci(
+        test_data["quats"], test_data["scales"], compute_preci=False
+    )
+    kwargs = dict(
+        calc_compensations=calc_compensations,
+        camera_model=camera_model,
+        opacities=test_data["opacities"],
+    )
+
+    radii, means2d, depths, conics, compensations = _fully_fused_projection(
+        means, covars, test_data["viewmats"], test_data["Ks"], width, height, **kwargs
+    )
+    (
+        batch_ids,
+        camera_ids,
+        gaussian_ids,
+        _radii,
+        _means2d,
+        _depths,
+        _conics,
+        _compensations,
+    ) = _fully_fused_projection(
+        means,
+        covars,
+        test_data["viewmats"],
+        test_data["Ks"],
+        width,
+        height,
+        packed=True,
+        **kwargs,
+    )
+
+    # radii is integer so we allow for 1 unit difference
+    valid = (radii > 0).all(dim=-1)
+    _valid = torch.zeros_like(valid)
+    _valid[batch_ids, camera_ids, gaussian_ids] = True
+    assert (valid != _valid).float().mean() < 1e-4
+    sel = valid[batch_ids, camera_ids, gaussian_ids]
+    ids = (batch_ids[sel], camera_ids[sel], gaussian_ids[sel])
+    torch.testing.assert_close(radii[ids], _radii[sel], rtol=0, atol=1)
+    torch.testing.assert_close(means2d[ids], _means2d[sel], rtol=1e-4, atol=1e-4)
+    torch.testing.assert_close(depths[ids], _depths[sel], rtol=1e-4, atol=1e-4)
+    torch.testing.assert_close(conics[ids], _conics[sel], rtol=1e-4, atol=1e-4)
+    if calc_compensations:
+        torch.testing.assert_close(
+            compensations[ids], _compensations[sel], rtol=1e-4, atol=1e-3
+        )
+
+    v_means2d = torch.randn_like(_means2d[sel])
+    v_means = torch.autograd.grad((means2d[ids] * v_means2d).sum(), means)[0]
+    _v_means = torch.autograd.grad((_means2d[sel] * v_means2d).sum(), means)[0]
+    torch.testing.assert_close(v_means, _v_means, rtol=1e-3, atol=1e-3)
+
+
 @pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
 @pytest.mark.parametrize("batch_dims", [(), (2,), (1, 2)])
 def test_isect(test_data, batch_dims: Tuple[int, ...]):
@@ -487,6 +584,73 @@ def test_isect(test_data, batch_dims: Tuple[int, ...]):
     torch.testing.assert_close(isect_offsets, _isect_offsets)
 
 
+@pytest.mark.parametrize("packed", [True, False])
+def test_isect_key_bits(packed: bool):
+    from gsplat.cuda._wrapper import isect_offset_encode, isect_tiles
+
+    torch.manual_seed(42)
+
+    _device = device if torch.cuda.is_available() else torch.device("cpu")
+    C, N = 3, 1000
+    width, height = 40, 60
+    means2d = torch.randn(C, N, 2, device=_device) * width
+    radii = torch.randint(0, width, (C, N, 2), device=_device, dtype=torch.int32)
+    depths = torch.rand(C, N, device=_device)
+    # Gaussians at the same depth keep their order
+    depths[:, : N // 10] = 0.5
+
+    tile_size = 16
+    tile_width = math.ceil(width / tile_size)
+    tile_height = math.ceil(height / tile_size)
+    if packed:
+        image_ids, gaussian_ids = torch.nonzero((radii > 0).all(-1), as_tuple=True)
+        inputs = (
+            means2d[image_ids, gaussian_ids],
+            radii[image_ids, gaussian_ids],
+            depths[image_ids, gaussian_ids],
+        )
+        kwargs = dict(
+            packed=True, n_images=C, image_ids=image_ids, gaussian_ids=gaussian_ids
+        )
+    else:
+        inputs = (means2d, radii, depths)
+        kwargs = {}
+
+    outputs = {}
+    for key_bits in [64, 32, None]:
+        tiles_per_gauss, isect_ids, flatten_ids = isect_tiles(
+            *inputs, tile_size, tile_width, tile_height, key_bits=key_bits, **kwargs
+        )
+        isect_offsets = isect_offset_encode(isect_ids, C, tile_width, tile_height)
+        outputs[key_bits] = (tiles_per_gauss, isect_ids, flatten_ids, isect_offsets)
+
+    tiles_per_gauss, isect_ids, flatten_ids, isect_offsets = outputs[64]
+    for key_bits in [32, None]:
+        _tiles_per_gauss, _isect_ids, _flatten_ids, _isect_offsets = outputs[key_bits]
+        assert _isect_ids.dtype == torch.int32
+        torch.testing.assert_close(_isect_ids.long(), isect_ids >> 32)
+        torch.testing.assert_close(_tiles_per_gauss, tiles_per_gauss)
+        torch.testing.assert_close(_flatten_ids, flatten_ids)
+        torch.testing.assert_close(_isect_offsets, isect_offsets)
+
+    # the bucketed torch path gives the same intersections, and the offsets with them
+    kwargs = {k: v.cpu() if torch.is_tensor(v) else v for k, v in kwargs.items()}
+    for key_bits in [64, 32]:
+        _tiles_per_gauss, _isect_ids, _flatten_ids, _isect_offsets = isect_tiles(
+            *(x.cpu() for x in inputs),
+            tile_size,
+            tile_width,
+            tile_height,
+            key_bits=key_bits,
+            return_offsets=True,
+            **kwargs,
+        )
+        torch.testing.assert_close(_isect_ids, outputs[key_bits][1].cpu())
+        torch.testing.assert_close(_tiles_per_gauss, tiles_per_gauss.cpu())
+        torch.testing.assert_close(_flatten_ids, flatten_ids.cpu())
+        torch.testing.assert_close(_isect_offsets, isect_offsets.cpu())
+
+
 @pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
 @pytest.mark.parametrize("channels", [3, 32, 128])
 @pytest.mark.parametrize("batch_dims", [(), (2,), (1, 2)])
@@ -637,3 +801,30 @@ def test_sh(test_data, sh_degree: int, batch_dims: Tuple[int, ...]):
     torch.testing.assert_close(v_coeffs, _v_coeffs, rtol=1e-4, atol=1e-4)
     if sh_degree > 0:
         torch.testing.assert_close(v_dirs, _v_dirs, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("sh_degree", [0, 1, 3])
+def test_sh_masks_torch(sh_degree: int):
+    from gsplat.cuda._torch_impl import _spherical_harmonics
+
+    torch.manual_seed(42)
+
+    C, N = 2, 1000
+    coeffs = torch.randn(N, 16, 3, requires_grad=True)
+    dirs = torch.randn(C, N, 3)
+    masks = torch.rand(C, N) > 0.5
+    # coefficients shared by the cameras, without a copy
+    shs = torch.broadcast_to(coeffs, (C, N, 16, 3))
+
+    colors = _spherical_harmonics(sh_degree, dirs, shs, masks=masks)
+    _colors = _spherical_harmonics(sh_degree, dirs, shs)
+    torch.testing.assert_close(colors, _colors * masks[..., None])
+
+    v_colors = torch.randn_like(colors)
+    v_coeffs = torch.autograd.grad((colors * v_colors).sum(), coeffs)[0]
+    _v_coeffs = torch.autograd.grad(
+        (_colors * v_colors * masks[..., None]).sum(), coeffs
+    )[0]
+    torch.testing.assert_close(v_coeffs, _v_coeffs)
+    # the inactive bands get no gradient
+    assert (v_coeffs[:, (sh_degree + 1) ** 2 :] == 0).all()
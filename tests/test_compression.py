@@ -6,8 +6,11 @@ pytest <THIS_PY_FILE> -s
 ```
 """
 
+import json
+
 import pytest
 import torch
+import torch.nn.functional as F
 
 device = torch.device("cuda:0")
 
@@ -40,5 +43,293 @@ def test_png_compression():
     splats_c = compression_method.decompress(compress_dir)
 
 
+def test_kmeans():
+    from gsplat.compression.kmeans import kmeans
+
+    torch.manual_seed(42)
+
+    # well separated blobs
+    K, D = 16, 8
+    centers = torch.randn(K, D) * 10
+    gt_labels = torch.randint(K, (10000,))
+    x = centers[gt_labels] + torch.randn(len(gt_labels), D) * 0.1
+
+    centroids, labels = kmeans(
+        x, K, n_iters=20, batch_size=1024, max_chunk_bytes=2**12, n_threads=2
+    )
+    # every point is assigned to its nearest centroid
+    torch.testing.assert_close(labels, torch.cdist(x, centroids).argmin(dim=-1))
+    # and the clusters are recovered
+    assert len(labels.unique()) == K
+    assert all(len(labels[gt_labels == k].unique()) == 1 for k in range(K))
+    torch.testing.assert_close(centroids[labels], centers[gt_labels], atol=0.05, rtol=0)
+
+
+def test_compress_kmeans_torch(tmp_path):
+    from gsplat.compression.png_compression import (
+        _compress_kmeans,
+        _decompress_kmeans,
+    )
+
+    torch.manual_seed(42)
+
+    shN = torch.randn(4096, 15, 3)
+    meta = _compress_kmeans(
+        str(tmp_path), "shN", shN, n_clusters=256, kmeans_backend="torch"
+    )
+    shN_c = _decompress_kmeans(str(tmp_path), "shN", meta)
+    assert shN_c.shape == shN.shape
+    # the codebook is better than the mean
+    assert (shN_c - shN).square().mean() < 0.9 * shN.var()
+
+
+def test_png_compression_workers(tmp_path):
+    pytest.importorskip("imageio")
+    from gsplat.compression import PngCompression
+
+    torch.manual_seed(42)
+
+    N = 4096
+    splats = {
+        "means": torch.randn(N, 3),
+        "scales": torch.randn(N, 3),
+        "quats": torch.randn(N, 4),
+        "opacities": torch.randn(N),
+        "sh0": torch.randn(N, 1, 3),
+        "shN": torch.randn(N, 15, 3),
+        "features": torch.randn(N, 16),
+    }
+
+    outputs = []
+    for n_workers in [1, 4]:
+        compress_dir = tmp_path / f"workers{n_workers}"
+        compress_dir.mkdir()
+        compression_method = PngCompression(
+            use_sort=False, verbose=False, kmeans_backend="torch", n_workers=n_workers
+        )
+        torch.manual_seed(0)
+        meta = compression_method.compress(str(compress_dir), dict(splats))
+        assert all(meta[k]["time"] > 0 for k in splats)
+        outputs.append(compression_method.decompress(str(compress_dir)))
+
+    # the codecs give the same results when run concurrently
+    for k in splats:
+        assert torch.equal(outputs[0][k], outputs[1][k]), k
+
+
+def test_png_compression_file(tmp_path):
+    pytest.importorskip("imageio")
+    from gsplat.compression import PngCompression, SplatContainer
+
+    torch.manual_seed(42)
+
+    N = 4096
+    splats = {
+        "means": torch.randn(N, 3),
+        "scales": torch.randn(N, 3),
+        "quats": torch.randn(N, 4),
+        "opacities": torch.randn(N),
+        "sh0": torch.randn(N, 1, 3),
+        "shN": torch.randn(N, 15, 3),
+        "features": torch.randn(N, 16),
+    }
+    compression_method = PngCompression(
+        use_sort=False, verbose=False, kmeans_backend="torch"
+    )
+    compress_dir = tmp_path / "splats"
+    compress_dir.mkdir()
+    torch.manual_seed(0)
+    compression_method.compress(str(compress_dir), dict(splats))
+    compress_file = tmp_path / "splats.gsplat"
+    torch.manual_seed(0)
+    compression_method.compress_file(str(compress_file), dict(splats))
+
+    # the container holds the same files as the directory
+    with SplatContainer(str(compress_file)) as container:
+        assert sorted(container.names + ["meta.json"]) == sorted(
+            p.name for p in compress_dir.iterdir()
+        )
+        with open(compress_dir / "meta.json") as f:
+            assert container.meta == json.load(f)
+        for name in container.names:
+            with container.open(name) as f:
+                assert f.read() == (compress_dir / name).read_bytes()
+
+    # and decompresses to the same splats, all or some of them
+    splats_dir = compression_method.decompress(str(compress_dir))
+    splats_file = compression_method.decompress(str(compress_file))
+    assert splats_dir.keys() == splats_file.keys() == splats.keys()
+    for k in splats:
+        assert torch.equal(splats_dir[k], splats_file[k]), k
+    splats_some = compression_method.decompress(
+        str(compress_file), param_names=["means", "opacities"]
+    )
+    assert list(splats_some.keys()) == ["means", "opacities"]
+    for k in splats_some:
+        assert torch.equal(splats_some[k], splats_dir[k]), k
+
+
+@pytest.mark.parametrize("N", [1000, 1024, 3])
+def test_png_compression_non_square(tmp_path, N: int):
+    pytest.importorskip("imageio")
+    from gsplat.compression import PngCompression
+
+    torch.manual_seed(42)
+
+    splats = {
+        "means": torch.randn(N, 3),
+        "scales": torch.randn(N, 3),
+        "quats": F.normalize(torch.randn(N, 4), dim=-1),
+        "opacities": torch.randn(N),
+        "sh0": torch.randn(N, 1, 3),
+        "features": torch.randn(N, 16),
+    }
+    compression_method = PngCompression(use_sort=False, verbose=False)
+    meta = compression_method.compress(str(tmp_path), dict(splats))
+    assert ("_valid" in meta) == (N != 1024)
+    splats_c = compression_method.decompress(str(tmp_path))
+
+    # no splat is lost, up to the quantization
+    assert splats_c.keys() == splats.keys()
+    for k, v in splats.items():
+        assert splats_c[k].shape == v.shape, k
+        step = (v.amax() - v.amin()) / 255
+        torch.testing.assert_close(splats_c[k], v, atol=step, rtol=1e-3)
+    splats_c = compression_method.decompress(str(tmp_path), param_names=["opacities"])
+    assert splats_c["opacities"].shape == (N,)
+
+
+@pytest.mark.parametrize("grid_shape", [(32, 32), (25, 40)])
+def test_sort_splats_morton(grid_shape):
+    from gsplat.compression.sort import (
+        _normalize,
+        _swap_refine,
+        _curve_cells,
+        sort_splats_morton,
+    )
+
+    torch.manual_seed(42)
+
+    N = grid_shape[0] * grid_shape[1]
+    splats = {
+        "means": torch.randn(N, 3),
+        "opacities": torch.randn(N),
+        "sh0": torch.randn(N, 1, 3),
+        "ids": torch.arange(N),
+    }
+    cells = _curve_cells(*grid_shape)
+    assert torch.equal(cells.sort().values, torch.arange(N))
+
+    def cost(grid):
+        # squared differences of the features of the 4-neighbors
+        f = features[grid]
+        return (f[1:] - f[:-1]).square().sum() + (f[:, 1:] - f[:, :-1]).square().sum()
+
+    features = torch.cat(
+        [_normalize(splats[k].reshape(N, -1)) for k in ["means", "sh0"]], dim=-1
+    )
+    shuffled = torch.randperm(N).reshape(grid_shape)
+    sorted_splats = sort_splats_morton(
+        dict(splats), verbose=False, grid_shape=grid_shape
+    )
+    ids = sorted_splats["ids"]
+    assert torch.equal(ids.sort().values, torch.arange(N))
+    for k, v in splats.items():
+        assert torch.equal(sorted_splats[k], v[ids]), k
+    grid = ids.reshape(grid_shape)
+    assert cost(grid) < cost(shuffled)
+
+    # the swaps never increase the cost
+    refined = _swap_refine(features, grid, n_iters=4)
+    assert torch.equal(refined.flatten().sort().values, torch.arange(N))
+    assert cost(refined) <= cost(grid)
+
+    sorted_splats = sort_splats_morton(
+        dict(splats), verbose=False, grid_shape=grid_shape, swap_iters=2
+    )
+    assert torch.equal(sorted_splats["ids"].sort().values, torch.arange(N))
+
+
+@pytest.mark.parametrize("sort_method", ["morton", "morton_swap"])
+def test_png_compression_morton(tmp_path, sort_method: str):
+    pytest.importorskip("imageio")
+    from gsplat.compression import PngCompression
+
+    torch.manual_seed(42)
+
+    N = 1000
+    splats = {
+        "means": torch.randn(N, 3),
+        "scales": torch.randn(N, 3),
+        "quats": F.normalize(torch.randn(N, 4), dim=-1),
+        "opacities": torch.randn(N),
+        "sh0": torch.randn(N, 1, 3),
+    }
+    compression_method = PngCompression(sort_method=sort_method, verbose=False)
+    compression_method.compress(str(tmp_path), dict(splats))
+    splats_c = compression_method.decompress(str(tmp_path))
+
+    # the splats are reordered, so match each one to its nearest original splat
+    assert splats_c.keys() == splats.keys()
+    dists = torch.cdist(splats_c["means"], splats["means"])
+    match = dists.argmin(dim=-1)
+    assert torch.equal(match.sort().values, torch.arange(N))
+    for k, v in splats.items():
+        step = (v.amax() - v.amin()) / 255
+        torch.testing.assert_close(splats_c[k], v[match], atol=step, rtol=1e-3)
+
+
+def test_png_compression_block_size(tmp_path):
+    pytest.importorskip("imageio")
+    from gsplat.compression import PngCompression
+
+    torch.manual_seed(42)
+
+    N = 1000
+    splats = {
+        "means": torch.randn(N, 3),
+        "scales": torch.randn(N, 3),
+        "quats": F.normalize(torch.randn(N, 4), dim=-1),
+        "opacities": torch.randn(N),
+        "sh0": torch.randn(N, 1, 3),
+    }
+    # outliers that stretch the global ranges
+    splats["scales"][5] = 100.0
+    splats["opacities"][7] = -200.0
+
+    errors = {}
+    for block_size in [None, 8]:
+        compress_dir = tmp_path / str(block_size)
+        compress_dir.mkdir()
+        compression_method = PngCompression(
+            use_sort=False, verbose=False, block_size=block_size
+        )
+        compression_method.compress(str(compress_dir), dict(splats))
+        splats_c = compression_method.decompress(str(compress_dir))
+        assert (compress_dir / "scales_ranges.npz").exists() == (block_size is not None)
+
+        # the errors are within the step of the global ranges
+        for k, v in splats.items():
+            assert splats_c[k].shape == v.shape, k
+            step = (v.amax() - v.amin()) / 255
+            torch.testing.assert_close(splats_c[k], v, atol=step, rtol=1e-3)
+        errors[block_size] = {
+            k: (splats_c[k] - v).abs().mean().item() for k, v in splats.items()
+        }
+
+        compress_file = tmp_path / f"{block_size}.gsplat"
+        compression_method.compress_file(str(compress_file), dict(splats))
+        splats_file = compression_method.decompress(str(compress_file))
+        for k in splats:
+            assert torch.equal(splats_file[k], splats_c[k]), k
+
+    # the outliers only coarsen the precision of their blocks
+    for k in ["scales", "opacities"]:
+        assert errors[8][k] < 0.2 * errors[None][k], k
+    for k in splats:
+        assert errors[8][k] <= errors[None][k] * 1.01, k
+
+
 if __name__ == "__main__":
     test_png_compression()
+    test_kmeans()
@@ -0,0 +1,240 @@
+"""Tests for the optimizers in `gsplat.optimizers`.
+
+Usage:
+```bash
+pytest <THIS_PY_FILE> -s
+```
+"""
+
+import pytest
+import torch
+
+
+def _masked_adam(param, grad, exp_avg, exp_avg_sq, mask, lr, b1, b2, eps):
+    """Reference: the Adam update of the CUDA `adam` kernel on the masked rows."""
+    exp_avg[mask] = b1 * exp_avg[mask] + (1 - b1) * grad[mask]
+    exp_avg_sq[mask] = b2 * exp_avg_sq[mask] + (1 - b2) * grad[mask] ** 2
+    param[mask] -= lr * exp_avg[mask] / (exp_avg_sq[mask].sqrt() + eps)
+
+
+def _create_optimizers(params, optimizer_class, lrs, fused=True, **kwargs):
+    """One optimizer shared by the named `params`, with a param group for each of
+    them, or with `fused=False` one optimizer for each of them."""
+    groups = [{"params": [v], "lr": lrs[k], "name": k} for k, v in params.items()]
+    if fused:
+        optimizer = optimizer_class(groups, **kwargs)
+        return {k: optimizer for k in params}
+    return {g["name"]: optimizer_class([g], **kwargs) for g in groups}
+
+
+def test_selective_adam_torch():
+    from gsplat.optimizers import SelectiveAdam
+
+    torch.manual_seed(42)
+
+    N = 1000
+    lr, eps, betas = 1e-2, 1e-15, (0.9, 0.999)
+    params = [
+        torch.nn.Parameter(torch.randn(N, 3)),
+        torch.nn.Parameter(torch.randn(N, 16, 3)),
+        torch.nn.Parameter(torch.randn(N)),
+    ]
+    # several tensors in a single group
+    optimizer = SelectiveAdam([{"params": params, "lr": lr}], eps=eps, betas=betas)
+
+    _params = [p.detach().clone() for p in params]
+    _states = [(torch.zeros_like(p), torch.zeros_like(p)) for p in _params]
+    for _ in range(3):
+        visibility = torch.rand(N) < 0.2
+        grads = [torch.randn_like(p) for p in params]
+        for p, g in zip(params, grads):
+            p.grad = g.clone()
+        optimizer.step(visibility)
+        for p, g, (m, v) in zip(_params, grads, _states):
+            _masked_adam(p, g, m, v, visibility, lr, betas[0], betas[1], eps)
+
+    for p, _p in zip(params, _params):
+        torch.testing.assert_close(p.detach(), _p)
+    for p, (m, v) in zip(params, _states):
+        torch.testing.assert_close(optimizer.state[p]["exp_avg"], m)
+        torch.testing.assert_close(optimizer.state[p]["exp_avg_sq"], v)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
+def test_adam_torch_vs_cuda():
+    from gsplat.cuda._torch_impl import _adam
+    from gsplat.cuda._wrapper import adam
+
+    torch.manual_seed(42)
+    device = torch.device("cuda:0")
+
+    N = 1000
+    param = torch.randn(N, 16, 3, device=device)
+    grad = torch.randn(N, 16, 3, device=device)
+    exp_avg = torch.rand(N, 16, 3, device=device)
+    exp_avg_sq = torch.rand(N, 16, 3, device=device)
+    valid = torch.rand(N, device=device) < 0.2
+
+    _param, _exp_avg, _exp_avg_sq = param.clone(), exp_avg.clone(), exp_avg_sq.clone()
+    adam(param, grad, exp_avg, exp_avg_sq, valid, 1e-2, 0.9, 0.999, 1e-15)
+    _adam(_param, grad, _exp_avg, _exp_avg_sq, valid, 1e-2, 0.9, 0.999, 1e-15)
+    torch.testing.assert_close(param, _param)
+    torch.testing.assert_close(exp_avg, _exp_avg)
+    torch.testing.assert_close(exp_avg_sq, _exp_avg_sq)
+
+
+def test_gaussian_adam():
+    from gsplat.optimizers import GaussianAdam, SelectiveAdam
+    from gsplat.strategy import DefaultStrategy
+    from gsplat.strategy.ops import duplicate, remove
+
+    torch.manual_seed(42)
+
+    N = 100
+    lrs = {"means": 1.6e-4, "scales": 5e-3, "quats": 1e-3, "opacities": 5e-2}
+    eps, betas = 1e-15, (0.9, 0.999)
+    init = {
+        "means": torch.randn(N, 3),
+        "scales": torch.randn(N, 3),
+        "quats": torch.randn(N, 4),
+        "opacities": torch.randn(N),
+    }
+
+    def create(optimizer_class, fused):
+        params = torch.nn.ParameterDict({k: v.clone() for k, v in init.items()})
+        optimizers = _create_optimizers(
+            params, optimizer_class, lrs, fused=fused, eps=eps, betas=betas
+        )
+        return params, optimizers
+
+    def step(params, optimizers, grads, visibility=None):
+        for k, p in params.items():
+            p.grad = grads[k].clone()
+        for optimizer in {id(o): o for o in optimizers.values()}.values():
+            if visibility is None:
+                optimizer.step()
+            else:
+                optimizer.step(visibility)
+            optimizer.zero_grad(set_to_none=True)
+
+    # dense steps match torch.optim.Adam, visible steps match SelectiveAdam
+    for optimizer_class, visible in [
+        (torch.optim.Adam, False),
+        (SelectiveAdam, True),
+    ]:
+        params, optimizers = create(GaussianAdam, fused=True)
+        DefaultStrategy().check_sanity(params, optimizers)
+        _params, _optimizers = create(optimizer_class, fused=False)
+        for it in range(3):
+            grads = {k: torch.randn_like(v) for k, v in init.items()}
+            visibility = torch.rand(N) < 0.5 if visible else None
+            step(params, optimizers, grads, visibility)
+            step(_params, _optimizers, grads, visibility)
+        for k in params:
+            torch.testing.assert_close(params[k], _params[k])
+
+    # densification keeps the shared optimizer consistent
+    params, optimizers = create(GaussianAdam, fused=True)
+    step(params, optimizers, {k: torch.randn_like(v) for k, v in init.items()})
+    state = {}
+    duplicate(params, optimizers, state, torch.rand(N) < 0.3)
+    remove(params, optimizers, state, torch.rand(len(params["means"])) < 0.3)
+    DefaultStrategy().check_sanity(params, optimizers)
+    optimizer = optimizers["means"]
+    for group in optimizer.param_groups:
+        param = params[group["name"]]
+        assert group["params"][0] is param
+        assert optimizer.state[param]["exp_avg"].shape == param.shape
+    step(params, optimizers, {k: torch.randn_like(v) for k, v in params.items()})
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
+def test_gaussian_adam_cuda():
+    from gsplat.optimizers import GaussianAdam, SelectiveAdam
+
+    torch.manual_seed(42)
+    device = torch.device("cuda:0")
+
+    N = 1000
+    params = [
+        torch.nn.Parameter(torch.randn(N, *shape, device=device))
+        for shape in [(3,), (15, 3), ()]
+    ]
+    _params = [torch.nn.Parameter(p.detach().clone()) for p in params]
+    # one multi-tensor pass on CUDA matches the `adam` kernel of SelectiveAdam
+    optimizer = GaussianAdam([{"params": [p]} for p in params], lr=1e-2, eps=1e-15)
+    _optimizer = SelectiveAdam(
+        [{"params": _params, "lr": 1e-2}], eps=1e-15, betas=(0.9, 0.999)
+    )
+    for _ in range(3):
+        visibility = torch.rand(N, device=device) < 0.5
+        for p, _p in zip(params, _params):
+            p.grad = torch.randn_like(p)
+            _p.grad = p.grad.clone()
+        optimizer.step(visibility)
+        _optimizer.step(visibility)
+    for p, _p in zip(params, _params):
+        torch.testing.assert_close(p, _p)
+
+
+def test_round_to_bf16_stochastic():
+    from gsplat.cuda._torch_impl import _round_to
+
+    torch.manual_seed(42)
+
+    x = torch.rand(1000) * 10
+    # the two bfloat16 neighbours of the positive x
+    lower = x.view(torch.int32).bitwise_and(-(1 << 16))
+    upper = (lower + (1 << 16)).view(torch.float32)
+    lower = lower.view(torch.float32)
+    samples = torch.stack([_round_to(x, torch.bfloat16, True) for _ in range(1000)])
+    samples = samples.float()
+    # always one of the two neighbours, and unbiased on average
+    assert ((samples == lower) | (samples == upper)).all()
+    torch.testing.assert_close(samples.mean(0), x, rtol=1e-3, atol=0)
+
+
+@pytest.mark.parametrize("optimizer_class", ["SelectiveAdam", "GaussianAdam"])
+def test_bf16_moments(optimizer_class):
+    import gsplat.optimizers
+    from gsplat.strategy.ops import duplicate
+
+    torch.manual_seed(42)
+
+    N = 1000
+    optimizer_class = getattr(gsplat.optimizers, optimizer_class)
+    params = torch.nn.ParameterDict(
+        {"means": torch.randn(N, 3), "shN": torch.randn(N, 15, 3)}
+    )
+    _params = torch.nn.ParameterDict({k: v.clone() for k, v in params.items()})
+
+    lrs = dict.fromkeys(params, 1e-2)
+    kwargs = {"eps": 1e-15, "betas": (0.9, 0.999)}
+    optimizers = _create_optimizers(
+        params, optimizer_class, lrs, moment_dtype=torch.bfloat16, **kwargs
+    )
+    _optimizers = _create_optimizers(_params, optimizer_class, lrs, **kwargs)
+    for _ in range(10):
+        visibility = torch.rand(N) < 0.5
+        for p, _p in zip(params.values(), _params.values()):
+            p.grad = torch.randn_like(p)
+            _p.grad = p.grad.clone()
+        optimizers["means"].step(visibility)
+        _optimizers["means"].step(visibility)
+    for k in params:
+        state = optimizers[k].state[params[k]]
+        assert state["exp_avg"].dtype == torch.bfloat16
+        assert state["exp_avg_sq"].dtype == torch.bfloat16
+        torch.testing.assert_close(params[k], _params[k], rtol=0, atol=5e-3)
+
+    # densification keeps the dtype of the moments
+    duplicate(params, optimizers, {}, torch.rand(N) < 0.3)
+    assert optimizers["means"].state[params["means"]]["exp_avg"].dtype == (
+        torch.bfloat16
+    )
+
+    # the squared gradients underflow in float16
+    with pytest.raises(ValueError):
+        _create_optimizers(
+            params, optimizer_class, lrs, moment_dtype=torch.float16, **kwargs
+        )
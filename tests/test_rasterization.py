@@ -6,6 +6,7 @@ pytest <THIS_PY_FILE> -s
 ```
 """
 
+import math
 from typing import Optional, Tuple
 
 import pytest
@@ -96,3 +97,340 @@ def test_rasterization(
     )
     torch.testing.assert_close(renders, _renders, rtol=1e-4, atol=1e-4)
     torch.testing.assert_close(alphas, _alphas, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
+@pytest.mark.parametrize("sh_degree", [None, 3])
+@pytest.mark.parametrize("rasterize_mode", ["classic", "antialiased"])
+@pytest.mark.parametrize("packed", [True, False])
+@pytest.mark.parametrize("batch_dims", [(), (2,)])
+def test_rasterization_torch_backend(
+    sh_degree: Optional[int],
+    rasterize_mode: str,
+    packed: bool,
+    batch_dims: Tuple[int, ...],
+):
+    from gsplat.rendering import rasterization
+
+    torch.manual_seed(42)
+
+    C, N = 2, 2_000
+    means = torch.rand(batch_dims + (N, 3), device=device)
+    quats = torch.randn(batch_dims + (N, 4), device=device)
+    scales = torch.rand(batch_dims + (N, 3), device=device) * 0.1
+    opacities = torch.rand(batch_dims + (N,), device=device)
+    if sh_degree is None:
+        colors = torch.rand(batch_dims + (N, 3), device=device)
+    else:
+        colors = torch.rand(batch_dims + (N, (sh_degree + 1) ** 2, 3), device=device)
+
+    width, height = 150, 100
+    focal = 150.0
+    Ks = torch.tensor(
+        [[focal, 0.0, width / 2.0], [0.0, focal, height / 2.0], [0.0, 0.0, 1.0]],
+        device=device,
+    ).expand(batch_dims + (C, -1, -1))
+    viewmats = torch.eye(4, device=device).expand(batch_dims + (C, -1, -1))
+
+    results = {}
+    for backend in ["cuda", "torch"]:
+        results[backend] = rasterization(
+            means=means,
+            quats=quats,
+            scales=scales,
+            opacities=opacities,
+            colors=colors,
+            viewmats=viewmats,
+            Ks=Ks,
+            width=width,
+            height=height,
+            sh_degree=sh_degree,
+            packed=packed,
+            rasterize_mode=rasterize_mode,
+            backend=backend,
+        )
+    renders, alphas, meta = results["cuda"]
+    _renders, _alphas, _meta = results["torch"]
+    torch.testing.assert_close(meta["radii"], _meta["radii"], rtol=0, atol=1)
+    # the bucketed torch path keeps the 64-bit ids
+    assert _meta["isect_ids"].dtype == meta["isect_ids"].dtype == torch.int64
+    torch.testing.assert_close(renders, _renders, rtol=1e-4, atol=1e-4)
+    torch.testing.assert_close(alphas, _alphas, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_rasterization_cpu(packed: bool):
+    import sys
+
+    from gsplat.rendering import rasterization
+
+    torch.manual_seed(42)
+
+    C, N = 2, 1_000
+    means = torch.rand(N, 3) * 2.0 - 1.0
+    means[:, 2] += 3.0
+    quats = torch.randn(N, 4)
+    scales = torch.rand(N, 3) * 0.05
+    opacities = torch.rand(N)
+    colors = torch.rand(N, 16, 3)
+
+    width, height = 60, 40
+    focal = 50.0
+    Ks = torch.tensor(
+        [[focal, 0.0, width / 2.0], [0.0, focal, height / 2.0], [0.0, 0.0, 1.0]]
+    ).expand(C, -1, -1)
+    viewmats = torch.eye(4).expand(C, -1, -1)
+
+    renders, alphas, meta = rasterization(
+        means=means,
+        quats=quats,
+        scales=scales,
+        opacities=opacities,
+        colors=colors,
+        viewmats=viewmats,
+        Ks=Ks,
+        width=width,
+        height=height,
+        sh_degree=3,
+        packed=packed,
+    )
+    assert renders.shape == (C, height, width, 3)
+    assert alphas.shape == (C, height, width, 1)
+    assert (alphas > 0).any()
+    if not torch.cuda.is_available():
+        # rendering on CPU never loads the CUDA extension
+        assert "gsplat.cuda._backend" not in sys.modules
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_rasterization_tight_isect(packed: bool):
+    from gsplat.rendering import rasterization
+
+    torch.manual_seed(42)
+
+    C, N = 2, 1_000
+    means = torch.rand(N, 3) * 2.0 - 1.0
+    means[:, 2] += 3.0
+    quats = torch.randn(N, 4)
+    # thin, rotated Gaussians whose bounding boxes cover many untouched tiles
+    scales = torch.rand(N, 3) * torch.tensor([0.2, 0.01, 0.01])
+    opacities = torch.rand(N)
+    colors = torch.rand(N, 3)
+
+    width, height = 60, 40
+    focal = 50.0
+    Ks = torch.tensor(
+        [[focal, 0.0, width / 2.0], [0.0, focal, height / 2.0], [0.0, 0.0, 1.0]]
+    ).expand(C, -1, -1)
+    viewmats = torch.eye(4).expand(C, -1, -1)
+
+    kwargs = dict(
+        means=means,
+        quats=quats,
+        scales=scales,
+        opacities=opacities,
+        colors=colors,
+        viewmats=viewmats,
+        Ks=Ks,
+        width=width,
+        height=height,
+        tile_size=4,
+        packed=packed,
+    )
+    renders, alphas, _ = rasterization(**kwargs)
+    _renders, _alphas, meta = rasterization(**kwargs, tight_isect=True)
+    assert meta["n_isects"] < meta["n_isects_aabb"]
+    torch.testing.assert_close(renders, _renders)
+    torch.testing.assert_close(alphas, _alphas)
+
+
+def _random_2d_gaussians(I: int, N: int, width: int, height: int, tile_size: int):
+    from gsplat.cuda._torch_impl import _isect_offset_encode, _isect_tiles
+
+    means2d = torch.rand(I, N, 2) * torch.tensor([width, height])
+    radii = torch.randint(1, 12, (I, N, 2), dtype=torch.int32)
+    depths = torch.rand(I, N)
+    conics = torch.stack(
+        [1.0 / radii[..., 0] ** 2, torch.zeros(I, N), 1.0 / radii[..., 1] ** 2], dim=-1
+    )
+    tile_width = math.ceil(width / tile_size)
+    tile_height = math.ceil(height / tile_size)
+    _, isect_ids, flatten_ids = _isect_tiles(
+        means2d, radii, depths, tile_size, tile_width, tile_height
+    )
+    isect_offsets = _isect_offset_encode(isect_ids, I, tile_width, tile_height)
+    return means2d, conics, isect_offsets, flatten_ids
+
+
+@pytest.mark.parametrize("num_threads", [2, 4])
+def test_rasterize_to_pixels_threads(num_threads: int):
+    from gsplat.cuda._torch_impl import _rasterize_to_pixels
+
+    torch.manual_seed(42)
+
+    I, N = 2, 500
+    width, height, tile_size = 70, 50, 16
+    means2d, conics, isect_offsets, flatten_ids = _random_2d_gaussians(
+        I, N, width, height, tile_size
+    )
+    colors = torch.rand(I, N, 3, requires_grad=True)
+    opacities = torch.rand(I, N)
+
+    results = []
+    for n in [1, num_threads]:
+        render_colors, render_alphas = _rasterize_to_pixels(
+            means2d,
+            conics,
+            colors,
+            opacities,
+            width,
+            height,
+            tile_size,
+            isect_offsets,
+            flatten_ids,
+            batch_per_iter=3,
+            num_threads=n,
+        )
+        (v_colors,) = torch.autograd.grad(render_colors.sum(), colors)
+        results.append((render_colors, render_alphas, v_colors))
+    for a, b in zip(*results):
+        torch.testing.assert_close(a, b)
+
+
+@pytest.mark.parametrize("channels", [1, 3, 5])
+def test_rasterize_to_pixels_backward(channels: int):
+    """The hand-written backward matches autograd through `_rasterize_tiles()`."""
+    from gsplat.cuda._torch_impl import _rasterize_tiles, _rasterize_to_pixels
+
+    torch.manual_seed(42)
+
+    I, N = 2, 300
+    width, height, tile_size = 40, 30, 8
+    means2d, conics, isect_offsets, flatten_ids = _random_2d_gaussians(
+        I, N, width, height, tile_size
+    )
+    means2d.requires_grad = True
+    conics.requires_grad = True
+    colors = torch.rand(I, N, channels, requires_grad=True)
+    # large opacities to also cover the clamping and the early termination
+    opacities = (torch.rand(I, N) * 2.0).clamp(max=0.99).requires_grad_()
+    backgrounds = torch.rand(I, channels, requires_grad=True)
+    inputs = [means2d, conics, colors, opacities, backgrounds]
+
+    render_colors, render_alphas = _rasterize_to_pixels(
+        means2d,
+        conics,
+        colors,
+        opacities,
+        width,
+        height,
+        tile_size,
+        isect_offsets,
+        flatten_ids,
+        backgrounds=backgrounds,
+        batch_per_iter=4,
+    )
+
+    # rasterize all tiles at once and backpropagate with autograd
+    tile_height, tile_width = isect_offsets.shape[-2:]
+    tile_offsets = torch.cat(
+        [isect_offsets.flatten().long(), torch.tensor([len(flatten_ids)])]
+    )
+    pixel_ids, pixel_colors, pixel_trans, _ = _rasterize_tiles(
+        means2d.reshape(-1, 2),
+        conics.reshape(-1, 3),
+        colors.reshape(-1, channels),
+        opacities.reshape(-1),
+        width,
+        height,
+        tile_size,
+        tile_width,
+        tile_height,
+        tile_offsets,
+        flatten_ids,
+        torch.arange(I * tile_height * tile_width),
+    )
+    inside = pixel_ids >= 0
+    pixel_ids = pixel_ids[inside]
+    _render_colors = torch.zeros(I * height * width, channels).index_put(
+        (pixel_ids,), pixel_colors[inside]
+    )
+    _render_trans = torch.ones(I * height * width).index_put(
+        (pixel_ids,), pixel_trans[inside]
+    )
+    _render_trans = _render_trans.reshape(I, height, width, 1)
+    _render_colors = _render_colors.reshape(I, height, width, channels)
+    _render_colors = _render_colors + _render_trans * backgrounds[:, None, None, :]
+    _render_alphas = 1.0 - _render_trans
+    torch.testing.assert_close(render_colors, _render_colors)
+    torch.testing.assert_close(render_alphas, _render_alphas)
+
+    v_render_colors = torch.randn_like(render_colors)
+    v_render_alphas = torch.randn_like(render_alphas)
+    grads = torch.autograd.grad(
+        (render_colors * v_render_colors).sum()
+        + (render_alphas * v_render_alphas).sum(),
+        inputs,
+    )
+    _grads = torch.autograd.grad(
+        (_render_colors * v_render_colors).sum()
+        + (_render_alphas * v_render_alphas).sum(),
+        inputs,
+    )
+    for grad, _grad in zip(grads, _grads):
+        torch.testing.assert_close(grad, _grad, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
+@pytest.mark.parametrize("channels", [1, 3, 5])
+def test_rasterize_to_pixels_backward_cuda(channels: int):
+    """The hand-written backward matches the gradients of the CUDA backend."""
+    from gsplat.cuda._wrapper import rasterize_to_pixels
+
+    torch.manual_seed(42)
+
+    I, N = 2, 300
+    width, height, tile_size = 40, 30, 8
+    means2d, conics, isect_offsets, flatten_ids = _random_2d_gaussians(
+        I, N, width, height, tile_size
+    )
+    colors = torch.rand(I, N, channels)
+    opacities = torch.rand(I, N) * 0.99
+    backgrounds = torch.rand(I, channels)
+    inputs = [x.to(device) for x in [means2d, conics, colors, opacities, backgrounds]]
+    isect_offsets, flatten_ids = isect_offsets.to(device), flatten_ids.to(device)
+
+    outputs = {}
+    for backend in ["cuda", "torch"]:
+        _inputs = [x.clone().requires_grad_() for x in inputs]
+        render_colors, render_alphas = rasterize_to_pixels(
+            *_inputs[:4],
+            width,
+            height,
+            tile_size,
+            isect_offsets,
+            flatten_ids,
+            backgrounds=_inputs[4],
+            backend=backend,
+        )
+        outputs[backend] = (render_colors, render_alphas, _inputs)
+    render_colors, render_alphas, _inputs = outputs["cuda"]
+    _render_colors, _render_alphas, __inputs = outputs["torch"]
+    torch.testing.assert_close(render_colors, _render_colors, rtol=1e-4, atol=1e-4)
+    torch.testing.assert_close(render_alphas, _render_alphas, rtol=1e-4, atol=1e-4)
+
+    v_render_colors = torch.randn_like(render_colors)
+    v_render_alphas = torch.randn_like(render_alphas)
+    # means2d, conics, colors, opacities and backgrounds
+    grads = torch.autograd.grad(
+        (render_colors * v_render_colors).sum()
+        + (render_alphas * v_render_alphas).sum(),
+        _inputs,
+    )
+    _grads = torch.autograd.grad(
+        (_render_colors * v_render_colors).sum()
+        + (_render_alphas * v_render_alphas).sum(),
+        __inputs,
+    )
+    for grad, _grad in zip(grads, _grads):
+        torch.testing.assert_close(grad, _grad, rtol=1e-3, atol=1e-3)
@@ -6,12 +6,33 @@ pytest <THIS_PY_FILE> -s
 ```
 """
 
+import io
+
 import pytest
 import torch
 
 device = torch.device("cuda:0")
 
 
+def _create_splats(init, grads, running, frozen=()):
+    """Parameters cloned from `init`, each with an Adam optimizer that has taken one
+    step on `grads`, and a copy of the `running` state of a strategy."""
+    params = torch.nn.ParameterDict({k: v.clone() for k, v in init.items()})
+    for k in frozen:
+        params[k].requires_grad = False
+    optimizers = {
+        k: torch.optim.Adam([v], lr=1e-3) for k, v in params.items() if k not in frozen
+    }
+    for k, v in params.items():
+        v.grad = grads[k].clone()
+    for optimizer in optimizers.values():
+        optimizer.step()
+    state = {
+        k: v.clone() if isinstance(v, torch.Tensor) else v for k, v in running.items()
+    }
+    return params, optimizers, state
+
+
 @pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
 def test_strategy():
     from gsplat.rendering import rasterization
@@ -128,6 +149,352 @@ def test_strategy_requires_grad():
     assert_consistent_sizes(params)
 
 
+def test_compute_relocation_torch():
+    import math
+
+    from gsplat.relocation import compute_relocation
+
+    torch.manual_seed(42)
+
+    N, n_max = 200, 51
+    binoms = torch.zeros((n_max, n_max))
+    for n in range(n_max):
+        for k in range(n + 1):
+            binoms[n, k] = math.comb(n, k)
+    opacities = torch.rand(N)
+    scales = torch.rand(N, 3)
+    ratios = torch.randint(1, n_max + 10, (N,))
+
+    new_opacities, new_scales = compute_relocation(opacities, scales, ratios, binoms)
+    assert ratios.max() == n_max
+
+    # Equation 9, looped the same way as the CUDA kernel, in float64
+    _opacities, _scales = [], []
+    for opacity, scale, n in zip(opacities.tolist(), scales.double(), ratios.tolist()):
+        new_opacity = 1 - (1 - opacity) ** (1 / n)
+        denom = 0.0
+        for i in range(1, n + 1):
+            for k in range(i):
+                denom += (
+                    math.comb(i - 1, k)
+                    * (-1) ** k
+                    / math.sqrt(k + 1)
+                    * new_opacity ** (k + 1)
+                )
+        _opacities.append(new_opacity)
+        _scales.append(opacity / denom * scale)
+    _opacities = torch.tensor(_opacities, dtype=torch.float32)
+    _scales = torch.stack(_scales).float()
+
+    torch.testing.assert_close(new_opacities, _opacities)
+    torch.testing.assert_close(new_scales, _scales, rtol=1e-4, atol=1e-6)
+
+
+def test_mcmc_strategy_cpu():
+    from gsplat.strategy import MCMCStrategy
+
+    torch.manual_seed(42)
+
+    N = 100
+    params = torch.nn.ParameterDict(
+        {
+            "means": torch.randn(N, 3),
+            "scales": torch.rand(N, 3),
+            "quats": torch.randn(N, 4),
+            "opacities": torch.randn(N) * 5,
+            "colors": torch.rand(N, 3),
+        }
+    )
+    optimizers = {k: torch.optim.Adam([v], lr=1e-3) for k, v in params.items()}
+
+    strategy = MCMCStrategy(cap_max=150, refine_every=1, verbose=True)
+    strategy.check_sanity(params, optimizers)
+    state = strategy.initialize_state()
+    sum(v.sum() for v in params.values()).backward()
+    strategy.step_post_backward(params, optimizers, state, step=600, info={}, lr=1e-3)
+    assert params["means"].shape[0] > N
+    assert all(v.shape[0] == params["means"].shape[0] for v in params.values())
+    assert all(torch.isfinite(v).all() for v in params.values())
+
+
+def test_reuse_storage():
+    from gsplat.strategy.ops import _capacity, duplicate, remove, split
+
+    torch.manual_seed(42)
+
+    N = 100
+    init = {
+        "means": torch.randn(N, 3),
+        "scales": torch.rand(N, 3),
+        "quats": torch.randn(N, 4),
+        "opacities": torch.rand(N),
+        # tracks the Gaussians through the ops
+        "ids": torch.arange(N, dtype=torch.float32),
+    }
+    grads = {k: torch.ones_like(v) for k, v in init.items()}
+    running = {"grad2d": torch.rand(N)}
+
+    def by_ids(params, optimizers, state):
+        order = torch.argsort(params["ids"], stable=True)
+        out = {k: v.detach()[order] for k, v in params.items()}
+        for k, optimizer in optimizers.items():
+            out[f"{k}_exp_avg"] = optimizer.state[params[k]]["exp_avg"][order]
+        out["grad2d"] = state["grad2d"][order]
+        return out
+
+    params, optimizers, state = _create_splats(init, grads, running, frozen=["ids"])
+    _params, _optimizers, _state = _create_splats(init, grads, running, frozen=["ids"])
+    is_dupli = torch.rand(N) < 0.3
+    duplicate(params, optimizers, state, is_dupli, reuse_storage=True)
+    duplicate(_params, _optimizers, _state, is_dupli)
+    # duplicated Gaussians are appended in the same order
+    for k in params:
+        torch.testing.assert_close(params[k], _params[k])
+    assert _capacity(params["means"]) == 2 * N
+
+    data_ptr = params["means"].data_ptr()
+    is_split = torch.rand(len(params["means"])) < 0.2
+    torch.manual_seed(0)
+    split(params, optimizers, state, is_split, reuse_storage=True)
+    torch.manual_seed(0)
+    split(_params, _optimizers, _state, is_split)
+    assert params["means"].data_ptr() == data_ptr
+    n_split = is_split.sum().item()
+    n_rest = len(is_split) - n_split
+    # first halves replace the split Gaussians, second halves are appended
+    for k in params:
+        p = params[k][: len(is_split)]
+        torch.testing.assert_close(p[~is_split], _params[k][:n_rest])
+        torch.testing.assert_close(p[is_split], _params[k][n_rest:-n_split])
+        torch.testing.assert_close(params[k][-n_split:], _params[k][-n_split:])
+
+    # give unique ids to the Gaussians, following the same order
+    n = len(params["ids"])
+    params["ids"].copy_(torch.arange(n))
+    rows = torch.cat(
+        [
+            torch.where(~is_split)[0],
+            torch.where(is_split)[0],
+            torch.arange(n - n_split, n),
+        ]
+    )
+    _params["ids"].copy_(rows)
+
+    # pruning keeps the same Gaussians, in another order, in the same storage
+    for _ in range(2):
+        is_prune = torch.rand(len(params["means"])) < 0.3
+        ids = params["ids"][is_prune]
+        _is_prune = torch.isin(_params["ids"], ids)
+        remove(params, optimizers, state, is_prune, reuse_storage=True)
+        remove(_params, _optimizers, _state, _is_prune)
+        assert params["means"].data_ptr() == data_ptr
+        out = by_ids(params, optimizers, state)
+        _out = by_ids(_params, _optimizers, _state)
+        for k in out:
+            torch.testing.assert_close(out[k], _out[k])
+
+    # the checkpoints of the trainer do not include the slack of the storage
+    def nbytes(state_dict):
+        buffer = io.BytesIO()
+        torch.save(state_dict, buffer)
+        return buffer.tell()
+
+    assert _capacity(params["means"]) > len(params["means"])
+    splats = {k: v.clone() for k, v in params.state_dict().items()}
+    _splats = {k: v.clone() for k, v in _params.state_dict().items()}
+    assert nbytes(splats) == nbytes(_splats)
+    assert nbytes(params.state_dict()) > nbytes(splats)
+
+
+@pytest.mark.parametrize("revised_opacity", [False, True])
+def test_grow_and_prune(revised_opacity: bool):
+    from gsplat.strategy import DefaultStrategy
+
+    torch.manual_seed(42)
+
+    N = 1000
+    init = {
+        "means": torch.randn(N, 3),
+        "scales": torch.log(torch.rand(N, 3) * 0.05),
+        "quats": torch.randn(N, 4),
+        "opacities": torch.logit(torch.rand(N) * 0.5),
+        "sh0": torch.randn(N, 1, 3),
+    }
+    running = {
+        "grad2d": torch.rand(N) * 4e-4,
+        "count": torch.ones(N),
+        "radii": torch.rand(N) * 0.2,
+    }
+    grads = {k: torch.randn_like(v) for k, v in init.items()}
+    running["scene_scale"] = 1.0
+
+    strategy = DefaultStrategy(
+        prune_opa=0.01,
+        prune_scale3d=0.04,
+        refine_scale2d_stop_iter=5000,
+        revised_opacity=revised_opacity,
+    )
+    step = 4000
+    params, optimizers, state = _create_splats(init, grads, running)
+    torch.manual_seed(0)
+    n_dupli, n_split = strategy._grow_gs(params, optimizers, state, step)
+    n_prune = strategy._prune_gs(params, optimizers, state, step)
+    assert n_dupli > 0 and n_split > 0 and n_prune > 0
+
+    _params, _optimizers, _state = _create_splats(init, grads, running)
+    torch.manual_seed(0)
+    counts = strategy._refine_gs(_params, _optimizers, _state, step)
+    assert counts == (n_dupli, n_split, n_prune)
+
+    # bit-identical to the sequential ops
+    for k in params:
+        assert torch.equal(params[k], _params[k]), k
+        for key in ["exp_avg", "exp_avg_sq"]:
+            v = optimizers[k].state[params[k]][key]
+            _v = _optimizers[k].state[_params[k]][key]
+            assert torch.equal(v, _v), (k, key)
+    for k in ["grad2d", "count", "radii"]:
+        assert torch.equal(state[k], _state[k]), k
+
+
+def test_cdf_sample():
+    from gsplat.strategy.ops import _cdf_sample
+
+    torch.manual_seed(42)
+    weights = torch.rand(100)
+    weights[::10] = 0.0
+
+    # deterministic under a seed
+    torch.manual_seed(0)
+    idxs = _cdf_sample(weights, 200_000)
+    torch.manual_seed(0)
+    assert torch.equal(idxs, _cdf_sample(weights, 200_000))
+
+    # follows the distribution, and never samples zero weights
+    freqs = torch.bincount(idxs, minlength=100) / len(idxs)
+    torch.testing.assert_close(freqs, weights / weights.sum(), atol=3e-3, rtol=0)
+    assert (freqs[::10] == 0).all()
+
+    # without replacement
+    idxs = _cdf_sample(weights, 50, replacement=False)
+    assert len(idxs.unique()) == 50
+    assert (weights[idxs] > 0).all()
+
+
+def test_inject_noise_to_position():
+    from gsplat import quat_scale_to_covar_preci
+    from gsplat.strategy.ops import inject_noise_to_position
+
+    torch.manual_seed(42)
+
+    N = 1000
+    params = {
+        "means": torch.randn(N, 3),
+        "scales": torch.log(torch.rand(N, 3) * 0.1),
+        "quats": torch.randn(N, 4),
+        "opacities": torch.logit(torch.rand(N).clamp(1e-3, 1 - 1e-3)),
+    }
+    scaler = 10.0
+
+    # the dense mode perturbs every Gaussian
+    torch.manual_seed(0)
+    means = params["means"].clone()
+    inject_noise_to_position(params, {}, {}, scaler)
+    torch.manual_seed(0)
+    covars, _ = quat_scale_to_covar_preci(
+        params["quats"], torch.exp(params["scales"]), triu=False
+    )
+    gates = 1 / (1 + torch.exp(-100 * (0.005 - torch.sigmoid(params["opacities"]))))
+    noise = torch.randn_like(means) * gates[:, None] * scaler
+    means += torch.einsum("bij,bj->bi", covars, noise)
+    torch.testing.assert_close(params["means"], means)
+
+    # the sparse mode only perturbs the Gaussians with a large enough gate
+    gate_tol = 1e-4
+    means = params["means"].clone()
+    inject_noise_to_position(params, {}, {}, scaler, gate_tol=gate_tol)
+    is_moved = (params["means"] != means).any(dim=-1)
+    assert is_moved.any()
+    assert (gates[is_moved] > gate_tol).all()
+    assert torch.equal(is_moved, gates > gate_tol)
+
+    # cached covariances are reused for small changes of the scales
+    state = {}
+    inject_noise_to_position(params, {}, state, scaler, gate_tol, cache_tol=1e-3)
+    cache = state["noise_cache"]
+    sel = gates > gate_tol
+    torch.testing.assert_close(cache["covars"][sel], covars[sel])
+    assert cache["scales"][~sel].isnan().all()
+    params["scales"][:10] += 1e-4
+    params["scales"][10:] += 1e-2
+    inject_noise_to_position(params, {}, state, scaler, gate_tol, cache_tol=1e-3)
+    covars, _ = quat_scale_to_covar_preci(
+        params["quats"], torch.exp(params["scales"]), triu=False
+    )
+    torch.testing.assert_close(cache["covars"][10:][sel[10:]], covars[10:][sel[10:]])
+    assert not torch.allclose(cache["covars"][:10][sel[:10]], covars[:10][sel[:10]])
+
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_update_state(packed: bool):
+    from gsplat.strategy import DefaultStrategy
+
+    torch.manual_seed(42)
+
+    C, N = 3, 100
+    width, height = 64, 48
+    radii = torch.randint(0, 10, (C, N, 2), dtype=torch.int32)
+    sel = (radii > 0).all(dim=-1)
+    camera_ids, gaussian_ids = torch.where(sel)
+    if packed:
+        means2d = torch.randn(len(gaussian_ids), 2, requires_grad=True)
+        radii = radii[sel]
+    else:
+        means2d = torch.randn(C, N, 2, requires_grad=True)
+    means2d.grad = torch.randn_like(means2d)
+    grads = means2d.grad.clone()
+    info = {
+        "width": width,
+        "height": height,
+        "n_cameras": C,
+        "radii": radii,
+        "gaussian_ids": gaussian_ids if packed else None,
+        "means2d": means2d,
+    }
+
+    strategy = DefaultStrategy(refine_scale2d_stop_iter=1000)
+    state = strategy.initialize_state()
+    params = {"means": torch.randn(N, 3)}
+    for _ in range(2):
+        strategy._update_state(params, state, info, packed=packed)
+    # the grads are left untouched
+    assert torch.equal(means2d.grad, grads)
+
+    # accumulate each (camera, Gaussian) pair one at a time
+    grad2d = torch.zeros(N)
+    count = torch.zeros(N)
+    max_radii = torch.zeros(N)
+    for i, (cid, gid) in enumerate(zip(camera_ids.tolist(), gaussian_ids.tolist())):
+        g = grads[i] if packed else grads[cid, gid]
+        r = radii[i] if packed else radii[cid, gid]
+        g = g * torch.tensor([width / 2.0 * C, height / 2.0 * C])
+        grad2d[gid] += 2 * g.norm()
+        count[gid] += 2
+        max_radii[gid] = max(max_radii[gid], r.max() / float(max(width, height)))
+    torch.testing.assert_close(state["grad2d"], grad2d)
+    torch.testing.assert_close(state["count"], count)
+    torch.testing.assert_close(state["radii"], max_radii)
+
+
 if __name__ == "__main__":
     test_strategy()
     test_strategy_requires_grad()
+    test_compute_relocation_torch()
+    test_mcmc_strategy_cpu()
+    test_reuse_storage()
+    test_grow_and_prune(False)
+    test_grow_and_prune(True)
+    test_cdf_sample()
+    test_inject_noise_to_position()
+    test_update_state(False)
+    test_update_state(True)